@@ -0,0 +1,414 @@
+from array import array
+
+import parser
+from lexer import Token, TokenType, TOKEN_TYPES
+from parser import Parser
+
+# ===============================
+# AST compacta (arena)
+# ===============================
+# Cada nó é uma posição em arrays paralelos:
+#
+#   kinds[i]    tipo do nó (constantes abaixo)
+#   a, b, c     operandos; o significado depende do tipo do nó
+#   offsets[i]  offset na fonte do token de origem (-1 se não houver)
+#
+# Listas de filhos (Program, Block, Print) ficam contíguas em children;
+# nesse caso a = início e b = quantidade. Nomes e constantes vão para
+# pools internados e os nós guardam só o índice. Um filho ausente (None)
+# é -1.
+#
+#   PROGRAM     a, b = filhos
+#   VAR_DECL    a = nome, b = inicializador, c = tipo (TokenType.value)
+#   ASSIGNMENT  a = nome, b = valor
+#   PRINT       a, b = expressões
+#   READ        a = nome
+#   IF          a = condição, b = then, c = else
+#   WHILE       a = condição, b = corpo
+#   BLOCK       a, b = comandos
+#   BINARY      a = esquerda, b = direita, c = operador (TokenType.value)
+#   UNARY       a = operando, c = operador
+#   LITERAL     a = constante, c = tipo do literal
+#   VARIABLE    a = nome
+
+PROGRAM = 1
+VAR_DECL = 2
+ASSIGNMENT = 3
+PRINT = 4
+READ = 5
+IF = 6
+WHILE = 7
+BLOCK = 8
+BINARY = 9
+UNARY = 10
+LITERAL = 11
+VARIABLE = 12
+
+OPERATOR_LEXEMES = {
+    TokenType.EQUAL.value: "==",
+    TokenType.NOT_EQUAL.value: "!=",
+    TokenType.GREATER_EQUAL.value: ">=",
+    TokenType.LESS_EQUAL.value: "<=",
+    TokenType.GREATER.value: ">",
+    TokenType.LESS.value: "<",
+    TokenType.PLUS.value: "+",
+    TokenType.MINUS.value: "-",
+    TokenType.MULT.value: "*",
+    TokenType.DIV.value: "/",
+    TokenType.AND.value: "&&",
+    TokenType.OR.value: "||",
+    TokenType.NOT.value: "!",
+}
+
+
+class ASTArena:
+    # Implementa a interface de builder do Parser (ver parser.TreeBuilder),
+    # mas devolve índices em vez de objetos.
+    def __init__(self, stream):
+        if not hasattr(stream, "starts"):
+            raise TypeError("A AST compacta precisa de um TokenStream")
+        self.stream = stream
+        self.kinds = array("B")
+        self.a = array("i")
+        self.b = array("i")
+        self.c = array("i")
+        self.offsets = array("q")
+        self.children = array("i")
+        self.names = []
+        self.constants = []
+        self._name_ids = {}
+        self._constant_ids = {}
+        self.root_index = -1
+        # Slots e tipos (TokenType.value) da análise semântica, -1 quando
+        # não há; cada array é criado na primeira escrita.
+        self.slots = None
+        self.expr_types = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # ---------- Construção ----------
+
+    def _add(self, kind, a=-1, b=-1, c=-1, offset=-1):
+        self.kinds.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        self.offsets.append(offset)
+        return len(self.kinds) - 1
+
+    def _add_list(self, kind, items):
+        start = len(self.children)
+        self.children.extend(-1 if item is None else item for item in items)
+        return self._add(kind, start, len(items))
+
+    def _name(self, index):
+        name = self.stream.lexeme(index)
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def _optional(self, node):
+        return -1 if node is None else node
+
+    def program(self, statements):
+        self.root_index = self._add_list(PROGRAM, statements)
+        return self.root_index
+
+    def var_decl(self, var_type, name_index, initializer):
+        return self._add(VAR_DECL, self._name(name_index), self._optional(initializer),
+                         var_type.value, self.stream.starts[name_index])
+
+    def assignment(self, name_index, value):
+        return self._add(ASSIGNMENT, self._name(name_index), value,
+                         offset=self.stream.starts[name_index])
+
+    def print_stmt(self, expressions):
+        return self._add_list(PRINT, expressions)
+
+    def read(self, name_index):
+        return self._add(READ, self._name(name_index), offset=self.stream.starts[name_index])
+
+    def if_stmt(self, condition, then_branch, else_branch):
+        return self._add(IF, condition, self._optional(then_branch), self._optional(else_branch))
+
+    def while_stmt(self, condition, body):
+        return self._add(WHILE, condition, self._optional(body))
+
+    def block(self, statements):
+        return self._add_list(BLOCK, statements)
+
+    def binary(self, left, operator_index, right):
+        return self._add(BINARY, left, right, self.stream.kinds[operator_index],
+                         self.stream.starts[operator_index])
+
+    def unary(self, operator_index, expr):
+        return self._add(UNARY, expr, -1, self.stream.kinds[operator_index],
+                         self.stream.starts[operator_index])
+
+    def literal(self, index, value, literal_type):
+        key = (literal_type, value)
+        constant_id = self._constant_ids.get(key)
+        if constant_id is None:
+            constant_id = self._constant_ids[key] = len(self.constants)
+            self.constants.append(value)
+        return self._add(LITERAL, constant_id, -1, literal_type.value, self.stream.starts[index])
+
+    def variable(self, index):
+        return self._add(VARIABLE, self._name(index), offset=self.stream.starts[index])
+
+    # ---------- Leitura ----------
+
+    def node(self, index):
+        # Fachada de objeto para o nó index (None para -1).
+        if index < 0:
+            return None
+        return FACADES[self.kinds[index]](self, index)
+
+    def root(self):
+        return self.node(self.root_index)
+
+    def child_nodes(self, index):
+        start = self.a[index]
+        node = self.node
+        return [node(child) for child in self.children[start:start + self.b[index]]]
+
+    def operator_token(self, index):
+        kind = self.c[index]
+        line, column = self.stream._lines().position(self.offsets[index])
+        return Token(TOKEN_TYPES[kind], OPERATOR_LEXEMES[kind], line, column)
+
+    def slot(self, index):
+        if self.slots is None or self.slots[index] < 0:
+            return None
+        return self.slots[index]
+
+    def set_slot(self, index, slot):
+        if self.slots is None:
+            self.slots = array("i", [-1]) * len(self.kinds)
+        self.slots[index] = -1 if slot is None else slot
+
+    def expr_type(self, index):
+        if self.expr_types is None or self.expr_types[index] < 0:
+            return None
+        return TOKEN_TYPES[self.expr_types[index]]
+
+    def set_expr_type(self, index, expr_type):
+        if self.expr_types is None:
+            self.expr_types = array("b", [-1]) * len(self.kinds)
+        self.expr_types[index] = -1 if expr_type is None else expr_type.value
+
+    def nbytes(self):
+        # Memória dos arrays (sem contar os pools).
+        arrays = (self.kinds, self.a, self.b, self.c, self.offsets, self.children)
+        arrays += tuple(arr for arr in (self.slots, self.expr_types) if arr is not None)
+        return sum(arr.itemsize * len(arr) for arr in arrays)
+
+
+def parse_compact(stream):
+    arena = ASTArena(stream)
+    Parser(stream, arena).parse()
+    return arena
+
+
+# ===============================
+# Fachadas
+# ===============================
+# Subclasses com o mesmo nome das classes de parser.py: visitantes que
+# despacham por type(node).__name__ ou usam isinstance funcionam sem
+# mudanças. Os atributos são lidos da arena a cada acesso.
+
+class _Facade:
+    __slots__ = ()
+
+    def __init__(self, arena, index):
+        self._arena = arena
+        self._index = index
+
+    def __reduce__(self):
+        # Serializa como o nó de objeto equivalente de parser.py.
+        base = type(self).__bases__[-1]
+        args = tuple([getattr(self, field) for field in self._fields])
+        if not self._annotations:
+            return (base, args)
+        return (base, args, tuple([getattr(self, name) for name in self._annotations]))
+
+
+class _NamedFacade(_Facade):
+    # O slot de um nó que se refere a uma variável fica em arena.slots.
+    __slots__ = ()
+
+    @property
+    def slot(self):
+        return self._arena.slot(self._index)
+
+    @slot.setter
+    def slot(self, value):
+        self._arena.set_slot(self._index, value)
+
+
+class _ExprFacade(_Facade):
+    # O tipo de uma expressão fica em arena.expr_types.
+    __slots__ = ()
+
+    @property
+    def expr_type(self):
+        return self._arena.expr_type(self._index)
+
+    @expr_type.setter
+    def expr_type(self, value):
+        self._arena.set_expr_type(self._index, value)
+
+
+class Program(_Facade, parser.Program):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def statements(self):
+        return self._arena.child_nodes(self._index)
+
+
+class VarDecl(_NamedFacade, parser.VarDecl):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def var_type(self):
+        return TOKEN_TYPES[self._arena.c[self._index]]
+
+    @property
+    def name(self):
+        return self._arena.names[self._arena.a[self._index]]
+
+    @property
+    def initializer(self):
+        return self._arena.node(self._arena.b[self._index])
+
+
+class Assignment(_NamedFacade, parser.Assignment):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def name(self):
+        return self._arena.names[self._arena.a[self._index]]
+
+    @property
+    def value(self):
+        return self._arena.node(self._arena.b[self._index])
+
+
+class Print(_Facade, parser.Print):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def expressions(self):
+        return self._arena.child_nodes(self._index)
+
+
+class Read(_NamedFacade, parser.Read):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def name(self):
+        return self._arena.names[self._arena.a[self._index]]
+
+
+class If(_Facade, parser.If):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def condition(self):
+        return self._arena.node(self._arena.a[self._index])
+
+    @property
+    def then_branch(self):
+        return self._arena.node(self._arena.b[self._index])
+
+    @property
+    def else_branch(self):
+        return self._arena.node(self._arena.c[self._index])
+
+
+class While(_Facade, parser.While):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def condition(self):
+        return self._arena.node(self._arena.a[self._index])
+
+    @property
+    def body(self):
+        return self._arena.node(self._arena.b[self._index])
+
+
+class Block(_Facade, parser.Block):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def statements(self):
+        return self._arena.child_nodes(self._index)
+
+
+class BinaryExpr(_ExprFacade, parser.BinaryExpr):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def left(self):
+        return self._arena.node(self._arena.a[self._index])
+
+    @property
+    def operator(self):
+        return self._arena.operator_token(self._index)
+
+    @property
+    def right(self):
+        return self._arena.node(self._arena.b[self._index])
+
+
+class UnaryExpr(_ExprFacade, parser.UnaryExpr):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def operator(self):
+        return self._arena.operator_token(self._index)
+
+    @property
+    def expr(self):
+        return self._arena.node(self._arena.a[self._index])
+
+
+class Literal(_ExprFacade, parser.Literal):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def value(self):
+        return self._arena.constants[self._arena.a[self._index]]
+
+    @property
+    def literal_type(self):
+        return TOKEN_TYPES[self._arena.c[self._index]]
+
+
+class Variable(_NamedFacade, _ExprFacade, parser.Variable):
+    __slots__ = ("_arena", "_index")
+
+    @property
+    def name(self):
+        return self._arena.names[self._arena.a[self._index]]
+
+
+FACADES = {
+    PROGRAM: Program,
+    VAR_DECL: VarDecl,
+    ASSIGNMENT: Assignment,
+    PRINT: Print,
+    READ: Read,
+    IF: If,
+    WHILE: While,
+    BLOCK: Block,
+    BINARY: BinaryExpr,
+    UNARY: UnaryExpr,
+    LITERAL: Literal,
+    VARIABLE: Variable,
+}
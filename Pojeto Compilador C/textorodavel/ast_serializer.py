@@ -0,0 +1,499 @@
+import json
+import struct
+from enum import Enum
+
+import parser
+from lexer import Token, TokenType, TOKEN_TYPES
+from parser import ASTNode
+
+# ===============================
+# Serialização da AST
+# ===============================
+# Escreve uma AST (de parser.py ou fachadas de ast_arena) em um de três
+# formatos, sempre com um percurso iterativo (pilha explícita, então a
+# profundidade da árvore não esbarra no limite de recursão) e por um único
+# writer com buffer, que repassa a saída em blocos grandes:
+#
+#   text    a forma indentada do ASTPrinter (só escrita)
+#   jsonl   um objeto JSON por linha, um por nó, em pré-ordem
+#   binary  o mesmo percurso em bytes: varints e strings internadas
+#
+# jsonl e binary guardam também as anotações da análise semântica (slot,
+# expr_type) e têm leitor: load_ast reconstrói os nós de parser.py.
+#
+# Nos dois formatos com leitor cada nó é um registro com os campos que
+# não são filhos; os filhos vêm logo depois, na ordem dos campos, cada um
+# como um registro (ou null/0 para um filho ausente). Um campo lista
+# guarda só a quantidade de filhos.
+#
+# jsonl:   {"node": "VarDecl", "var_type": "INT", "name": "a", "slot": 0}
+#          {"node": "BinaryExpr", "operator": ["PLUS", "+", 3, 7]}
+#          null
+#
+# binary:  MAGIC, depois os registros: código da classe (1 byte, 0 =
+#          filho ausente) e os campos do esquema abaixo; por fim as
+#          anotações da classe (slot + 1 em varint, 0 = sem slot; tipo em
+#          1 byte, 0 = sem tipo).
+#
+#   NAME   string
+#   TYPE   TokenType.value em 1 byte
+#   TOKEN  tipo (1 byte), lexema (string), linha e coluna (varints)
+#   VALUE  0 + inteiro (varint zigzag), 1 + double (8 bytes, little
+#          endian) ou 2 + string
+#   LIST   quantidade (varint)
+#
+# Uma string é um varint n: n par é a string já vista de índice n / 2;
+# n ímpar é uma string nova de n // 2 bytes UTF-8, que recebe o próximo
+# índice.
+
+FORMATS = ("text", "jsonl", "binary")
+MAGIC = b"MCAST\x01"
+
+_BUFFER_SIZE = 1 << 16
+
+NODE = 0
+LIST = 1
+NAME = 2
+TYPE = 3
+TOKEN = 4
+VALUE = 5
+
+# Campos de cada classe, na ordem de _fields.
+SCHEMA = {
+    "Program": (("statements", LIST),),
+    "VarDecl": (("var_type", TYPE), ("name", NAME), ("initializer", NODE)),
+    "Assignment": (("name", NAME), ("value", NODE)),
+    "Print": (("expressions", LIST),),
+    "Read": (("name", NAME),),
+    "If": (("condition", NODE), ("then_branch", NODE), ("else_branch", NODE)),
+    "While": (("condition", NODE), ("body", NODE)),
+    "Block": (("statements", LIST),),
+    "BinaryExpr": (("left", NODE), ("operator", TOKEN), ("right", NODE)),
+    "UnaryExpr": (("operator", TOKEN), ("expr", NODE)),
+    "Literal": (("value", VALUE), ("literal_type", TYPE)),
+    "Variable": (("name", NAME),),
+}
+
+# Código de cada classe no formato binário (0 = filho ausente).
+_CLASSES = [None] + [getattr(parser, name) for name in SCHEMA]
+_CODES = {cls.__name__: code for code, cls in enumerate(_CLASSES) if cls is not None}
+_TYPE_NAMES = {token_type.name: token_type for token_type in TokenType}
+
+
+class _Writer:
+    # Junta os pedaços e repassa a out em blocos de _BUFFER_SIZE.
+    def __init__(self, out, empty):
+        self.out = out
+        self.empty = empty
+        self.parts = []
+        self.size = 0
+
+    def write(self, part):
+        self.parts.append(part)
+        self.size += len(part)
+        if self.size >= _BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.out.write(self.empty.join(self.parts))
+            self.parts.clear()
+            self.size = 0
+
+
+def dump_ast(node, out, format="text", indent=0):
+    # out recebe str em text/jsonl e bytes em binary; indent (níveis de
+    # dois espaços antes de cada linha) só vale para text.
+    if format == "text":
+        writer = _Writer(out, "")
+        _dump_text(node, writer, indent)
+    elif format == "jsonl":
+        writer = _Writer(out, "")
+        _dump_jsonl(node, writer)
+    elif format == "binary":
+        writer = _Writer(out, b"")
+        _BinaryDumper(writer).dump(node)
+    else:
+        raise ValueError(f"Formato de AST desconhecido: {format}")
+    writer.flush()
+
+
+def load_ast(source, format):
+    # source: arquivo de texto (jsonl) ou binário (binary).
+    if format == "jsonl":
+        return _load_jsonl(source)
+    if format == "binary":
+        return _BinaryLoader(source.read()).load()
+    if format == "text":
+        raise ValueError("O formato text não tem leitor; use jsonl ou binary")
+    raise ValueError(f"Formato de AST desconhecido: {format}")
+
+
+# ===============================
+# text
+# ===============================
+
+class _Line(str):
+    # Linha pronta na pilha de _dump_text (rótulo de campo).
+    __slots__ = ()
+
+
+def _dump_text(node, writer, indent=0):
+    # As linhas vão para uma lista local e seguem ao writer em blocos; o
+    # cabeçalho e os rótulos de cada (classe, indentação) são montados uma
+    # vez só.
+    lines = []
+    append = lines.append
+    prefixes = [""]
+    layouts = {}
+    stack = [(node, indent)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        value, indent = pop()
+        cls = value.__class__
+        if cls is _Line:
+            append(value)
+            continue
+        if len(lines) >= 4096:
+            writer.write("".join(lines))
+            lines.clear()
+        while len(prefixes) <= indent:
+            prefixes.append("  " * len(prefixes))
+        prefix = prefixes[indent]
+        if value is None:
+            append(f"{prefix}None\n")
+        elif cls is list:
+            stack.extend((item, indent) for item in reversed(value))
+        elif isinstance(value, ASTNode):
+            layout = layouts.get((cls, indent))
+            if layout is None:
+                labels = [(attr, _Line(f"{prefix}  {attr}:\n")) for attr in reversed(value._fields)]
+                layout = layouts[cls, indent] = (f"{prefix}{cls.__name__}\n", labels)
+            header, labels = layout
+            append(header)
+            child = indent + 2
+            for attr, line in labels:
+                push((getattr(value, attr), child))
+                push((line, 0))
+        elif isinstance(value, Enum):
+            append(f"{prefix}{value.name}\n")
+        elif isinstance(value, list):
+            stack.extend((item, indent) for item in reversed(value))
+        else:
+            append(f"{prefix}{value}\n")
+    writer.write("".join(lines))
+
+
+# ===============================
+# jsonl
+# ===============================
+
+def _dump_jsonl(node, writer):
+    write = writer.write
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(", ", ": ")).encode
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            write("null\n")
+            continue
+        name = type(node).__name__
+        record = {"node": name}
+        children = []
+        for field, kind in SCHEMA[name]:
+            value = getattr(node, field)
+            if kind == NODE:
+                children.append(value)
+            elif kind == LIST:
+                record[field] = len(value)
+                children.extend(value)
+            elif kind == TYPE:
+                record[field] = value.name
+            elif kind == TOKEN:
+                record[field] = [value.type.name, value.lexeme, value.line, value.column]
+            else:
+                record[field] = value
+        for annotation in node._annotations:
+            value = getattr(node, annotation)
+            if value is not None:
+                record[annotation] = value.name if isinstance(value, Enum) else value
+        write(encode(record))
+        write("\n")
+        children.reverse()
+        stack.extend(children)
+
+
+def _load_jsonl(source):
+    builder = _TreeAssembler()
+    for number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if record is None:
+                builder.add(None)
+                continue
+            name = record["node"]
+            node = builder.new(name)
+            for field, kind in SCHEMA[name]:
+                if kind == NODE:
+                    builder.expect(node, field)
+                elif kind == LIST:
+                    builder.expect(node, field, record[field])
+                elif kind == TYPE:
+                    setattr(node, field, _TYPE_NAMES[record[field]])
+                elif kind == TOKEN:
+                    type_name, lexeme, line_number, column = record[field]
+                    setattr(node, field, Token(_TYPE_NAMES[type_name], lexeme, line_number, column))
+                else:
+                    setattr(node, field, record[field])
+            for annotation in node._annotations:
+                value = record.get(annotation)
+                if annotation == "expr_type" and value is not None:
+                    value = _TYPE_NAMES[value]
+                setattr(node, annotation, value)
+            builder.add(node)
+        except (ValueError, KeyError, TypeError) as error:
+            raise ValueError(f"AST jsonl inválida na linha {number}: {error}") from None
+    return builder.finish()
+
+
+# ===============================
+# binary
+# ===============================
+
+class _BinaryDumper:
+    def __init__(self, writer):
+        self.writer = writer
+        self.strings = {}
+
+    def string(self, text):
+        index = self.strings.get(text)
+        if index is not None:
+            return _varint(index << 1)
+        self.strings[text] = len(self.strings)
+        data = text.encode("utf-8")
+        return _varint(len(data) << 1 | 1) + data
+
+    def dump(self, node):
+        write = self.writer.write
+        string = self.string
+        write(MAGIC)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                write(b"\x00")
+                continue
+            name = type(node).__name__
+            record = bytearray((_CODES[name],))
+            children = []
+            for field, kind in SCHEMA[name]:
+                value = getattr(node, field)
+                if kind == NODE:
+                    children.append(value)
+                elif kind == LIST:
+                    record += _varint(len(value))
+                    children.extend(value)
+                elif kind == NAME:
+                    record += string(value)
+                elif kind == TYPE:
+                    record.append(value.value)
+                elif kind == TOKEN:
+                    record.append(value.type.value)
+                    record += string(value.lexeme)
+                    record += _varint(value.line)
+                    record += _varint(value.column)
+                elif isinstance(value, str):
+                    record.append(2)
+                    record += string(value)
+                elif isinstance(value, float):
+                    record.append(1)
+                    record += _DOUBLE.pack(value)
+                else:
+                    record.append(0)
+                    record += _varint(value << 1 if value >= 0 else (-value << 1) - 1)
+            for annotation in node._annotations:
+                value = getattr(node, annotation)
+                if annotation == "slot":
+                    record += _varint(0 if value is None else value + 1)
+                else:
+                    record.append(0 if value is None else value.value)
+            write(bytes(record))
+            children.reverse()
+            stack.extend(children)
+
+
+_DOUBLE = struct.Struct("<d")
+
+
+def _varint(value):
+    if value < 0x80:
+        return bytes((value,))
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+class _BinaryLoader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.strings = []
+
+    def byte(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def varint(self):
+        data = self.data
+        pos = self.pos
+        value = data[pos]
+        pos += 1
+        if value >= 0x80:
+            value &= 0x7F
+            shift = 7
+            while True:
+                part = data[pos]
+                pos += 1
+                value |= (part & 0x7F) << shift
+                if part < 0x80:
+                    break
+                shift += 7
+        self.pos = pos
+        return value
+
+    def string(self):
+        header = self.varint()
+        if not header & 1:
+            return self.strings[header >> 1]
+        end = self.pos + (header >> 1)
+        if end > len(self.data):
+            raise IndexError("string além do fim")
+        text = bytes(self.data[self.pos:end]).decode("utf-8")
+        self.pos = end
+        self.strings.append(text)
+        return text
+
+    def load(self):
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError("AST binária inválida: cabeçalho desconhecido")
+        self.pos = len(MAGIC)
+        builder = _TreeAssembler()
+        try:
+            while self.pos < len(self.data):
+                code = self.byte()
+                if code == 0:
+                    builder.add(None)
+                    continue
+                name = _CLASSES[code].__name__
+                node = builder.new(name)
+                for field, kind in SCHEMA[name]:
+                    if kind == NODE:
+                        builder.expect(node, field)
+                    elif kind == LIST:
+                        builder.expect(node, field, self.varint())
+                    elif kind == NAME:
+                        setattr(node, field, self.string())
+                    elif kind == TYPE:
+                        setattr(node, field, TOKEN_TYPES[self.byte()])
+                    elif kind == TOKEN:
+                        token_type = TOKEN_TYPES[self.byte()]
+                        lexeme = self.string()
+                        line = self.varint()
+                        setattr(node, field, Token(token_type, lexeme, line, self.varint()))
+                    else:
+                        setattr(node, field, self.value())
+                for annotation in node._annotations:
+                    if annotation == "slot":
+                        slot = self.varint()
+                        node.slot = None if slot == 0 else slot - 1
+                    else:
+                        value = self.byte()
+                        setattr(node, annotation, None if value == 0 else TOKEN_TYPES[value])
+                builder.add(node)
+        except (IndexError, KeyError, TypeError, UnicodeDecodeError) as error:
+            raise ValueError(f"AST binária inválida no byte {self.pos}: {error}") from None
+        return builder.finish()
+
+    def value(self):
+        tag = self.byte()
+        if tag == 0:
+            value = self.varint()
+            return value >> 1 if not value & 1 else -((value + 1) >> 1)
+        if tag == 1:
+            (value,) = _DOUBLE.unpack_from(self.data, self.pos)
+            self.pos += _DOUBLE.size
+            return value
+        if tag == 2:
+            return self.string()
+        raise ValueError(f"AST binária inválida: valor de tipo {tag}")
+
+
+# ===============================
+# Montagem da árvore
+# ===============================
+
+class _TreeAssembler:
+    # Recebe os nós em pré-ordem e liga cada um ao próximo campo vazio do
+    # nó aberto mais recente. Um nó fica aberto (na pilha) enquanto faltam
+    # filhos para ele.
+    def __init__(self):
+        self.root = None
+        self.started = False
+        # (nó, campos que faltam: [campo, filhos que faltam ou None])
+        self.open = []
+        self.pending = None
+
+    def new(self, name):
+        cls = getattr(parser, name) if name in SCHEMA else None
+        if cls is None:
+            raise KeyError(name)
+        node = cls.__new__(cls)
+        self.pending = []
+        return node
+
+    def expect(self, node, field, count=None):
+        # O campo field de node vem dos próximos registros: um filho ou,
+        # para listas, count filhos.
+        if count is None:
+            setattr(node, field, None)
+            self.pending.append([field, None])
+        else:
+            setattr(node, field, [])
+            if count:
+                self.pending.append([field, count])
+
+    def add(self, node):
+        if self.open:
+            owner, fields = self.open[-1]
+            entry = fields[0]
+            if entry[1] is None:
+                setattr(owner, entry[0], node)
+                del fields[0]
+            else:
+                getattr(owner, entry[0]).append(node)
+                entry[1] -= 1
+                if not entry[1]:
+                    del fields[0]
+            if not fields:
+                self.open.pop()
+        elif self.started:
+            raise ValueError("registro depois do fim da árvore")
+        else:
+            self.root = node
+            self.started = True
+        pending = self.pending
+        self.pending = None
+        if node is not None and pending:
+            self.open.append((node, pending))
+
+    def finish(self):
+        if not self.started or self.open:
+            raise ValueError("AST incompleta")
+        return self.root
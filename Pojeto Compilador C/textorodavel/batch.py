@@ -0,0 +1,222 @@
+import glob
+import os
+import sys
+import time
+
+from lexer import Lexer
+from optimizer import Optimizer, PASSES
+from tac import format_tac
+
+# ===============================
+# Compilação em lote
+# ===============================
+# Compila muitos arquivos .mc em paralelo num pool de processos. Cada
+# worker é criado uma vez e atende muitos arquivos, então as tabelas do
+# lexer (MASTER_PATTERN), os módulos do compilador e o cache de disco
+# ficam carregados entre um arquivo e outro. Os resultados voltam na
+# ordem das entradas (imap), à medida que ficam prontos, e a execução
+# termina com um relatório agregado na saída de erro.
+
+SOURCE_SUFFIX = ".mc"
+_GLOB_CHARS = "*?["
+
+
+def is_batch_input(name):
+    return os.path.isdir(name) or any(char in name for char in _GLOB_CHARS)
+
+
+def expand_inputs(names):
+    # Arquivos ficam como estão; diretórios contribuem todos os .mc abaixo
+    # deles e globs (com ** recursivo) os caminhos que casarem, ambos em
+    # ordem alfabética. Repetidos aparecem só na primeira posição.
+    paths = []
+    for name in names:
+        if os.path.isdir(name):
+            found = []
+            for root, dirs, files in os.walk(name):
+                dirs.sort()
+                found.extend(os.path.join(root, file)
+                             for file in files if file.endswith(SOURCE_SUFFIX))
+            paths.extend(sorted(found))
+        elif any(char in name for char in _GLOB_CHARS):
+            matches = sorted(path for path in glob.glob(name, recursive=True)
+                             if os.path.isfile(path))
+            if not matches:
+                raise FileNotFoundError(f"Nenhum arquivo corresponde a '{name}'")
+            paths.extend(matches)
+        else:
+            paths.append(name)
+    seen = set()
+    unique = []
+    for path in paths:
+        key = os.path.normpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+# ===============================
+# Worker
+# ===============================
+
+class FileResult:
+    __slots__ = ("path", "error", "output", "size", "lines", "instructions", "cpu")
+
+    def __init__(self, path, error, output, size, lines, instructions, cpu):
+        self.path = path
+        self.error = error
+        self.output = output
+        self.size = size
+        self.lines = lines
+        self.instructions = instructions
+        self.cpu = cpu
+
+    def __reduce__(self):
+        return (FileResult, (self.path, self.error, self.output, self.size,
+                             self.lines, self.instructions, self.cpu))
+
+
+class BatchWorker:
+    # Estado que sobrevive entre arquivos dentro de um processo.
+    def __init__(self, cache_dir=None, cache_bytes=None, passes=None, emit_tac=False):
+        # O cache (como o multiprocessing em compile_batch) só é importado
+        # por quem compila: o main importa este módulo em toda execução.
+        from cache import CompileCache, compile_source, compiler_version
+        self.compile_source = compile_source
+        self.cache = CompileCache(cache_dir, cache_bytes) if cache_dir else None
+        self.passes = passes
+        self.emit_tac = emit_tac
+        # Aquece o que é preparado sob demanda (hash da versão do
+        # compilador, caches internos do re) antes do primeiro arquivo.
+        if self.cache is not None:
+            compiler_version()
+        Lexer("int x; x = 1;").token_stream()
+
+    def compile_path(self, path):
+        start = time.process_time()
+        size = lines = instructions = 0
+        output = None
+        try:
+            with open(path, encoding="utf-8") as file:
+                source = file.read()
+            size = len(source)
+            lines = source.count("\n")
+            if self.cache is not None:
+                tac_code = self.cache.compile(source).tac
+            else:
+                tac_code = self.compile_source(source).tac
+            if self.passes is not None:
+                tac_code = Optimizer(self.passes).optimize(tac_code)
+            instructions = len(tac_code)
+            if self.emit_tac:
+                output = "".join(line + "\n" for line in format_tac(tac_code))
+            error = None
+        except (OSError, UnicodeDecodeError) as exc:
+            error = f"não foi possível ler: {exc}"
+        except RecursionError:
+            error = "programa aninhado demais"
+        except Exception as exc:
+            error = str(exc)
+        return FileResult(path, error, output, size, lines, instructions,
+                          time.process_time() - start)
+
+
+_worker = None
+
+
+def _init_worker(options):
+    global _worker
+    _worker = BatchWorker(**options)
+
+
+def _compile_path(path):
+    return _worker.compile_path(path)
+
+
+# ===============================
+# Execução e relatório
+# ===============================
+
+class BatchReport:
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.files = 0
+        self.failed = 0
+        self.bytes = 0
+        self.lines = 0
+        self.instructions = 0
+        self.cpu = 0.0
+        self.wall = 0.0
+
+    def add(self, result):
+        self.files += 1
+        self.failed += result.error is not None
+        self.bytes += result.size
+        self.lines += result.lines
+        self.instructions += result.instructions
+        self.cpu += result.cpu
+
+    def write(self, out):
+        wall = self.wall or 1e-9
+        print(f"arquivos: {self.files} ({self.files - self.failed} ok, "
+              f"{self.failed} com erro), {self.jobs} processo(s)", file=out)
+        print(f"tempo: {self.wall:.3f} s parede, {self.cpu:.3f} s de CPU nos workers",
+              file=out)
+        print(f"vazão: {self.files / wall:.1f} arquivos/s, "
+              f"{self.lines / wall:.0f} linhas/s, "
+              f"{self.bytes / wall / 2**20:.2f} MiB/s, "
+              f"{self.instructions} instruções TAC", file=out)
+
+
+def _chunksize(count, jobs):
+    # Lotes pequenos mantêm a saída fluindo e o balanceamento razoável;
+    # lotes maiores amortizam a comunicação quando há milhares de arquivos.
+    return max(1, min(32, count // (jobs * 8)))
+
+
+def compile_batch(paths, jobs=None, options=None, out=sys.stdout, err=sys.stderr):
+    # Escreve, na ordem de `paths`, o resultado de cada arquivo (em out) ou
+    # o seu diagnóstico (em err). Devolve o BatchReport da execução.
+    jobs = jobs or os.cpu_count() or 1
+    options = options or {}
+    report = BatchReport(jobs)
+    start = time.perf_counter()
+
+    if jobs == 1 or len(paths) <= 1:
+        worker = BatchWorker(**options)
+        results = map(worker.compile_path, paths)
+        _write_results(results, report, out, err)
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(jobs, _init_worker, (options,)) as pool:
+            results = pool.imap(_compile_path, paths, _chunksize(len(paths), jobs))
+            _write_results(results, report, out, err)
+
+    report.wall = time.perf_counter() - start
+    return report
+
+
+def _write_results(results, report, out, err):
+    for result in results:
+        report.add(result)
+        if result.error is not None:
+            out.flush()
+            print(f"{result.path}: erro: {result.error}", file=err)
+            err.flush()
+        elif result.output is not None:
+            out.write(f"// {result.path}\n")
+            out.write(result.output)
+        else:
+            out.write(f"{result.path}: ok ({result.instructions} instruções)\n")
+
+
+def batch_options(args):
+    options = {"emit_tac": args.tac}
+    if args.cache:
+        options["cache_dir"] = args.cache
+        if args.cache_size is not None:
+            options["cache_bytes"] = args.cache_size * 2**20
+    if args.optimize:
+        options["passes"] = [name for name in PASSES if name not in args.no_pass]
+    return options
@@ -0,0 +1,715 @@
+import argparse
+import gc
+import io
+import json
+import marshal
+import os
+import platform
+import re
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from lexer import Lexer
+from parser import Parser
+from ast_arena import parse_compact
+from ast_printer import ASTPrinter
+from ast_serializer import FORMATS, dump_ast, load_ast
+from semantic import SemanticAnalyzer
+from tac_generator import TACGenerator
+from optimizer import LOOP_PASSES, PASSES, Optimizer
+from tac import DEFAULT_VALUES, FUNCTIONS, GENERIC, Opcode, decode_tac, format_tac
+from vm import VM, _format
+from pybackend import compile_program, run_code
+from c_backend import build_executable, find_cc, generate_c
+from cache import CompileCache, compile_source
+from incremental import IncrementalCompiler
+from fused import FusedCompiler, check_and_generate
+from workload import generate_program
+from ssa import from_ssa, propagate, to_ssa
+from regalloc import RegisterAllocator
+from bytecode import load_bytecode, save_bytecode
+
+# ===============================
+# Benchmarks
+# ===============================
+# Uso: python benchmarks.py <experimento> [opções]
+
+
+def _generate(args, statements):
+    # Programa sintético com os parâmetros de gerador da linha de comando.
+    return generate_program(statements, seed=args.seed, identifiers=args.identifiers,
+                            max_depth=args.depth, expr_depth=args.expr_depth,
+                            expr_width=args.expr_width, string_density=args.string_density)
+
+
+def _program_with_nodes(nodes, seed=0):
+    # Aumenta o número de comandos até a AST ter pelo menos `nodes` nós.
+    statements = 1000
+    while True:
+        source = generate_program(statements, seed=seed)
+        count = len(parse_compact(Lexer(source).token_stream()))
+        if count >= nodes:
+            return source, count
+        statements = int(statements * nodes / count * 1.05) + 1
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak, elapsed
+
+
+def bench_ast_memory(args):
+    source, count = _program_with_nodes(args.nodes, args.seed)
+    print(f"programa: {len(source)} bytes, {count} nós")
+
+    stream = Lexer(source).token_stream()
+    rows = [
+        ("árvore (__slots__)", lambda: Parser(stream).parse()),
+        ("arena", lambda: parse_compact(stream)),
+    ]
+    for name, build in rows:
+        result, retained, peak, elapsed = _measure(build)
+        print(f"{name:20} retido {retained / 2**20:8.1f} MiB  "
+              f"pico {peak / 2**20:8.1f} MiB  "
+              f"{retained / count:6.1f} B/nó  {elapsed:6.2f} s")
+        del result
+
+
+def _compile(source):
+    ast = Parser(Lexer(source).token_stream()).parse()
+    semantic = SemanticAnalyzer()
+    semantic.analyze(ast)
+    return TACGenerator(semantic.table.names).generate(ast), semantic.table.symbols
+
+
+def _run_vm(tac, var_types):
+    vm = VM(tac, var_types, stdout=io.StringIO())
+    start = time.perf_counter()
+    vm.run()
+    return time.perf_counter() - start, vm.stdout.getvalue()
+
+
+def bench_optimizer(args):
+    source = _generate(args, args.statements)
+    tac, var_types = _compile(source)
+    optimizer = Optimizer()
+    start = time.perf_counter()
+    optimized = optimizer.optimize(tac)
+    elapsed = time.perf_counter() - start
+    report = optimizer.report()
+
+    print(f"TAC: {report['size_before']} -> {report['size_after']} instruções "
+          f"({report['iterations']} iterações, {elapsed:.2f} s)")
+    for name, stats in report["passes"].items():
+        print(f"  {name:12} removidas {stats['removed']:7}  acrescentadas {stats['added']:7}  "
+              f"reescritas {stats['rewritten']:7}")
+
+    before, output_before = _run_vm(tac, var_types)
+    after, output_after = _run_vm(optimized, var_types)
+    assert output_before == output_after, "saída diferente após otimizar"
+    print(f"VM: {before:.3f} s -> {after:.3f} s")
+
+
+def _best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_tac_generation(args):
+    # Antes das quádruplas o gerador produzia texto e cada consumidor (VM,
+    # otimizador) precisava decodificá-lo; "texto" mede a impressão e
+    # "decodificação" o custo que todo consumidor pagava.
+    source = _generate(args, args.statements)
+    ast = Parser(Lexer(source).token_stream()).parse()
+
+    generate, quads = _best_of(lambda: TACGenerator().generate(ast))
+    print_text, text = _best_of(lambda: format_tac(quads))
+    decode, _ = _best_of(lambda: decode_tac(text), repeat=3)
+
+    count = len(quads)
+    for name, elapsed in (
+        ("quádruplas", generate),
+        ("texto", print_text),
+        ("decodificação", decode),
+    ):
+        print(f"{name:14} {elapsed:7.3f} s  {count / elapsed / 1e6:6.2f} M instr/s")
+
+
+# Programa no formato de program.mc (compara a e b e imprime), repetido
+# dentro de um while: o caso de laço que o backend Python quer acelerar.
+LOOP_PROGRAM = """
+int a;
+int b;
+int i;
+int total;
+
+a = 10;
+b = 20;
+i = 0;
+while (i < {iterations}) {{
+    if (b > a) {{
+        total = total + b / 2;
+    }} else {{
+        total = total - a;
+    }}
+    a = a + 3;
+    i = i + 1;
+}}
+print("Total:", total, a);
+"""
+
+
+class TreeWalker:
+    # Interpretador direto sobre a AST, como linha de base: uma chamada de
+    # método por nó, variáveis numa lista indexada pelo slot.
+    def __init__(self, var_types, stdout):
+        self.env = [DEFAULT_VALUES.get(var_type, 0) for var_type in var_types.values()]
+        self.stdout = stdout
+
+    def run(self, node):
+        if node is not None:
+            getattr(self, f"run_{type(node).__name__}")(node)
+
+    def run_Program(self, node):
+        for stmt in node.statements:
+            self.run(stmt)
+
+    run_Block = run_Program
+
+    def run_VarDecl(self, node):
+        if node.initializer:
+            self.env[node.slot] = self.eval(node.initializer)
+
+    def run_Assignment(self, node):
+        self.env[node.slot] = self.eval(node.value)
+
+    def run_Print(self, node):
+        for expr in node.expressions:
+            self.stdout.write(_format(self.eval(expr)) + "\n")
+
+    def run_If(self, node):
+        if self.eval(node.condition):
+            self.run(node.then_branch)
+        else:
+            self.run(node.else_branch)
+
+    def run_While(self, node):
+        while self.eval(node.condition):
+            self.run(node.body)
+
+    def eval(self, node):
+        return getattr(self, f"eval_{type(node).__name__}")(node)
+
+    def eval_BinaryExpr(self, node):
+        left = self.eval(node.left)
+        right = self.eval(node.right)
+        return FUNCTIONS[_BINARY_LEXEMES[node.operator.lexeme]](left, right)
+
+    def eval_UnaryExpr(self, node):
+        return FUNCTIONS[_UNARY_LEXEMES[node.operator.lexeme]](self.eval(node.expr))
+
+    def eval_Literal(self, node):
+        if isinstance(node.value, str):
+            return node.value[1:-1]
+        return node.value
+
+    def eval_Variable(self, node):
+        return self.env[node.slot]
+
+
+_BINARY_LEXEMES = {
+    "+": Opcode.ADD, "-": Opcode.SUB, "*": Opcode.MUL, "/": Opcode.DIV,
+    "==": Opcode.EQ, "!=": Opcode.NE, "<": Opcode.LT, ">": Opcode.GT,
+    "<=": Opcode.LE, ">=": Opcode.GE, "&&": Opcode.AND, "||": Opcode.OR,
+}
+_UNARY_LEXEMES = {"-": Opcode.NEG, "!": Opcode.NOT}
+
+
+def bench_backend(args):
+    source = LOOP_PROGRAM.format(iterations=args.iterations)
+    ast = Parser(Lexer(source).token_stream()).parse()
+    semantic = SemanticAnalyzer()
+    semantic.analyze(ast)
+    var_types = semantic.table.symbols
+    tac = TACGenerator(semantic.table.names).generate(ast)
+    optimized = Optimizer().optimize(tac)
+
+    compile_time, code = _best_of(lambda: compile_program(ast, var_types), repeat=3)
+    data = marshal.dumps(code)
+    load_time, _ = _best_of(lambda: marshal.loads(data))
+
+    def timed(run):
+        out = io.StringIO()
+        start = time.perf_counter()
+        run(out)
+        return time.perf_counter() - start, out.getvalue()
+
+    rows = [
+        ("AST (tree walk)", lambda out: TreeWalker(var_types, out).run(ast)),
+        ("VM (TAC)", lambda out: VM(tac, var_types, stdout=out).run()),
+        ("VM (TAC -O)", lambda out: VM(optimized, var_types, stdout=out).run()),
+        ("code object", lambda out: run_code(code, stdout=out)),
+    ]
+    directory = None
+    try:
+        find_cc()
+    except RuntimeError as error:
+        print(f"sem backend C: {error}")
+    else:
+        directory = tempfile.TemporaryDirectory()
+        executable = os.path.join(directory.name, "program")
+        start = time.perf_counter()
+        build_executable(generate_c(ast, var_types), executable)
+        cc_time = time.perf_counter() - start
+        rows.append(("C (cc -O2)", lambda out: out.write(
+            subprocess.run([executable], capture_output=True, text=True).stdout)))
+        print(f"backend C: cc {cc_time:.2f} s")
+
+    print(f"{args.iterations} iterações; compile() {compile_time * 1000:.1f} ms, "
+          f".mcc {len(data)} bytes, carga {load_time * 1000:.2f} ms")
+    baseline = None
+    expected = None
+    for name, run in rows:
+        elapsed, output = timed(run)
+        if expected is None:
+            baseline, expected = elapsed, output
+        assert output == expected, f"saída diferente em {name}"
+        print(f"{name:16} {elapsed:7.3f} s  {baseline / elapsed:6.1f}x")
+    if directory is not None:
+        directory.cleanup()
+
+
+def bench_cache(args):
+    source = _generate(args, args.statements)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory)
+        front_end, _ = _best_of(lambda: compile_source(source), repeat=1)
+        start = time.perf_counter()
+        cache.compile(source)
+        miss = time.perf_counter() - start
+        hit, _ = _best_of(lambda: cache.compile(source), repeat=3)
+        size = cache.size()
+    print(f"front end {front_end:7.3f} s")
+    print(f"falta     {miss:7.3f} s  (front end + escrita de {size / 2**20:.1f} MiB)")
+    print(f"acerto    {hit:7.3f} s  {front_end / hit:5.1f}x")
+    print(cache.stats.as_dict())
+
+
+def bench_incremental(args):
+    # "Teclas" no meio do arquivo, cada uma seguida do seu desfazer, com o
+    # arquivo em dois tamanhos. Só o que muda a numeração do TAC (novos
+    # temporários) ou a linha dos comandos seguintes custa proporcional ao
+    # resto do arquivo, em result(); o resto não deve crescer com ele.
+    for statements in (args.statements, args.statements * 4):
+        source = _generate(args, statements)
+        full, expected = _best_of(lambda: compile_source(source), repeat=1)
+        start = time.perf_counter()
+        compiler = IncrementalCompiler(source)
+        compiler.result()
+        initial = time.perf_counter() - start
+        middle = source.index(";\n", len(source) // 2)
+        digit = re.compile(r"(?<![\w.])\d").search(source, middle).start()
+        edits = [
+            ("espaço", (middle, 0, " "), (middle, 1, "")),
+            ("constante", (digit, 1, "7"), (digit, 1, source[digit])),
+            ("temporário", (middle, 0, " + 1"), (middle, 4, "")),
+            ("nova linha", (middle + 1, 0, "\n"), (middle + 1, 1, "")),
+        ]
+        print(f"{statements} comandos, {len(source)} bytes: recompilação completa "
+              f"{full * 1000:.1f} ms, estado incremental {initial * 1000:.1f} ms")
+        rounds = 20
+        for name, edit, undo in edits:
+            edit_time = result_time = 0.0
+            for _ in range(rounds):
+                for change in (edit, undo):
+                    start = time.perf_counter()
+                    compiler.edit(*change)
+                    edit_time += time.perf_counter() - start
+                    start = time.perf_counter()
+                    result = compiler.result()
+                    result_time += time.perf_counter() - start
+            count = 2 * rounds
+            print(f"  {name:11} edit() {edit_time / count * 1000:7.3f} ms  "
+                  f"result() {result_time / count * 1000:8.3f} ms")
+        assert compiler.source == source
+        assert result.tac == expected.tac
+        print(f"  {compiler.stats()}")
+
+
+def _separate_passes(ast):
+    semantic = SemanticAnalyzer()
+    semantic.analyze(ast)
+    return semantic.table.symbols, TACGenerator(semantic.table.names).generate(ast)
+
+
+def _fused_visitor(ast):
+    # A passada única só com o visitante sem recursão, o caminho que ela
+    # usa abaixo de _STATEMENT_DEPTH.
+    compiler = FusedCompiler()
+    compiler.visit(ast)
+    return compiler.table.symbols, compiler.code
+
+
+def bench_fused(args):
+    # Checagem e TAC em duas passadas com despacho por getattr (como era)
+    # contra a passada única, sozinhas e somadas ao lexer + parser
+    # (compilação completa); e a passada única inteira no visitante sem
+    # recursão, para medir o caminho recursivo que ela usa de costume.
+    for statements in (args.statements, args.statements * 10):
+        source = _generate(args, statements)
+        ast = Parser(Lexer(source).token_stream()).parse()
+        separate, expected = _best_of(lambda: _separate_passes(ast))
+        fused, result = _best_of(lambda: check_and_generate(ast))
+        assert result == expected
+        visitor, result = _best_of(lambda: _fused_visitor(ast))
+        assert result == expected
+        front, _ = _best_of(lambda: Parser(Lexer(source).token_stream()).parse())
+        print(f"{statements} comandos, {len(expected[1])} instruções")
+        print(f"  semântica + TAC  {separate:7.3f} s   completo {front + separate:7.3f} s")
+        print(f"  passada única    {fused:7.3f} s   completo {front + fused:7.3f} s  "
+              f"({separate / fused:.2f}x / {(front + separate) / (front + fused):.2f}x)")
+        print(f"  só o visitante   {visitor:7.3f} s   ({visitor / fused:.2f}x a passada única)")
+
+
+ARITHMETIC_PROGRAM = """
+int i;
+int n;
+int acc;
+float x;
+float y;
+
+i = 0;
+x = 1.0;
+while (i < {iterations}) {{
+    n = i * 7 + 3;
+    acc = acc + n / 4 - -n / 3;
+    y = x * 1.5 - x / 3.0;
+    x = -y / 2.0 + 1.0;
+    if (acc > 1000000) {{
+        acc = acc / 2;
+    }}
+    i = i + 1;
+}}
+print(acc, x);
+"""
+
+
+def bench_typed(args):
+    # O mesmo TAC com as operações especializadas pelo tipo e com todas
+    # trocadas de volta pelas genéricas, na VM, num laço aritmético.
+    source = ARITHMETIC_PROGRAM.format(iterations=args.iterations // 2)
+    var_types, tac = check_and_generate(Parser(Lexer(source).token_stream()).parse())
+    generic = [(GENERIC[instr[0]],) + instr[1:] for instr in tac]
+    specialized = sum(instr[0] is not GENERIC[instr[0]] for instr in tac)
+    print(f"{args.iterations // 2} iterações, {specialized} de {len(tac)} instruções especializadas")
+    for suffix, optimize in (("", False), (" -O", True)):
+        rows = {}
+        for name, code in (("genérico", generic), ("por tipo", tac)):
+            if optimize:
+                code = Optimizer().optimize(code)
+            # Melhor de 3 execuções: (tempo, saída).
+            rows[name] = min(_run_vm(code, var_types) for _ in range(3))
+        (generic_time, generic_output), (typed_time, typed_output) = rows.values()
+        assert generic_output == typed_output, "saída diferente com as operações por tipo"
+        print(f"  VM{suffix:3} genérico {generic_time:7.3f} s   por tipo {typed_time:7.3f} s  "
+              f"{generic_time / typed_time:5.2f}x")
+
+
+NESTED_LOOP_PROGRAM = """
+int i;
+int j;
+int n;
+int scale;
+int offset;
+int acc;
+float x;
+float step;
+
+n = {size};
+scale = 7;
+offset = 3;
+step = 0.5;
+i = 0;
+while (i < n) {{
+    j = 0;
+    while (j < n) {{
+        acc = acc + (scale * offset - 1) * j + i * scale + j * 4;
+        x = x + step * 2.0 - (step * step + step);
+        j = j + 1;
+    }}
+    if (acc > 1000000) {{
+        acc = acc - 1000000;
+    }}
+    i = i + 1;
+}}
+print(acc, x);
+"""
+
+
+def bench_loops(args):
+    # Laços aninhados com subexpressões invariantes e multiplicações pelo
+    # contador, otimizados com e sem os passos de laço.
+    size = max(1, int((args.iterations // 2) ** 0.5))
+    source = NESTED_LOOP_PROGRAM.format(size=size)
+    var_types, tac = check_and_generate(Parser(Lexer(source).token_stream()).parse())
+    without = Optimizer([name for name in PASSES if name not in LOOP_PASSES]).optimize(tac)
+    optimizer = Optimizer()
+    optimized = optimizer.optimize(tac)
+    report = optimizer.report()
+    print(f"{size * size} voltas do laço interno; TAC -O sem laços {len(without)}, "
+          f"com laços {len(optimized)} instruções")
+    for entry in report["loops"]:
+        print(f"  laço {entry['loop']}: {entry['pass']} {entry['instr']}")
+    rows = {}
+    for name, code in (("sem licm/strength", without), ("com licm/strength", optimized)):
+        rows[name] = min(_run_vm(code, var_types) for _ in range(3))
+    (before, output_before), (after, output_after) = rows.values()
+    assert output_before == output_after, "saída diferente com os passos de laço"
+    print(f"  VM -O {before:7.3f} s -> {after:7.3f} s  {before / after:5.2f}x")
+
+
+def bench_ssa(args):
+    # Construção da SSA, SCCP e volta, por tamanho de programa: o tempo por
+    # instrução deve ficar quase constante.
+    for statements in args.sizes:
+        tac, _ = _compile(_generate(args, statements))
+        times = []
+        start = time.process_time()
+        ssa = to_ssa(tac)
+        times.append(time.process_time() - start)
+        start = time.process_time()
+        rewritten = propagate(ssa)
+        times.append(time.process_time() - start)
+        start = time.process_time()
+        code = from_ssa(ssa)
+        times.append(time.process_time() - start)
+        phis = sum(len(block) for block in ssa.phis)
+        print(f"{len(tac):8} instruções {phis:7} phis  ssa {times[0]:6.2f} s  "
+              f"sccp {times[1]:6.2f} s  volta {times[2]:6.2f} s  "
+              f"{sum(times) / len(tac) * 1e6:5.1f} µs/instrução  "
+              f"{rewritten} reescritas, {len(code)} instruções no fim")
+
+
+def bench_regalloc(args):
+    # Temporários, pressão máxima e tamanho do vetor de registradores da
+    # VM antes e depois da alocação, por tamanho de programa.
+    for statements in args.sizes:
+        tac, var_types = _compile(_generate(args, statements))
+        allocator = RegisterAllocator(args.registers)
+        start = time.process_time()
+        allocated = allocator.allocate(tac)
+        elapsed = time.process_time() - start
+        report = allocator.report()
+        rows = []
+        for code in (tac, allocated):
+            vm = VM(code, var_types, stdout=io.StringIO())
+            rows.append(len(vm.registers))
+        print(f"{len(tac):8} instruções  temporários {report['temps_before']:7} -> "
+              f"{report['temps_after']:4}  máximo vivo {report['max_live_before']:3} -> "
+              f"{report['max_live_after']:3}  derramados {report['spilled']:5}  "
+              f"VM {rows[0]:7} -> {rows[1]:6} posições  ({elapsed:.2f} s)")
+
+
+def bench_bytecode(args):
+    # Partida de um programa: front end a partir da fonte, leitura do TAC
+    # em texto e carga do .mcb (instruções e símbolos prontos para a VM),
+    # com o tamanho de cada arquivo.
+    def load(path):
+        with load_bytecode(path) as program:
+            return program.instructions(), program.symbols()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "programa.mcb")
+        for statements in args.sizes:
+            source = _generate(args, statements)
+            result = compile_source(source)
+            tac = result.tac
+            text = format_tac(tac)
+            save_bytecode(path, tac, result.symbols, result.lines)
+            front, _ = _best_of(lambda: check_and_generate(Parser(Lexer(source).token_stream()).parse()),
+                                repeat=3)
+            decode, _ = _best_of(lambda: decode_tac(text), repeat=3)
+            loaded, (code, _) = _best_of(lambda: load(path), repeat=3)
+            assert code == tac
+            print(f"{len(tac):8} instruções  fonte {len(source) / 2**10:8.0f} KiB {front:6.3f} s  "
+                  f"TAC {sum(map(len, text)) / 2**10:8.0f} KiB {decode:6.3f} s  "
+                  f".mcb {os.path.getsize(path) / 2**10:8.0f} KiB {loaded:6.3f} s  "
+                  f"({front / loaded:.1f}x)")
+
+
+def bench_ast_dump(args):
+    # Escrita de cada formato num buffer em memória e, nos que têm
+    # leitor, a reconstrução da AST a partir dele.
+    source, count = _program_with_nodes(args.nodes, args.seed)
+    ast = Parser(Lexer(source).token_stream()).parse()
+    print(f"programa: {len(source)} bytes, {count} nós")
+    for format in FORMATS:
+        buffer = io.BytesIO() if format == "binary" else io.StringIO()
+        start = time.perf_counter()
+        dump_ast(ast, buffer, format)
+        dumped = time.perf_counter() - start
+        size = len(buffer.getvalue())
+        line = f"{format:8} {size / 2**20:8.1f} MiB  escrita {dumped:6.2f} s"
+        if format != "text":
+            buffer.seek(0)
+            start = time.perf_counter()
+            load_ast(buffer, format)
+            line += f"  leitura {time.perf_counter() - start:6.2f} s"
+        print(line)
+
+
+# ===============================
+# Fases do front end
+# ===============================
+# Cada fase medida sozinha (melhor de --repeat), com a entrada pronta da
+# fase anterior, em programas de vários tamanhos; o pico de memória vem de
+# uma execução à parte com tracemalloc. --json grava o resultado e
+# --baseline compara com um resultado gravado antes, falhando se alguma
+# fase ficou mais lenta que a tolerância.
+
+PHASES = ("lexer", "parser", "semantic", "tac", "printer")
+
+
+def _phase_row(args, statements):
+    source = _generate(args, statements)
+    tokens = Lexer(source).tokenize()
+    ast = Parser(tokens).parse()
+    semantic = SemanticAnalyzer()
+    semantic.analyze(ast)
+    names = semantic.table.names
+    nodes = len(parse_compact(Lexer(source).token_stream()))
+    runs = {
+        "lexer": lambda: Lexer(source).tokenize(),
+        "parser": lambda: Parser(tokens).parse(),
+        "semantic": lambda: SemanticAnalyzer().analyze(ast),
+        "tac": lambda: TACGenerator(names).generate(ast),
+        "printer": lambda: ASTPrinter(io.StringIO()).print(ast),
+    }
+    row = {"statements": statements, "bytes": len(source), "tokens": len(tokens),
+           "nodes": nodes, "phases": {}}
+    print(f"{statements} comandos: {len(source)} bytes, {len(tokens)} tokens, {nodes} nós")
+    for name in PHASES:
+        elapsed, _ = _best_of(runs[name], args.repeat)
+        peak = _measure(runs[name])[2]
+        # Lexer e parser por token; as passadas sobre a AST por nó.
+        count, unit = (len(tokens), "tokens") if name in ("lexer", "parser") else (nodes, "nós")
+        row["phases"][name] = {"seconds": elapsed, "per_second": count / elapsed,
+                               "peak_bytes": peak}
+        print(f"  {name:9} {elapsed:7.3f} s  {count / elapsed / 1e6:6.2f} M {unit}/s  "
+              f"pico {peak / 2**20:7.1f} MiB")
+    return row
+
+
+def _compare(report, baseline, tolerance):
+    # Devolve as fases mais lentas que na base além da tolerância.
+    if report["options"] != baseline.get("options"):
+        print("aviso: a base foi medida com outras opções do gerador")
+    old = {(row["statements"], name): phase["seconds"]
+           for row in baseline["results"] for name, phase in row["phases"].items()}
+    regressions = []
+    print(f"comparação com a base (tolerância {tolerance:.0%}):")
+    for row in report["results"]:
+        for name, phase in row["phases"].items():
+            before = old.get((row["statements"], name))
+            if before is None:
+                continue
+            ratio = phase["seconds"] / before
+            slower = ratio > 1 + tolerance
+            if slower:
+                regressions.append((row["statements"], name))
+            print(f"  {row['statements']:>8} {name:9} {before:7.3f} s -> {phase['seconds']:7.3f} s  "
+                  f"{ratio:5.2f}x{'  REGRESSÃO' if slower else ''}")
+    return regressions
+
+
+def bench_phases(args):
+    report = {
+        "experiment": "phases",
+        "python": platform.python_version(),
+        "options": {"seed": args.seed, "identifiers": args.identifiers, "depth": args.depth,
+                    "expr_depth": args.expr_depth, "expr_width": args.expr_width,
+                    "string_density": args.string_density},
+        "results": [_phase_row(args, statements) for statements in args.sizes],
+    }
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = _compare(report, baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} fase(s) mais lenta(s) que em {args.baseline}")
+
+
+EXPERIMENTS = {
+    "ast-memory": bench_ast_memory,
+    "optimizer": bench_optimizer,
+    "tac": bench_tac_generation,
+    "backend": bench_backend,
+    "cache": bench_cache,
+    "incremental": bench_incremental,
+    "fused": bench_fused,
+    "typed": bench_typed,
+    "loops": bench_loops,
+    "ssa": bench_ssa,
+    "regalloc": bench_regalloc,
+    "bytecode": bench_bytecode,
+    "ast-dump": bench_ast_dump,
+    "phases": bench_phases,
+}
+
+
+def _sizes(text):
+    try:
+        sizes = [int(part) for part in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de tamanhos inválida: {text}")
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError(f"lista de tamanhos inválida: {text}")
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do compilador")
+    parser.add_argument("experiment", choices=sorted(EXPERIMENTS))
+    parser.add_argument("--nodes", type=int, default=1_000_000)
+    parser.add_argument("--statements", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    # Gerador de programas (workload.py).
+    parser.add_argument("--identifiers", type=int, default=16)
+    parser.add_argument("--depth", type=int, default=3, help="aninhamento de if/while")
+    parser.add_argument("--expr-depth", type=int, default=3)
+    parser.add_argument("--expr-width", type=int, default=2)
+    parser.add_argument("--string-density", type=float, default=0.0)
+    # phases.
+    parser.add_argument("--sizes", type=_sizes, default=[1000, 5000, 20000],
+                        help="números de comandos, separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava o resultado em JSON")
+    parser.add_argument("--baseline", metavar="ARQUIVO",
+                        help="compara com um resultado gravado por --json")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    # regalloc.
+    parser.add_argument("--registers", type=int, help="número fixo de registradores")
+    args = parser.parse_args(argv)
+    EXPERIMENTS[args.experiment](args)
+
+
+if __name__ == "__main__":
+    main()
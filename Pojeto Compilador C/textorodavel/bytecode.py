@@ -0,0 +1,360 @@
+import mmap
+import os
+import struct
+import tempfile
+
+from lexer import TokenType
+from tac import (TEMP, VARIABLE, CONSTANT, Opcode, OperandKind, constant, label, temp,
+                 variable)
+
+# ===============================
+# Bytecode em arquivo (.mcb)
+# ===============================
+# Formato binário versionado para o TAC de um programa já compilado: rodar
+# um .mcb não passa por Lexer, Parser nem pela checagem. Tudo em
+# little-endian:
+#
+#   cabeçalho   magic "MCBC", versão (u16), flags (u16), e para cada seção
+#               (código, constantes, símbolos, linhas) o número de
+#               entradas e o offset no arquivo (u32 cada)
+#   código      uma instrução por entrada, 16 bytes: opcode e três
+#               operandos (u32 cada)
+#   constantes  offsets (u32, relativos ao começo da seção) e, para cada
+#               constante, uma tag (u8) e o valor: int em i64, float em
+#               f64, bool em u8, string e int grande em u32 + bytes
+#   símbolos    offsets e, para cada variável, o tipo (u8) e o nome
+#               (u32 + UTF-8)
+#   linhas      opcional (flag LINES): pares (primeira instrução, linha)
+#               em ordem, um por comando de topo da fonte
+#
+# Um operando é NONE ou o tipo (OperandKind) nos 2 bits altos e, nos
+# outros 30, o número do temporário, o índice no pool de constantes, o
+# índice na tabela de símbolos ou o número do rótulo.
+#
+# BytecodeFile mapeia o arquivo com mmap e decodifica cada instrução,
+# constante e símbolo só quando pedido (e guarda o resultado), sem copiar
+# o arquivo para a memória.
+
+MAGIC = b"MCBC"
+FORMAT_VERSION = 1
+LINES = 1
+
+NONE = 0xFFFFFFFF
+_INDEX_BITS = 30
+_INDEX_MASK = (1 << _INDEX_BITS) - 1
+
+_HEADER = struct.Struct("<4sHH8I")
+_INSTRUCTION = struct.Struct("<4I")
+_OFFSET = struct.Struct("<I")
+_LENGTH = struct.Struct("<I")
+_LINE = struct.Struct("<2I")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+_TAG_INT = 0
+_TAG_FLOAT = 1
+_TAG_STRING = 2
+_TAG_BOOL = 3
+_TAG_BIG_INT = 4
+
+_TYPES = (TokenType.INT, TokenType.FLOAT, TokenType.STRING)
+_NO_TYPE = 0xFF
+
+_OPCODES = tuple(Opcode)
+
+
+# ===============================
+# Escrita
+# ===============================
+
+def _constant_entry(value):
+    if isinstance(value, bool):
+        return bytes((_TAG_BOOL, int(value)))
+    if isinstance(value, int):
+        if -2**63 <= value < 2**63:
+            return bytes((_TAG_INT,)) + _INT.pack(value)
+        digits = str(value).encode()
+        return bytes((_TAG_BIG_INT,)) + _LENGTH.pack(len(digits)) + digits
+    if isinstance(value, float):
+        return bytes((_TAG_FLOAT,)) + _FLOAT.pack(value)
+    data = value.encode("utf-8")
+    return bytes((_TAG_STRING,)) + _LENGTH.pack(len(data)) + data
+
+
+def _symbol_entry(name, var_type):
+    data = name.encode("utf-8")
+    kind = _TYPES.index(var_type) if var_type in _TYPES else _NO_TYPE
+    return bytes((kind,)) + _LENGTH.pack(len(data)) + data
+
+
+def _table(entries):
+    # Seção com offsets seguidos das entradas.
+    offsets = bytearray()
+    position = _OFFSET.size * len(entries)
+    for entry in entries:
+        offsets += _OFFSET.pack(position)
+        position += len(entry)
+    return bytes(offsets) + b"".join(entries)
+
+
+def encode_bytecode(code, symbols=None, lines=None):
+    # Bytes do arquivo para o TAC code; symbols é o dict nome -> tipo da
+    # análise semântica (variáveis fora dele ficam sem tipo).
+    symbols = symbols or {}
+    constants = {}
+    names = {name: index for index, name in enumerate(symbols)}
+    body = bytearray()
+    pack = _INSTRUCTION.pack
+
+    def ref(operand):
+        if operand is None:
+            return NONE
+        kind = operand.kind
+        if kind is CONSTANT:
+            index = constants.setdefault(operand, len(constants))
+        elif kind is VARIABLE:
+            index = names.setdefault(operand.name, len(names))
+        elif kind is TEMP:
+            index = int(operand.name[1:])
+        else:
+            if operand.name[:1] != "L" or not operand.name[1:].isdigit():
+                raise ValueError(f"Rótulo sem número não cabe no bytecode: {operand.name}")
+            index = int(operand.name[1:])
+        if index > _INDEX_MASK:
+            raise ValueError(f"Operando demais para o bytecode: {operand.name}")
+        return kind << _INDEX_BITS | index
+
+    for instr in code:
+        body += pack(instr[0], ref(instr[1]), ref(instr[2]), ref(instr[3]))
+
+    constant_section = _table([_constant_entry(operand.value) for operand in constants])
+    symbol_section = _table([_symbol_entry(name, symbols.get(name)) for name in names])
+    line_section = b"".join(_LINE.pack(first, line) for first, line in lines or ())
+
+    sections = (bytes(body), constant_section, symbol_section, line_section)
+    counts = (len(code), len(constants), len(names), len(lines or ()))
+    offset = _HEADER.size
+    layout = []
+    for section, count in zip(sections, counts):
+        layout += [count, offset]
+        offset += len(section)
+    flags = LINES if lines is not None else 0
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, flags, *layout) + b"".join(sections)
+
+
+def save_bytecode(path, code, symbols=None, lines=None):
+    # Escreve num temporário do mesmo diretório e publica com os.replace:
+    # quem estiver rodando o arquivo antigo (mapeado) não vê uma escrita
+    # pela metade.
+    data = encode_bytecode(code, symbols, lines)
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# ===============================
+# Leitura
+# ===============================
+
+class BytecodeFile:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            try:
+                self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Arquivo vazio: mmap não aceita tamanho zero.
+                raise ValueError(f"Bytecode inválido: {path}")
+        try:
+            self._read_header(path)
+        except BaseException:
+            self.data.close()
+            raise
+        self._instructions = [None] * self.count
+        self._constants = [None] * self.constant_count
+        self._symbols = [None] * self.symbol_count
+
+    def _read_header(self, path):
+        data = self.data
+        if len(data) < _HEADER.size:
+            raise ValueError(f"Bytecode inválido: {path}")
+        fields = _HEADER.unpack_from(data, 0)
+        if fields[0] != MAGIC:
+            raise ValueError(f"Bytecode inválido: {path}")
+        if fields[1] != FORMAT_VERSION:
+            raise ValueError(f"Versão de bytecode {fields[1]} não suportada: {path}")
+        self.flags = fields[2]
+        (self.count, self.code_offset, self.constant_count, self.constant_offset,
+         self.symbol_count, self.symbol_offset, self.line_count, self.line_offset) = fields[3:]
+        ends = (
+            self.code_offset + self.count * _INSTRUCTION.size,
+            self.constant_offset + self.constant_count * _OFFSET.size,
+            self.symbol_offset + self.symbol_count * _OFFSET.size,
+            self.line_offset + self.line_count * _LINE.size,
+        )
+        if max(ends) > len(data):
+            raise ValueError(f"Bytecode truncado: {path}")
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------- Instruções ----------
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Instrução fora do bytecode")
+        instr = self._instructions[index]
+        if instr is None:
+            opcode, result, arg1, arg2 = _INSTRUCTION.unpack_from(
+                self.data, self.code_offset + index * _INSTRUCTION.size)
+            if opcode >= len(_OPCODES):
+                raise ValueError(f"Opcode inválido no bytecode: {opcode}")
+            instr = self._instructions[index] = (
+                _OPCODES[opcode], self._operand(result), self._operand(arg1), self._operand(arg2))
+        return instr
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def instructions(self):
+        # Todas as instruções de uma vez (para a VM): os registros são lidos
+        # direto do mapeamento e cada operando distinto é decodificado uma
+        # vez só.
+        operands = {NONE: None}
+        opcodes = _OPCODES
+        decode = self._operand
+        cache = self._instructions
+        start = self.code_offset
+        with memoryview(self.data)[start:start + self.count * _INSTRUCTION.size] as view:
+            for index, (opcode, *refs) in enumerate(_INSTRUCTION.iter_unpack(view)):
+                if cache[index] is not None:
+                    continue
+                if opcode >= len(opcodes):
+                    raise ValueError(f"Opcode inválido no bytecode: {opcode}")
+                args = []
+                for ref in refs:
+                    operand = operands.get(ref, operands)
+                    if operand is operands:
+                        operand = operands[ref] = decode(ref)
+                    args.append(operand)
+                cache[index] = (opcodes[opcode], *args)
+        return list(cache)
+
+    def _operand(self, ref):
+        if ref == NONE:
+            return None
+        kind = ref >> _INDEX_BITS
+        index = ref & _INDEX_MASK
+        if kind == OperandKind.TEMP:
+            return temp(index)
+        if kind == OperandKind.VARIABLE:
+            return variable(self.symbol(index)[0])
+        if kind == OperandKind.CONSTANT:
+            return self.constant(index)
+        return label(index)
+
+    # ---------- Constantes e símbolos ----------
+
+    def _entry(self, section, count, index):
+        if not 0 <= index < count:
+            raise ValueError(f"Índice inválido no bytecode: {index}")
+        return section + _OFFSET.unpack_from(self.data, section + index * _OFFSET.size)[0]
+
+    def constant(self, index):
+        operand = self._constants[index] if 0 <= index < self.constant_count else None
+        if operand is None:
+            position = self._entry(self.constant_offset, self.constant_count, index)
+            data = self.data
+            tag = data[position]
+            position += 1
+            if tag == _TAG_INT:
+                value = _INT.unpack_from(data, position)[0]
+            elif tag == _TAG_FLOAT:
+                value = _FLOAT.unpack_from(data, position)[0]
+            elif tag == _TAG_BOOL:
+                value = bool(data[position])
+            elif tag in (_TAG_STRING, _TAG_BIG_INT):
+                size = _LENGTH.unpack_from(data, position)[0]
+                text = data[position + 4:position + 4 + size].decode("utf-8")
+                value = text if tag == _TAG_STRING else int(text)
+            else:
+                raise ValueError(f"Constante inválida no bytecode: tag {tag}")
+            operand = self._constants[index] = constant(value)
+        return operand
+
+    def symbol(self, index):
+        # (nome, tipo ou None) da variável index.
+        entry = self._symbols[index] if 0 <= index < self.symbol_count else None
+        if entry is None:
+            position = self._entry(self.symbol_offset, self.symbol_count, index)
+            data = self.data
+            kind = data[position]
+            size = _LENGTH.unpack_from(data, position + 1)[0]
+            name = data[position + 5:position + 5 + size].decode("utf-8")
+            entry = self._symbols[index] = (name, _TYPES[kind] if kind < len(_TYPES) else None)
+        return entry
+
+    def symbols(self):
+        # Tipos das variáveis, como a tabela de símbolos da análise.
+        result = {}
+        for index in range(self.symbol_count):
+            name, var_type = self.symbol(index)
+            if var_type is not None:
+                result[name] = var_type
+        return result
+
+    # ---------- Linhas ----------
+
+    def has_lines(self):
+        return bool(self.flags & LINES)
+
+    def line_table(self):
+        # Pares (primeira instrução, linha) da seção, ou None sem ela.
+        if not self.has_lines():
+            return None
+        data = self.data
+        offset = self.line_offset
+        return [_LINE.unpack_from(data, offset + index * _LINE.size)
+                for index in range(self.line_count)]
+
+    def line(self, index):
+        # Linha da fonte do comando que gerou a instrução index, ou None.
+        count = self.line_count
+        if not count:
+            return None
+        data = self.data
+        offset = self.line_offset
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if _LINE.unpack_from(data, offset + middle * _LINE.size)[0] <= index:
+                low = middle + 1
+            else:
+                high = middle
+        if not low:
+            return None
+        return _LINE.unpack_from(data, offset + (low - 1) * _LINE.size)[1]
+
+
+def load_bytecode(path):
+    return BytecodeFile(path)
@@ -0,0 +1,532 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from lexer import TokenType
+from parser import *
+from visitor import Visitor, children
+
+# ===============================
+# Backend C
+# ===============================
+# Traduz a AST checada para C99. Os tipos vêm do SemanticAnalyzer:
+#
+#   int     long long   (64 bits; o Python não tem limite, o C tem)
+#   float   mc_num      (double com o tipo Python do valor; ver abaixo)
+#   string  const char* (concatenação aloca; nada é liberado)
+#
+# Comparações, &&, || e ! produzem int 0/1, como os booleanos da VM
+# impressos como 1/0. && e || avaliam os dois lados, como no TAC. Divisão
+# por zero, fim da entrada em read e entrada inválida encerram o programa
+# com erro depois de escrever a saída pendente. Uma conta int que passa de
+# 64 bits também: a VM daria o valor exato, e em C o estouro de long long
+# é comportamento indefinido, então +, -, * e / são checados com os
+# __builtin_*_overflow do gcc/clang (e read com errno).
+#
+# O checador dá a uma comparação o tipo dos operandos, então uma variável
+# float pode guardar um bool, e com ele a VM segue as regras do Python: o
+# bool é impresso como 1/0, bool + bool é int e bool / bool é divisão
+# inteira. Por isso uma variável float guarda, junto do double, se o valor
+# é float, int ou bool (mc_num). Nas expressões esse tipo é resolvido na
+# geração sempre que possível (literais, comparações) e só as contas entre
+# variáveis float o calculam na execução. Valores int vindos de bools
+# ficam no double (exatos até 2**53).
+#
+# Operações que no Python só falhariam na execução (por exemplo "-" entre
+# strings) são rejeitadas na geração do código.
+
+INT = "int"
+FLOAT = "float"
+STRING = "string"
+
+_TYPES = {
+    TokenType.INT: INT,
+    TokenType.FLOAT: FLOAT,
+    TokenType.STRING: STRING,
+}
+
+# Tipos das expressões no C, além dos três acima: BOOL é um int 0/1 e NUM
+# um mc_num, cujo tipo Python só se sabe na execução.
+BOOL = "bool"
+NUM = "num"
+
+_DEFAULTS = {INT: "0LL", FLOAT: "mc_num_make(0.0, MC_FLOAT)", STRING: '""'}
+
+_DECLARATIONS = {
+    INT: "long long {} = 0;",
+    FLOAT: "mc_num {} = {{0.0, MC_FLOAT}};",
+    STRING: 'const char *{} = "";',
+}
+
+_COMPARISONS = ("==", "!=", "<", ">", "<=", ">=")
+
+RUNTIME = r"""#include <errno.h>
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+static void mc_error(const char *message) {
+    fflush(stdout);
+    fprintf(stderr, "Erro de execução: %s\n", message);
+    exit(1);
+}
+
+static long long mc_add_int(long long a, long long b) {
+    long long r;
+    if (__builtin_add_overflow(a, b, &r)) mc_error("Estouro de inteiro");
+    return r;
+}
+
+static long long mc_sub_int(long long a, long long b) {
+    long long r;
+    if (__builtin_sub_overflow(a, b, &r)) mc_error("Estouro de inteiro");
+    return r;
+}
+
+static long long mc_mul_int(long long a, long long b) {
+    long long r;
+    if (__builtin_mul_overflow(a, b, &r)) mc_error("Estouro de inteiro");
+    return r;
+}
+
+static long long mc_div_int(long long a, long long b) {
+    if (b == 0) mc_error("Divisão por zero");
+    if (b == -1) return mc_sub_int(0, a);  /* LLONG_MIN / -1 */
+    return a / b;
+}
+
+static double mc_div_float(double a, double b) {
+    if (b == 0) mc_error("Divisão por zero");
+    return a / b;
+}
+
+/* int -> double escondido do otimizador: o gcc supõe que um inteiro
+   convertido nunca vira -0.0 e troca 0.0 - (double) n por -(double) n,
+   que dá -0.0 quando n é 0 (o Python dá 0.0). */
+static double mc_double(long long x) {
+    volatile double d = (double) x;
+    return d;
+}
+
+/* Valor de uma variável float: o double e o tipo que ele teria na VM. */
+enum { MC_FLOAT, MC_INT, MC_BOOL };
+typedef struct { double v; int k; } mc_num;
+
+static mc_num mc_num_make(double v, int k) {
+    mc_num n;
+    n.v = k == MC_FLOAT ? v : v + 0.0;  /* int não tem -0 */
+    n.k = k;
+    return n;
+}
+
+static mc_num mc_num_add(mc_num a, mc_num b) {
+    return mc_num_make(a.v + b.v, a.k && b.k ? MC_INT : MC_FLOAT);
+}
+
+static mc_num mc_num_sub(mc_num a, mc_num b) {
+    return mc_num_make(a.v - b.v, a.k && b.k ? MC_INT : MC_FLOAT);
+}
+
+static mc_num mc_num_mul(mc_num a, mc_num b) {
+    return mc_num_make(a.v * b.v, a.k && b.k ? MC_INT : MC_FLOAT);
+}
+
+static mc_num mc_num_div(mc_num a, mc_num b) {
+    if (b.v == 0) mc_error("Divisão por zero");
+    if (a.k == MC_BOOL && b.k == MC_BOOL) return mc_num_make(a.v / b.v, MC_INT);
+    return mc_num_make(a.v / b.v, MC_FLOAT);
+}
+
+static mc_num mc_num_neg(mc_num a) {
+    return mc_num_make(-a.v, a.k ? MC_INT : MC_FLOAT);
+}
+
+static const char *mc_concat(const char *a, const char *b) {
+    size_t la = strlen(a), lb = strlen(b);
+    char *s = malloc(la + lb + 1);
+    if (!s) mc_error("Memória insuficiente");
+    memcpy(s, a, la);
+    memcpy(s + la, b, lb + 1);
+    return s;
+}
+
+static void mc_print_int(long long x) {
+    printf("%lld\n", x);
+}
+
+static void mc_print_string(const char *s) {
+    fputs(s, stdout);
+    putchar('\n');
+}
+
+/* Mesmo texto que repr(float) no Python: menor número de dígitos que
+   reconstrói o valor, notação científica fora de 1e-4 <= |x| < 1e16. */
+static void mc_print_float(double x) {
+    char buf[40], digits[20], out[64];
+    int precision, exponent, count = 0, point, i, n = 0;
+    char *p;
+    if (isnan(x)) { puts("nan"); return; }
+    if (isinf(x)) { puts(x > 0 ? "inf" : "-inf"); return; }
+    if (x == 0) { puts(signbit(x) ? "-0.0" : "0.0"); return; }
+    for (precision = 1; precision <= 17; precision++) {
+        snprintf(buf, sizeof buf, "%.*e", precision - 1, x);
+        if (strtod(buf, NULL) == x) break;
+    }
+    p = buf;
+    if (*p == '-') out[n++] = *p++;
+    for (; *p != 'e'; p++)
+        if (*p != '.') digits[count++] = *p;
+    while (count > 1 && digits[count - 1] == '0') count--;
+    exponent = atoi(p + 1);
+    if (exponent < -4 || exponent >= 16) {
+        out[n++] = digits[0];
+        if (count > 1) {
+            out[n++] = '.';
+            for (i = 1; i < count; i++) out[n++] = digits[i];
+        }
+        n += snprintf(out + n, sizeof out - n, "e%c%02d", exponent < 0 ? '-' : '+',
+                      exponent < 0 ? -exponent : exponent);
+    } else {
+        point = exponent + 1;
+        if (point <= 0) {
+            out[n++] = '0';
+            out[n++] = '.';
+            for (i = 0; i < -point; i++) out[n++] = '0';
+            for (i = 0; i < count; i++) out[n++] = digits[i];
+        } else {
+            for (i = 0; i < point; i++) out[n++] = i < count ? digits[i] : '0';
+            out[n++] = '.';
+            if (point >= count) out[n++] = '0';
+            for (i = point; i < count; i++) out[n++] = digits[i];
+        }
+        out[n] = '\0';
+    }
+    puts(out);
+}
+
+static void mc_print_num(mc_num x) {
+    if (x.k == MC_FLOAT) mc_print_float(x.v);
+    else printf("%lld\n", (long long) x.v);
+}
+
+static char *mc_read_line(void) {
+    size_t size = 64, length = 0;
+    char *line = malloc(size);
+    int c;
+    fflush(stdout);
+    if (!line) mc_error("Memória insuficiente");
+    while ((c = getchar()) != EOF && c != '\n') {
+        if (length + 1 >= size) {
+            size *= 2;
+            line = realloc(line, size);
+            if (!line) mc_error("Memória insuficiente");
+        }
+        line[length++] = (char) c;
+    }
+    if (c == EOF && length == 0) mc_error("Fim da entrada durante read");
+    if (length > 0 && line[length - 1] == '\r') length--;
+    line[length] = '\0';
+    return line;
+}
+
+static long long mc_read_int(void) {
+    char *line = mc_read_line(), *end;
+    long long value;
+    errno = 0;
+    value = strtoll(line, &end, 10);
+    while (*end == ' ' || *end == '\t') end++;
+    if (end == line || *end != '\0') mc_error("Entrada inválida para int");
+    if (errno == ERANGE) mc_error("Estouro de inteiro");
+    free(line);
+    return value;
+}
+
+static double mc_read_float(void) {
+    char *line = mc_read_line(), *end;
+    double value = strtod(line, &end);
+    while (*end == ' ' || *end == '\t') end++;
+    if (end == line || *end != '\0') mc_error("Entrada inválida para float");
+    free(line);
+    return value;
+}
+
+static const char *mc_read_string(void) {
+    return mc_read_line();
+}
+"""
+
+_PRINT = {INT: "mc_print_int", BOOL: "mc_print_int", FLOAT: "mc_print_float",
+          NUM: "mc_print_num", STRING: "mc_print_string"}
+_READ = {INT: "mc_read_int", FLOAT: "mc_num_make(mc_read_float(), MC_FLOAT)",
+         STRING: "mc_read_string"}
+_INT_OPS = {"+": "mc_add_int", "-": "mc_sub_int", "*": "mc_mul_int", "/": "mc_div_int"}
+_NUM_OPS = {"+": "mc_num_add", "-": "mc_num_sub", "*": "mc_num_mul", "/": "mc_num_div"}
+
+
+class CBackend(Visitor):
+    # Visitante sem recursão (ver visitor.py): comandos emitem linhas e
+    # cada expressão devolve (código C, tipo C).
+    prefix = "gen_"
+
+    def __init__(self, var_types):
+        self.var_types = var_types
+        # var_types está na ordem dos slots: o nome de cada slot.
+        self.names = list(var_types)
+        self.lines = []
+        self.depth = 1
+
+    def emit(self, line):
+        self.lines.append("    " * self.depth + line)
+
+    def generate(self, node):
+        return self.visit(node)
+
+    def source(self, program):
+        self.lines = [RUNTIME, "int main(void) {"]
+        for name, var_type in self.var_types.items():
+            self.emit(_DECLARATIONS[_TYPES[var_type]].format(_local(name)))
+        self.generate(program)
+        self.emit("return 0;")
+        self.lines.append("}")
+        return "\n".join(self.lines) + "\n"
+
+    def gen_None(self, node):
+        return None
+
+    # =========================
+    # Program & Statements
+    # =========================
+
+    @children("statements")
+    def gen_Program(self, node, statements):
+        pass
+
+    def _open_block(self, node):
+        self.emit("{")
+        self.depth += 1
+
+    @children("statements", enter=_open_block)
+    def gen_Block(self, node, statements):
+        self.depth -= 1
+        self.emit("}")
+
+    @children("initializer")
+    def gen_VarDecl(self, node, value):
+        name = self.names[node.slot]
+        if node.initializer:
+            self.assign(name, value)
+        elif "." in name:
+            # Variável de bloco: nova a cada execução da declaração.
+            self.emit(f"{_local(name)} = {_DEFAULTS[_TYPES[node.var_type]]};")
+
+    @children("value")
+    def gen_Assignment(self, node, value):
+        self.assign(self.names[node.slot], value)
+
+    def assign(self, name, value):
+        code, expr_type = value
+        target_type = _TYPES[self.var_types[name]]
+        if (target_type == STRING) != (expr_type == STRING):
+            raise Exception(f"Backend C: valor {expr_type} atribuído à variável "
+                            f"{target_type} '{name}'")
+        if target_type == FLOAT:
+            code = _num(code, expr_type)
+        self.emit(f"{_local(name)} = {code};")
+
+    @children("expressions")
+    def gen_Print(self, node, expressions):
+        for code, expr_type in expressions:
+            self.emit(f"{_PRINT[expr_type]}({code});")
+
+    def gen_Read(self, node):
+        name = self.names[node.slot]
+        read = _READ[_TYPES[self.var_types[name]]]
+        self.emit(f"{_local(name)} = {read if '(' in read else read + '()'};")
+
+    # =========================
+    # Control Flow
+    # =========================
+
+    def gen_If(self, node):
+        condition = yield node.condition
+        self.emit(f"if ({_truth(*condition)}) {{")
+        self.depth += 1
+        for stmt in _body(node.then_branch):
+            yield stmt
+        self.depth -= 1
+        if node.else_branch:
+            self.emit("} else {")
+            self.depth += 1
+            for stmt in _body(node.else_branch):
+                yield stmt
+            self.depth -= 1
+        self.emit("}")
+
+    def gen_While(self, node):
+        condition = yield node.condition
+        self.emit(f"while ({_truth(*condition)}) {{")
+        self.depth += 1
+        for stmt in _body(node.body):
+            yield stmt
+        self.depth -= 1
+        self.emit("}")
+
+    # =========================
+    # Expressions
+    # =========================
+    # Cada expressão devolve (código C, tipo C).
+
+    @children("left", "right")
+    def gen_BinaryExpr(self, node, left, right):
+        left, left_type = left
+        right, right_type = right
+        op = node.operator.lexeme
+        if op in ("&&", "||"):
+            c_op = "&" if op == "&&" else "|"
+            return f"({_truth(left, left_type)} {c_op} {_truth(right, right_type)})", BOOL
+        strings = (left_type == STRING) + (right_type == STRING)
+        if strings == 1 or (strings == 2 and op not in _COMPARISONS and op != "+"):
+            raise Exception(f"Backend C: operação '{op}' não suportada entre "
+                            f"{left_type} e {right_type}")
+        if strings == 2:
+            if op == "+":
+                return f"mc_concat({left}, {right})", STRING
+            return f"(strcmp({left}, {right}) {op} 0)", BOOL
+        types = (left_type, right_type)
+        if op in _COMPARISONS:
+            if FLOAT in types or NUM in types:
+                left, right = _double(left, left_type), _double(right, right_type)
+            return f"({left} {op} {right})", BOOL
+        if node.expr_type != TokenType.FLOAT:
+            # int (ou bools guardados em int): sempre aritmética inteira.
+            return f"{_INT_OPS[op]}({left}, {right})", INT
+        # Contexto float, com as regras do Python para bool e int.
+        if FLOAT in types:
+            left, right = _double(left, left_type), _double(right, right_type)
+            if op == "/":
+                return f"mc_div_float({left}, {right})", FLOAT
+            return f"({left} {op} {right})", FLOAT
+        if NUM in types:
+            return f"{_NUM_OPS[op]}({_num(left, left_type)}, {_num(right, right_type)})", NUM
+        if op != "/":
+            return f"{_INT_OPS[op]}({left}, {right})", INT
+        if types == (BOOL, BOOL):
+            return f"mc_div_int({left}, {right})", INT
+        return f"mc_div_float({_double(left, left_type)}, {_double(right, right_type)})", FLOAT
+
+    @children("expr")
+    def gen_UnaryExpr(self, node, expr):
+        expr, expr_type = expr
+        if node.operator.lexeme == "!":
+            return f"(!{_truth(expr, expr_type)})", BOOL
+        if expr_type == STRING:
+            raise Exception("Backend C: operação '-' não suportada em string")
+        if expr_type == NUM:
+            return f"mc_num_neg({expr})", NUM
+        if expr_type == BOOL:
+            return f"(-(long long) {expr})", INT
+        if expr_type == INT:
+            return f"mc_sub_int(0, {expr})", INT
+        return f"(-{expr})", expr_type
+
+    def gen_Literal(self, node):
+        if node.literal_type == TokenType.STRING:
+            return _c_string(node.value[1:-1]), STRING
+        if node.literal_type == TokenType.FLOAT:
+            return repr(node.value), FLOAT
+        if not -2**63 <= node.value < 2**63:
+            raise Exception(f"Backend C: inteiro {node.value} não cabe em 64 bits")
+        return f"{node.value}LL", INT
+
+    def gen_Variable(self, node):
+        name = self.names[node.slot]
+        var_type = _TYPES[self.var_types[name]]
+        return _local(name), NUM if var_type == FLOAT else var_type
+
+
+def _body(node):
+    # Comandos do corpo de um if/while, que já está entre chaves: um Block
+    # não precisa de outras.
+    if isinstance(node, Block):
+        return node.statements
+    return (node,)
+
+
+def _local(name):
+    # Variáveis de blocos internos se chamam "nome.slot" (ver SymbolTable).
+    base, _, slot = name.partition(".")
+    return f"s{slot}_{base}" if slot else f"v_{name}"
+
+
+def _truth(code, code_type):
+    if code_type == STRING:
+        return f"({code}[0] != '\\0')"
+    if code_type == NUM:
+        return f"({code}.v != 0)"
+    return f"({code} != 0)"
+
+
+def _double(code, code_type):
+    if code_type == NUM:
+        return f"{code}.v"
+    if code_type == FLOAT:
+        return code
+    return f"mc_double({code})"
+
+
+def _num(code, code_type):
+    if code_type == NUM:
+        return code
+    kind = {FLOAT: "MC_FLOAT", INT: "MC_INT", BOOL: "MC_BOOL"}[code_type]
+    return f"mc_num_make({_double(code, code_type)}, {kind})"
+
+
+def _c_string(text):
+    # Bytes UTF-8 com escapes octais de 3 dígitos para tudo que não é
+    # ASCII imprimível (e para aspas e barras).
+    parts = []
+    for byte in text.encode("utf-8"):
+        if 32 <= byte < 127 and byte not in (ord('"'), ord("\\"), ord("?")):
+            parts.append(chr(byte))
+        else:
+            parts.append(f"\\{byte:03o}")
+    return '"' + "".join(parts) + '"'
+
+
+# ===============================
+# Compilação com o cc do sistema
+# ===============================
+
+def find_cc():
+    cc = os.environ.get("CC", "cc")
+    path = shutil.which(cc)
+    if path is None:
+        raise RuntimeError(f"Compilador C não encontrado: {cc}")
+    return path
+
+
+def generate_c(ast, var_types):
+    return CBackend(var_types).source(ast)
+
+
+def build_executable(c_source, output, flags=("-std=c99", "-O2")):
+    with tempfile.TemporaryDirectory() as directory:
+        c_path = os.path.join(directory, "program.c")
+        with open(c_path, "w", encoding="utf-8") as file:
+            file.write(c_source)
+        result = subprocess.run([find_cc(), *flags, "-o", output, c_path, "-lm"],
+                                capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao compilar o código C:\n{result.stderr}")
+    return output
+
+
+def compile_and_run(ast, var_types, stdin=None, stdout=None):
+    # Compila para um executável temporário e o executa; devolve o código
+    # de saída do programa.
+    with tempfile.TemporaryDirectory() as directory:
+        executable = build_executable(generate_c(ast, var_types),
+                                      os.path.join(directory, "program"))
+        return subprocess.run([executable], stdin=stdin, stdout=stdout).returncode
@@ -0,0 +1,281 @@
+import gc
+import hashlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from lexer import Lexer
+from parser import Parser
+from fused import check_and_generate
+from ast_serializer import dump_ast, load_ast
+from instrumentation import count_nodes, count_tac, count_tokens, phase
+
+# ===============================
+# Cache de compilação em disco
+# ===============================
+# Cada entrada guarda o resultado do front end (AST, tabela de símbolos,
+# TAC e artefatos extras) de uma fonte, endereçado pelo SHA-256 de
+#
+#   versão do compilador + fonte
+#
+# onde a versão é o hash dos próprios módulos do compilador e da versão
+# do Python. Um acerto devolve tudo sem rodar Lexer, Parser nem
+# FusedCompiler.
+#
+# Layout: <diretório>/<2 primeiros hex>/<hash>.pkl. Escritas vão para um
+# arquivo temporário no mesmo diretório e são publicadas com os.replace,
+# então leitores concorrentes (outros processos) veem a entrada inteira
+# ou nenhuma. O mtime de cada entrada é a data do último uso: acertos
+# atualizam o mtime e a remoção por tamanho (LRU) apaga as mais antigas.
+# Entradas ilegíveis ou removidas por outro processo contam como falta.
+#
+# As entradas são pickle: o diretório deve ser confiável (o mesmo cuidado
+# que com __pycache__). A AST não vai como grafo de objetos, que o pickle
+# percorre com recursão (e uma AST funda não seria guardada), mas no
+# formato binário de ast_serializer, plano; ela só é reconstruída quando
+# alguém pede result.ast, então --run e --tac num acerto nem a decodificam.
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_STALE_TEMP_SECONDS = 3600
+
+# Módulos cujo código determina o conteúdo de uma entrada.
+_COMPILER_MODULES = ("lexer", "parser", "semantic", "tac", "fused", "ast_serializer", "cache")
+
+_compiler_versions = {}
+
+
+def compiler_version(*modules):
+    # Hash do código do front end e da versão do Python; outros artefatos
+    # (como os .mcc) passam os módulos a mais de que dependem.
+    version = _compiler_versions.get(modules)
+    if version is None:
+        digest = hashlib.sha256()
+        digest.update(sys.version.encode())
+        digest.update(str(pickle.HIGHEST_PROTOCOL).encode())
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for module in _COMPILER_MODULES + modules:
+            with open(os.path.join(directory, module + ".py"), "rb") as file:
+                digest.update(file.read())
+        version = _compiler_versions[modules] = digest.hexdigest()
+    return version
+
+
+def _without_gc(function, *args):
+    # Carregar uma AST grande cria milhões de objetos de uma vez; com o
+    # coletor ligado, as coletas repetidas custam mais que o próprio pickle
+    # (e não há lixo cíclico a recolher aqui).
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return function(*args)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class CompileResult:
+    __slots__ = ("_ast", "_ast_data", "symbols", "tac", "lines")
+
+    def __init__(self, ast, symbols, tac, lines=None):
+        self._ast = ast
+        # AST no formato binário, enquanto ela não for decodificada.
+        self._ast_data = None
+        self.symbols = symbols
+        self.tac = tac
+        # (primeira instrução, linha da fonte) de cada comando de topo, ou
+        # None; vai para a tabela de linhas do bytecode.
+        self.lines = lines
+
+    @property
+    def ast(self):
+        if self._ast is None and self._ast_data is not None:
+            self._ast = _without_gc(load_ast, io.BytesIO(self._ast_data), "binary")
+            self._ast_data = None
+        return self._ast
+
+    def __getstate__(self):
+        data = self._ast_data
+        if data is None:
+            buffer = io.BytesIO()
+            dump_ast(self._ast, buffer, "binary")
+            data = buffer.getvalue()
+        return (data, self.symbols, self.tac, self.lines)
+
+    def __setstate__(self, state):
+        self._ast = None
+        self._ast_data, self.symbols, self.tac, self.lines = state
+
+
+def compile_source(source):
+    with phase("lexer"):
+        tokens = Lexer(source).token_stream()
+    count_tokens(tokens)
+    token_starts = []
+    with phase("parser"):
+        ast = Parser(tokens).parse(token_starts)
+    count_nodes(ast)
+    code_starts = []
+    with phase("check+tac"):
+        symbols, tac = check_and_generate(ast, code_starts)
+    count_tac(tac)
+    lines = _line_table(tokens, token_starts, code_starts, len(tac))
+    return CompileResult(ast, symbols, tac, lines=lines)
+
+
+def _line_table(tokens, token_starts, code_starts, size):
+    # (primeira instrução, linha) de cada comando de topo que gerou código;
+    # None se o TAC veio das passadas separadas, que não dão as posições.
+    if len(code_starts) != len(token_starts):
+        return None
+    lines = []
+    for index, first in enumerate(code_starts):
+        end = code_starts[index + 1] if index + 1 < len(code_starts) else size
+        if end > first:
+            lines.append((first, tokens.position(token_starts[index])[0]))
+    return lines
+
+
+class CacheStats:
+    __slots__ = ("hits", "misses", "stores", "evictions", "errors")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class CompileCache:
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        self.stats = CacheStats()
+        # Estimativa do tamanho total; só quando passa do limite o
+        # diretório é varrido de novo (pegando também o que outros
+        # processos escreveram).
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source):
+        digest = hashlib.sha256(compiler_version().encode())
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    # ---------- Leitura ----------
+
+    def get(self, source):
+        path = self._path(self.key(source))
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            result = _without_gc(pickle.loads, data)
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        except Exception:
+            # Entrada corrompida: descarta e recompila.
+            self.stats.errors += 1
+            self.stats.misses += 1
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.hits += 1
+        return result
+
+    # ---------- Escrita ----------
+
+    def put(self, source, result):
+        path = self._path(self.key(source))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = _without_gc(pickle.dumps, result, pickle.HIGHEST_PROTOCOL)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        self.stats.stores += 1
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+        return True
+
+    def compile(self, source):
+        # Resultado do cache ou, numa falta, do front end (que é guardado).
+        with phase("cache-load"):
+            result = self.get(source)
+        if result is None:
+            result = compile_source(source)
+            with phase("cache-store"):
+                self.put(source, result)
+        return result
+
+    # ---------- LRU ----------
+
+    def _entries(self):
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".pkl"):
+                    entries.append((info.st_mtime, info.st_size, path))
+                elif name.endswith(".tmp") and now - info.st_mtime > _STALE_TEMP_SECONDS:
+                    # Sobra de um processo que morreu no meio da escrita.
+                    self._remove(path)
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Apaga as entradas usadas há mais tempo até o total caber em 90%
+        # do limite (a folga faz a próxima varredura demorar a acontecer).
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        self._size = total
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                self.stats.evictions += 1
+            total -= size
+        self._size = total
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+        self._size = 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,112 @@
+import argparse
+import os
+import socket
+import sys
+
+from protocol import default_socket_path, recv_frame, send_frame
+
+# ===============================
+# Cliente do servidor de compilação
+# ===============================
+# Envia o pedido ao servidor (server.py) se houver um escutando no
+# socket; senão compila no próprio processo, com a mesma saída. Só
+# protocol.py é importado de início: o compilador só é carregado quando
+# não há servidor.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cliente do servidor de compilação .mc")
+    parser.add_argument("file", nargs="?", default="program.mc",
+                        help="arquivo fonte, ou - para a entrada padrão (padrão: program.mc)")
+    parser.add_argument("--tac", action="store_true", help="escreve o TAC gerado")
+    parser.add_argument("--run", action="store_true", help="executa o programa na VM")
+    parser.add_argument("-O", "--optimize", action="store_true", help="otimiza o TAC")
+    parser.add_argument("--no-pass", action="append", default=[], metavar="PASSO",
+                        help="desliga um passo do otimizador")
+    parser.add_argument("--timeout", type=float, metavar="SEGUNDOS",
+                        help="com --run, interrompe o programa após SEGUNDOS")
+    parser.add_argument("--socket", default=default_socket_path(),
+                        help="caminho do socket Unix (padrão: $MC_SERVER_SOCKET)")
+    parser.add_argument("--local", action="store_true",
+                        help="compila neste processo mesmo com servidor")
+    parser.add_argument("--ping", action="store_true", help="verifica se há servidor")
+    parser.add_argument("--shutdown", action="store_true", help="encerra o servidor")
+    return parser.parse_args(argv)
+
+
+def connect(path):
+    # Socket conectado ao servidor, ou None se não houver um.
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def request(sock, message, stdout=None, stdin=None):
+    # Envia o pedido e atende o servidor até a resposta final: cada trecho
+    # de saída vai para stdout na hora e cada read do programa recebe a
+    # próxima linha de stdin, lida só então.
+    send_frame(sock, message)
+    while True:
+        response = recv_frame(sock)
+        if response is None:
+            raise ConnectionError("O servidor fechou a conexão")
+        if "output" in response:
+            stdout.write(response["output"])
+            stdout.flush()
+        elif "input" in response:
+            send_frame(sock, {"line": stdin.readline()})
+        else:
+            return response
+
+
+def build_request(args):
+    message = {"op": "run" if args.run else "tac" if args.tac else "check",
+               "optimize": args.optimize, "no_pass": args.no_pass, "timeout": args.timeout}
+    if args.file == "-":
+        message["source"] = sys.stdin.read()
+    else:
+        # O servidor pode ter outro diretório de trabalho.
+        message["path"] = os.path.abspath(args.file)
+    return message
+
+
+def compile_locally(message):
+    from server import execute
+    status, error = execute(message, sys.stdout, sys.stdin)
+    sys.stdout.flush()
+    return status, error
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sock = None if args.local else connect(args.socket)
+
+    if args.ping or args.shutdown:
+        if sock is None:
+            print(f"nenhum servidor em {args.socket}", file=sys.stderr)
+            sys.exit(1)
+        with sock:
+            response = request(sock, {"op": "shutdown" if args.shutdown else "ping"})
+        if args.ping:
+            print(f"servidor em {args.socket} (pid {response['pid']})")
+        return
+
+    message = build_request(args)
+    if sock is None:
+        status, error = compile_locally(message)
+    else:
+        with sock:
+            response = request(sock, message, sys.stdout, sys.stdin)
+        status, error = response["status"], response["stderr"]
+
+    if error:
+        print(f"erro: {error}", file=sys.stderr)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
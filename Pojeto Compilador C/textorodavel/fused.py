@@ -0,0 +1,446 @@
+from lexer import TokenType
+from parser import (Assignment, BinaryExpr, Block, If, Literal, Print, Program, Read,
+                    UnaryExpr, VarDecl, Variable, While)
+from semantic import SymbolTable, _needs_scope, check_string_operator
+from tac import (BINARY_OPCODES, COPY, DEFAULT_VALUES, GOTO, IF_FALSE, LABEL, PRINT, READ,
+                 SPECIALIZED, UNARY_OPCODES, constant, label, temp, variable)
+from visitor import Visitor, children
+
+# ===============================
+# Checagem + TAC numa só passada
+# ===============================
+# Faz o trabalho de SemanticAnalyzer e de TACGenerator num único percurso
+# da AST: cada nó é checado e traduzido na mesma visita. Os dois percorrem
+# os filhos na mesma ordem, então o primeiro erro é o mesmo que
+# SemanticAnalyzer levantaria, e o TAC, a tabela de símbolos e a
+# numeração de temporários/rótulos são iguais aos das duas passadas
+# separadas. No primeiro erro a passada para e o TAC parcial é descartado.
+#
+# Os comandos são traduzidos com recursão até _STATEMENT_DEPTH níveis da
+# AST, o caso comum e o caminho mais rápido; um comando mais fundo que
+# isso é traduzido pelo visitante sem recursão (ver visitor.py), que usa
+# o mesmo estado e visita na mesma ordem, então não há limite de
+# profundidade e o resultado é o mesmo. Expressões devolvem (operando,
+# tipo), anotam o tipo no nó (expr_type) e usam a versão da operação para
+# esse tipo.
+
+# Profundidade até onde as expressões são traduzidas com recursão.
+_DEPTH = 50
+# Idem para os comandos, em nós da AST (cada um gasta até 3 quadros da
+# pilha do Python).
+_STATEMENT_DEPTH = 100
+
+_STRING = TokenType.STRING
+
+_BINARY = 0
+_UNARY = 1
+_LITERAL = 2
+_VARIABLE = 3
+
+# Classe do nó de expressão -> tipo; subclasses (como as fachadas de
+# ast_arena) entram na primeira vez que aparecem.
+_KINDS = {BinaryExpr: _BINARY, UnaryExpr: _UNARY, Literal: _LITERAL, Variable: _VARIABLE}
+
+
+def _kind(cls):
+    for base in cls.__mro__:
+        kind = _KINDS.get(base)
+        if kind is not None:
+            _KINDS[cls] = kind
+            return kind
+    raise TypeError(f"Nó desconhecido: {cls.__name__}")
+
+
+class FusedCompiler(Visitor):
+    prefix = "compile_"
+
+    def __init__(self):
+        self.table = SymbolTable()
+        self.code = []
+        self.temp_count = 0
+        self.label_count = 0
+        self.literals = {}
+        # Operando do TAC de cada slot da tabela.
+        self.variables = []
+
+    def generate(self, node):
+        # Checa e traduz node (um Program ou um comando solto, como no
+        # modo streaming); o TAC é acrescentado a self.code.
+        try:
+            self._visit(node, _STATEMENT_DEPTH)
+        except BaseException:
+            self.code.clear()
+            raise
+        return self.code
+
+    def _new_label(self):
+        self.label_count += 1
+        return label(self.label_count)
+
+    # =========================
+    # Caminho recursivo
+    # =========================
+    # Mesma tradução que os métodos compile_* abaixo, com a pilha do
+    # Python. depth é quantos níveis ainda podem ser abertos; no último o
+    # nó vai para o visitante.
+
+    def _visit(self, node, depth):
+        if not depth:
+            return self.visit(node)
+        method = _RECURSIVE.get(type(node))
+        if method is None:
+            method = _recursive_method(type(node))
+        return method(self, node, depth - 1)
+
+    def _program(self, node, depth):
+        visit = self._visit
+        for stmt in node.statements:
+            visit(stmt, depth)
+
+    def _block(self, node, depth):
+        self.table.push_scope()
+        self._program(node, depth)
+        self.table.pop_scope()
+
+    def _scoped(self, node, depth):
+        if _needs_scope(node):
+            self.table.push_scope()
+            self._visit(node, depth)
+            self.table.pop_scope()
+        else:
+            self._visit(node, depth)
+
+    def _var_decl(self, node, depth):
+        table = self.table
+        slot = node.slot = table.declare(node.name, node.var_type)
+        operand = variable(table.names[slot])
+        self.variables.append(operand)
+        if node.initializer:
+            value, value_type = self._value(node.initializer)
+            if value_type != node.var_type:
+                raise Exception("Tipos incompatíveis na inicialização")
+            self.code.append((COPY, operand, value, None))
+        elif table.depths[slot]:
+            default = constant(DEFAULT_VALUES[node.var_type])
+            self.code.append((COPY, operand, default, None))
+
+    def _assignment(self, node, depth):
+        table = self.table
+        slot = node.slot = table.lookup(node.name)
+        value, value_type = self._value(node.value)
+        if table.types[slot] != value_type:
+            raise Exception("Tipos incompatíveis na atribuição")
+        self.code.append((COPY, self.variables[slot], value, None))
+
+    def _print(self, node, depth):
+        append = self.code.append
+        value = self._value
+        for expr in node.expressions:
+            append((PRINT, None, value(expr)[0], None))
+
+    def _read(self, node, depth):
+        slot = node.slot = self.table.lookup(node.name)
+        self.code.append((READ, self.variables[slot], None, None))
+
+    def _if(self, node, depth):
+        cond = self._value(node.condition)[0]
+        label_else = self._new_label()
+        label_end = self._new_label()
+
+        append = self.code.append
+        append((IF_FALSE, label_else, cond, None))
+        self._scoped(node.then_branch, depth)
+        append((GOTO, label_end, None, None))
+        append((LABEL, label_else, None, None))
+        if node.else_branch:
+            self._scoped(node.else_branch, depth)
+        append((LABEL, label_end, None, None))
+
+    def _while(self, node, depth):
+        label_start = self._new_label()
+        label_end = self._new_label()
+
+        append = self.code.append
+        append((LABEL, label_start, None, None))
+        cond = self._value(node.condition)[0]
+        append((IF_FALSE, label_end, cond, None))
+        self._scoped(node.body, depth)
+        append((GOTO, label_start, None, None))
+        append((LABEL, label_end, None, None))
+
+    def _none(self, node, depth):
+        return None, None
+
+    def compile_None(self, node):
+        return None, None
+
+    # =========================
+    # Program & Statements
+    # =========================
+
+    @children("statements")
+    def compile_Program(self, node, statements):
+        pass
+
+    def _push_scope(self, node):
+        self.table.push_scope()
+
+    @children("statements", enter=_push_scope)
+    def compile_Block(self, node, statements):
+        self.table.pop_scope()
+
+    def _declare(self, node):
+        table = self.table
+        slot = node.slot = table.declare(node.name, node.var_type)
+        self.variables.append(variable(table.names[slot]))
+
+    @children("initializer", enter=_declare)
+    def compile_VarDecl(self, node, initializer):
+        operand = self.variables[node.slot]
+        if node.initializer:
+            value, value_type = initializer
+            if value_type != node.var_type:
+                raise Exception("Tipos incompatíveis na inicialização")
+            self.code.append((COPY, operand, value, None))
+        elif self.table.depths[node.slot]:
+            default = constant(DEFAULT_VALUES[node.var_type])
+            self.code.append((COPY, operand, default, None))
+
+    def _lookup(self, node):
+        node.slot = self.table.lookup(node.name)
+
+    @children("value", enter=_lookup)
+    def compile_Assignment(self, node, value):
+        value, value_type = value
+        if self.table.types[node.slot] != value_type:
+            raise Exception("Tipos incompatíveis na atribuição")
+        self.code.append((COPY, self.variables[node.slot], value, None))
+
+    def compile_Print(self, node):
+        append = self.code.append
+        for expr in node.expressions:
+            value = yield expr
+            append((PRINT, None, value[0], None))
+
+    def compile_Read(self, node):
+        slot = node.slot = self.table.lookup(node.name)
+        self.code.append((READ, self.variables[slot], None, None))
+
+    # =========================
+    # Control Flow
+    # =========================
+    # Os ramos do if e o corpo do while são escopos próprios mesmo sem
+    # chaves, como em C (um Block já abre o seu).
+
+    def compile_If(self, node):
+        table = self.table
+        cond = (yield node.condition)[0]
+        label_else = self._new_label()
+        label_end = self._new_label()
+
+        append = self.code.append
+        append((IF_FALSE, label_else, cond, None))
+        scoped = _needs_scope(node.then_branch)
+        if scoped:
+            table.push_scope()
+        yield node.then_branch
+        if scoped:
+            table.pop_scope()
+        append((GOTO, label_end, None, None))
+        append((LABEL, label_else, None, None))
+        if node.else_branch:
+            scoped = _needs_scope(node.else_branch)
+            if scoped:
+                table.push_scope()
+            yield node.else_branch
+            if scoped:
+                table.pop_scope()
+        append((LABEL, label_end, None, None))
+
+    def compile_While(self, node):
+        label_start = self._new_label()
+        label_end = self._new_label()
+
+        append = self.code.append
+        append((LABEL, label_start, None, None))
+        cond = (yield node.condition)[0]
+        append((IF_FALSE, label_end, cond, None))
+        scoped = _needs_scope(node.body)
+        if scoped:
+            self.table.push_scope()
+        yield node.body
+        if scoped:
+            self.table.pop_scope()
+        append((GOTO, label_start, None, None))
+        append((LABEL, label_end, None, None))
+
+    # =========================
+    # Expressions
+    # =========================
+
+    # Uma expressão é traduzida de uma vez pelo método da sua raiz, sem
+    # passar cada nó pela pilha do visitante: com recursão até _DEPTH
+    # níveis (o caso comum) e, se ela for mais funda, de novo com pilha
+    # explícita. A ordem de visita é a mesma nos dois caminhos, então um
+    # erro levantado no primeiro é o mesmo que o segundo levantaria.
+
+    def compile_BinaryExpr(self, node):
+        code = self.code
+        mark = len(code)
+        temps = self.temp_count
+        result = self._expression(node, _DEPTH)
+        if result is None:
+            del code[mark:]
+            self.temp_count = temps
+            result = self._deep_expression(node)
+        return result
+
+    compile_UnaryExpr = compile_BinaryExpr
+    # Valor de qualquer expressão, inclusive literal ou variável.
+    _value = compile_BinaryExpr
+
+    def _expression(self, node, depth):
+        # (operando, tipo), ou None se a expressão passa de depth níveis.
+        kind = _KINDS.get(type(node))
+        if kind is None:
+            kind = _kind(type(node))
+        if kind is _BINARY:
+            if not depth:
+                return None
+            left = self._expression(node.left, depth - 1)
+            if left is None:
+                return None
+            right = self._expression(node.right, depth - 1)
+            if right is None:
+                return None
+            left, left_type = left
+            right, right_type = right
+            if left_type != right_type:
+                raise Exception("Operação entre tipos incompatíveis")
+            if left_type is _STRING:
+                check_string_operator(node.operator, left_type)
+            node.expr_type = left_type
+            self.temp_count += 1
+            result = temp(self.temp_count)
+            opcode = BINARY_OPCODES[node.operator.lexeme]
+            opcode = SPECIALIZED.get((opcode, left_type), opcode)
+            self.code.append((opcode, result, left, right))
+            return result, left_type
+        if kind is _VARIABLE:
+            table = self.table
+            slot = node.slot = table.lookup(node.name)
+            var_type = node.expr_type = table.types[slot]
+            return self.variables[slot], var_type
+        if kind is _LITERAL:
+            return self.compile_Literal(node)
+        if depth:
+            value = self._expression(node.expr, depth - 1)
+            if value is not None:
+                return self._unary(node, value)
+        return None
+
+    def _deep_expression(self, node):
+        # Pós-ordem com pilha explícita: um nó de operação entra na pilha
+        # de novo, dentro de uma tupla, para ser traduzido depois dos
+        # operandos.
+        values = []
+        tasks = [node]
+        while tasks:
+            task = tasks.pop()
+            if task.__class__ is tuple:
+                node = task[0]
+                if _KINDS[node.__class__] is _BINARY:
+                    right = values.pop()
+                    values.append(self._binary(node, values.pop(), right))
+                else:
+                    values.append(self._unary(node, values.pop()))
+                continue
+            kind = _KINDS.get(task.__class__)
+            if kind is None:
+                kind = _kind(task.__class__)
+            if kind is _BINARY:
+                tasks += ((task,), task.right, task.left)
+            elif kind is _UNARY:
+                tasks += ((task,), task.expr)
+            else:
+                values.append(self._expression(task, 0))
+        return values.pop()
+
+    def _binary(self, node, left, right):
+        left, left_type = left
+        right, right_type = right
+        if left_type != right_type:
+            raise Exception("Operação entre tipos incompatíveis")
+        check_string_operator(node.operator, left_type)
+        node.expr_type = left_type
+        self.temp_count += 1
+        result = temp(self.temp_count)
+        opcode = BINARY_OPCODES[node.operator.lexeme]
+        opcode = SPECIALIZED.get((opcode, left_type), opcode)
+        self.code.append((opcode, result, left, right))
+        return result, left_type
+
+    def _unary(self, node, value):
+        value, value_type = value
+        check_string_operator(node.operator, value_type)
+        node.expr_type = value_type
+        self.temp_count += 1
+        result = temp(self.temp_count)
+        opcode = UNARY_OPCODES[node.operator.lexeme]
+        opcode = SPECIALIZED.get((opcode, value_type), opcode)
+        self.code.append((opcode, result, value, None))
+        return result, value_type
+
+    def compile_Literal(self, node):
+        node.expr_type = node.literal_type
+        key = (node.literal_type, node.value)
+        operand = self.literals.get(key)
+        if operand is None:
+            if node.literal_type == TokenType.STRING:
+                operand = constant(node.value[1:-1])
+            else:
+                operand = constant(node.value)
+            self.literals[key] = operand
+        return operand, node.literal_type
+
+    def compile_Variable(self, node):
+        slot = node.slot = self.table.lookup(node.name)
+        var_type = node.expr_type = self.table.types[slot]
+        return self.variables[slot], var_type
+
+
+_RECURSIVE = {
+    Program: FusedCompiler._program,
+    Block: FusedCompiler._block,
+    VarDecl: FusedCompiler._var_decl,
+    Assignment: FusedCompiler._assignment,
+    Print: FusedCompiler._print,
+    Read: FusedCompiler._read,
+    If: FusedCompiler._if,
+    While: FusedCompiler._while,
+    type(None): FusedCompiler._none,
+}
+
+
+def _recursive_method(cls):
+    for base in cls.__mro__:
+        method = _RECURSIVE.get(base)
+        if method is not None:
+            _RECURSIVE[cls] = method
+            return method
+    raise TypeError(f"Nó desconhecido: {cls.__name__}")
+
+
+def check_and_generate(ast, starts=None):
+    # (tabela de símbolos, TAC) de um programa, ou a exceção do primeiro
+    # erro semântico. starts, se dada, recebe a posição no TAC do código de
+    # cada comando de topo.
+    compiler = FusedCompiler()
+    if starts is None:
+        code = compiler.generate(ast)
+    else:
+        for statement in ast.statements:
+            starts.append(len(compiler.code))
+            compiler.generate(statement)
+        code = compiler.code
+    return compiler.table.symbols, code
@@ -0,0 +1,855 @@
+import heapq
+
+from lexer import (GROUP_KINDS, KEYWORD_KINDS, MASTER_PATTERN, TOKEN_TYPES, Lexer, Token, TokenType,
+                   _HOLDBACK)
+from parser import (Assignment, BinaryExpr, Block, If, Literal, Parser, Print, Program, Read,
+                    TreeBuilder, UnaryExpr, VarDecl, Variable, While)
+from semantic import SemanticAnalyzer, SymbolTable
+from tac_generator import TACGenerator
+from tac import OperandKind, label, temp, variable
+from cache import CompileResult
+
+# ===============================
+# Compilação incremental
+# ===============================
+# Mantém o resultado do front end de uma fonte que é editada aos poucos
+# (ex.: um editor que recompila a cada tecla). A unidade de trabalho é o
+# comando de topo: cada um guarda seu trecho da fonte, a AST, o que
+# declarou e usou na tabela de símbolos e o seu TAC.
+#
+# Uma edição (offset, tamanho apagado, texto inserido):
+#
+#   1. relexa a partir do início do primeiro comando que pode ter mudado
+#      (o lexer olha até _HOLDBACK caracteres além de um token, e um if sem
+#      else olha o token seguinte);
+#   2. reanalisa comando a comando até um comando novo terminar, depois da
+#      edição, exatamente onde começava um comando antigo; dali em diante a
+#      fonte é a mesma e os comandos antigos são reaproveitados;
+#   3. checa de novo só os comandos novos e os que mencionam um nome cujas
+#      declarações mudaram;
+#   4. gera TAC só para os comandos novos.
+#
+# result() monta o mesmo CompileResult (ou levanta o mesmo erro) que
+# cache.compile_source daria para a fonte inteira. Os temporários, os
+# rótulos do TAC e os slots das variáveis são numerados globalmente, então
+# os trechos dos comandos depois de uma mudança na contagem são
+# renumerados (sem gerar de novo), os slots gravados nos nós são
+# corrigidos, e os tokens de operador da AST têm linha/coluna ajustadas
+# quando o comando mudou de lugar.
+#
+# Offset, linha e índice dos comandos depois da última edição ficam
+# pendentes de um deslocamento (como o "gap" de um editor): mover o ponto
+# de edição custa a distância entre as edições, não o tamanho do arquivo.
+#
+# Erros de sintaxe não apagam o estado: a edição fica pendente sobre o
+# último estado válido e é combinada com as seguintes até a fonte voltar a
+# ser analisável.
+
+_EOF = TokenType.EOF.value
+_IDENTIFIER = TokenType.IDENTIFIER.value
+_TEMP = OperandKind.TEMP
+_LABEL = OperandKind.LABEL
+
+
+class _Unit:
+    # Comando de topo. Os campos de posição (offset, line, index, code,
+    # temp_base, label_base, slot_base) podem estar pendentes do
+    # deslocamento do compilador (ver IncrementalCompiler._gap).
+    __slots__ = (
+        "offset", "line", "index", "code", "temp_base", "label_base", "slot_base",
+        "length", "newlines", "first_end",
+        "statement", "peeks", "operators", "first_line", "token_line", "token_column",
+        "declares", "mentions", "error",
+        "declared", "slot_nodes", "nested",
+        "tac", "temps", "labels", "tac_error", "placed_at",
+    )
+
+    def __init__(self, statement, offset, line, length, newlines, first_end):
+        self.offset = offset
+        self.line = line
+        self.index = 0
+        self.code = 0                   # início do trecho no TAC do programa
+        self.temp_base = 0              # temporários/rótulos/slots dos comandos anteriores
+        self.label_base = 0
+        self.slot_base = 0
+        self.length = length            # do fim do comando anterior ao fim deste
+        self.newlines = newlines
+        self.first_end = first_end      # fim do primeiro token, relativo a offset
+        self.statement = statement
+        self.peeks = _peeks(statement)
+        self.operators = []
+        self.first_line = []            # operadores na linha em que o trecho começa
+        self.token_line = line
+        self.token_column = 0
+        self.declares = {}              # globais declaradas (nome -> tipo)
+        self.mentions = set()
+        self.error = None
+        self.declared = []              # (nome, tipo, de bloco?) de cada declaração
+        self.slot_nodes = []            # (nó, índice em declared ou nome global)
+        self.nested = []                # (operando local, nome, índice em declared)
+        self.tac = []                   # numerado a partir de t1/L1 e do slot 0
+        self.temps = 0
+        self.labels = 0
+        self.tac_error = None
+        self.placed_at = None           # (temps, rótulos, slots) antes do trecho no TAC
+
+
+def _peeks(statement):
+    # O parser lê o token depois de um if sem else para procurar o else.
+    while True:
+        if isinstance(statement, If):
+            if statement.else_branch is None:
+                return True
+            statement = statement.else_branch
+        elif isinstance(statement, While):
+            statement = statement.body
+        else:
+            return False
+
+
+# ===============================
+# Relexer
+# ===============================
+
+class _RelexKinds:
+    def __init__(self, tokens):
+        self._tokens = tokens
+
+    def __getitem__(self, index):
+        tokens = self._tokens
+        while index >= len(tokens.kind_list) and not tokens.done:
+            tokens.scan()
+        kinds = tokens.kind_list
+        return kinds[index] if index < len(kinds) else _EOF
+
+
+class _Relexer:
+    # Fonte de tokens para o Parser (mesma interface do TokenStream) que
+    # lexa a fonte nova sob demanda, a partir de um offset onde o lexer
+    # antigo também começava um match.
+    def __init__(self, source, pos, line, line_start):
+        self.source = source
+        self.pos = pos
+        self.line = line
+        self.line_start = line_start
+        self.done = False
+        self.kind_list = []
+        self.starts = []
+        self.ends = []
+        self.lines = []
+        self.columns = []
+        self.kinds = _RelexKinds(self)
+
+    def scan(self):
+        # Lê o próximo token (ou o EOF).
+        source = self.source
+        pos = self.pos
+        end = len(source)
+        while pos < end:
+            match = MASTER_PATTERN.match(source, pos)
+            if match is None:
+                self.pos = pos
+                raise SyntaxError(
+                    f"Caractere inesperado '{source[pos]}' "
+                    f"na linha {self.line}, coluna {pos - self.line_start + 1}"
+                )
+            kind = GROUP_KINDS[match.lastgroup]
+            stop = match.end()
+            if kind:
+                if kind == _IDENTIFIER:
+                    kind = KEYWORD_KINDS.get(source[pos:stop], kind)
+                self._add(kind, pos, stop)
+            newline = source.rfind("\n", pos, stop)
+            if newline != -1:
+                self.line += source.count("\n", pos, stop)
+                self.line_start = newline + 1
+            pos = stop
+            if kind:
+                self.pos = pos
+                return
+        self.pos = pos
+        self._add(_EOF, pos, pos)
+        self.done = True
+
+    def _add(self, kind, start, stop):
+        self.kind_list.append(kind)
+        self.starts.append(start)
+        self.ends.append(stop)
+        self.lines.append(self.line)
+        self.columns.append(start - self.line_start + 1)
+
+    def lexeme(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def token(self, index):
+        return Token(TOKEN_TYPES[self.kind_list[index]], self.lexeme(index),
+                     self.lines[index], self.columns[index])
+
+
+class _UnitBuilder(TreeBuilder):
+    # Guarda os tokens de operador criados para o comando em análise.
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        self.operators = []
+
+    def binary(self, left, operator_index, right):
+        node = super().binary(left, operator_index, right)
+        self.operators.append(node.operator)
+        return node
+
+    def unary(self, operator_index, expr):
+        node = super().unary(operator_index, expr)
+        self.operators.append(node.operator)
+        return node
+
+
+# ===============================
+# Tabelas de símbolos por comando
+# ===============================
+
+class _StatementTable(SymbolTable):
+    # Escopos de um único comando de topo. Uma global declarada por outro
+    # comando entra no escopo global desta tabela na primeira consulta,
+    # como um slot "importado".
+    def __init__(self):
+        super().__init__()
+        self.imported = {}      # slot -> nome
+
+    def _import(self, name, var_type):
+        slot = len(self.types)
+        self.types.append(var_type)
+        self.names.append(name)
+        self.depths.append(0)
+        self.bindings[self.intern(name)] = slot
+        self.imported[slot] = name
+        return slot
+
+
+class _NameResolver:
+    # Resolve os nomes de um comando só pela estrutura de escopos, sem
+    # checar nada: num programa válido dá os mesmos slots e tipos que a
+    # checagem semântica. Globais de outros comandos têm o tipo dado por
+    # global_type(nome) (None se desconhecida). O TAC do comando é gerado
+    # com esses slots locais; os globais vêm em result().
+    def __init__(self, global_type):
+        self.table = _StatementTable()
+        self.global_type = global_type
+        self.nodes = []
+
+    def resolve(self, node):
+        # Devolve o tipo de uma expressão (e o anota no nó).
+        if node is None:
+            return None
+        table = self.table
+        if isinstance(node, (VarDecl, Assignment, Read, Variable)):
+            if isinstance(node, VarDecl):
+                node.slot = table.declare(node.name, node.var_type)
+                self.resolve(node.initializer)
+            else:
+                node.slot = self.lookup(node.name)
+                if isinstance(node, Assignment):
+                    self.resolve(node.value)
+            self.nodes.append(node)
+            if isinstance(node, Variable):
+                node.expr_type = table.types[node.slot]
+                return node.expr_type
+        elif isinstance(node, Block):
+            table.push_scope()
+            for stmt in node.statements:
+                self.resolve(stmt)
+            table.pop_scope()
+        elif isinstance(node, Print):
+            for expr in node.expressions:
+                self.resolve(expr)
+        elif isinstance(node, If):
+            self.resolve(node.condition)
+            self.scoped(node.then_branch)
+            self.scoped(node.else_branch)
+        elif isinstance(node, While):
+            self.resolve(node.condition)
+            self.scoped(node.body)
+        elif isinstance(node, BinaryExpr):
+            node.expr_type = self.resolve(node.left)
+            self.resolve(node.right)
+            return node.expr_type
+        elif isinstance(node, UnaryExpr):
+            node.expr_type = self.resolve(node.expr)
+            return node.expr_type
+        elif isinstance(node, Literal):
+            node.expr_type = node.literal_type
+            return node.expr_type
+        return None
+
+    def scoped(self, node):
+        if node is None or isinstance(node, Block):
+            self.resolve(node)
+        else:
+            self.table.push_scope()
+            self.resolve(node)
+            self.table.pop_scope()
+
+    def lookup(self, name):
+        table = self.table
+        identifier = table.ids.get(name)
+        if identifier is None or table.bindings[identifier] < 0:
+            return table._import(name, self.global_type(name))
+        return table.bindings[identifier]
+
+
+class _UnitTable(_StatementTable):
+    # Tabela da checagem semântica de um comando: as globais dos comandos
+    # anteriores são importadas com o tipo da primeira declaração.
+    # SymbolTable continua produzindo as mensagens.
+    def __init__(self, compiler, position):
+        super().__init__()
+        self.compiler = compiler
+        self.position = position
+        self.declares = {}
+        self.mentions = set()
+
+    def _earlier(self, name):
+        return self.compiler._declarer_before(name, self.position)
+
+    def declare(self, name, var_type):
+        if not self.marks:
+            self.mentions.add(name)
+            if self._earlier(name) is not None:
+                raise Exception(f"Variável '{name}' já declarada")
+        slot = super().declare(name, var_type)
+        if not self.marks:
+            self.declares[name] = var_type
+        return slot
+
+    def lookup(self, name):
+        identifier = self.ids.get(name)
+        if identifier is None or self.bindings[identifier] < 0:
+            self.mentions.add(name)
+            declarer = self._earlier(name)
+            if declarer is not None:
+                return self._import(name, declarer.declares[name])
+        return super().lookup(name)
+
+
+# ===============================
+# Compilador incremental
+# ===============================
+
+class IncrementalCompiler:
+    def __init__(self, source=""):
+        self.source = ""
+        self.error = None
+        self._units = []
+        # Saídas do programa inteiro, mantidas por emenda a cada edição.
+        self._statements = []
+        self._code = []
+        self._symbols = {}      # None: reconstruir no próximo result()
+        self._temps = 0
+        self._labels = 0
+        self._slots = 0
+        # Unidades a partir de _gap têm os campos de posição desatualizados
+        # por _delta = (offset, line, index, code, temp_base, label_base,
+        # slot_base).
+        self._gap = 0
+        self._delta = (0, 0, 0, 0, 0, 0, 0)
+        # A partir desta unidade, TAC e linhas dos operadores podem estar
+        # desatualizados (contagem de temporários/rótulos/linhas mudou antes),
+        # e a partir de _slots_dirty os slots gravados nos nós também.
+        self._dirty = None
+        self._slots_dirty = None
+        # Unidades checadas desde o último result(): a checagem grava nos
+        # nós os slots da tabela local.
+        self._unresolved = set()
+        self._declarers = {}    # nome -> unidades que o declaram, em ordem
+        self._mentions = {}     # nome -> unidades que o consultam ou declaram
+        self._failing = set()
+        self._tac_failing = set()
+        # Fonte do último estado válido e a região editada desde então:
+        # (início, fim na fonte válida, fim na fonte atual).
+        self._valid_source = ""
+        self._pending = None
+        self.edits = 0
+        self.reparsed = 0
+        self.rechecked = 0
+        if source:
+            self.edit(0, 0, source)
+
+    # ---------- Posições ----------
+
+    def _offset(self, index):
+        unit = self._units[index]
+        return unit.offset + self._delta[0] if index >= self._gap else unit.offset
+
+    def _line(self, index):
+        unit = self._units[index]
+        return unit.line + self._delta[1] if index >= self._gap else unit.line
+
+    def _position(self, unit):
+        index = unit.index
+        if 0 <= index < self._gap and self._units[index] is unit:
+            return index
+        return index + self._delta[2]
+
+    def _declarer_before(self, name, position):
+        # Comando com a primeira declaração global de name, se ele vier
+        # antes da posição dada.
+        declarers = self._declarers.get(name)
+        if declarers and self._position(declarers[0]) < position:
+            return declarers[0]
+        return None
+
+    def _global_type(self, name, position):
+        declarer = self._declarer_before(name, position)
+        return None if declarer is None else declarer.declares[name]
+
+    def _bases(self, index):
+        # (início no TAC, temporários, rótulos e slots antes) da unidade index.
+        if index == len(self._units):
+            return len(self._code), self._temps, self._labels, self._slots
+        unit = self._units[index]
+        if index < self._gap:
+            return unit.code, unit.temp_base, unit.label_base, unit.slot_base
+        _, _, _, code, temps, labels, slots = self._delta
+        return (unit.code + code, unit.temp_base + temps, unit.label_base + labels,
+                unit.slot_base + slots)
+
+    def _end(self):
+        # Fim do último comando (início do trecho final: espaços e EOF).
+        if not self._units:
+            return 0
+        last = len(self._units) - 1
+        return self._offset(last) + self._units[last].length
+
+    def _unit_at(self, offset):
+        units = self._units
+        if not units or offset >= self._end():
+            return len(units)
+        low, high = 0, len(units)
+        while low < high:
+            middle = (low + high) // 2
+            if self._offset(middle) <= offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    @staticmethod
+    def _shift(units, delta, sign):
+        offset, line, index, code, temps, labels, slots = (sign * value for value in delta)
+        for unit in units:
+            unit.offset += offset
+            unit.line += line
+            unit.index += index
+            unit.code += code
+            unit.temp_base += temps
+            unit.label_base += labels
+            unit.slot_base += slots
+
+    # ---------- Edição ----------
+
+    def edit(self, offset, deleted, inserted):
+        source = self.source
+        if offset < 0 or deleted < 0 or offset + deleted > len(source):
+            raise ValueError("Edição fora da fonte")
+        self.source = source[:offset] + inserted + source[offset + deleted:]
+        self.edits += 1
+
+        end = offset + deleted
+        if self._pending is None:
+            start, old_end, new_end = offset, end, end
+        else:
+            start, old_end, new_end = self._pending
+            start = min(start, offset)
+        if end > new_end:
+            old_end += end - new_end
+            new_end = end
+        new_end += len(inserted) - deleted
+        self._pending = (start, old_end, new_end)
+
+        try:
+            self._update(start, old_end, new_end)
+        except (SyntaxError, RecursionError) as error:
+            self.error = error
+            return
+        self.error = None
+        self._pending = None
+        self._valid_source = self.source
+
+    def _update(self, start, old_end, new_end):
+        source = self.source
+        units = self._units
+        count = len(units)
+        delta = new_end - old_end
+
+        # Primeiro comando que pode ter mudado.
+        first = self._unit_at(start)
+        while first > 0:
+            previous = first - 1
+            if start <= self._offset(previous) + units[previous].length + _HOLDBACK:
+                first = previous
+            elif units[previous].peeks and (
+                    first == count or start <= self._offset(first) + units[first].first_end + _HOLDBACK):
+                first = previous
+            else:
+                break
+
+        if first < count:
+            pos, line = self._offset(first), self._line(first)
+        elif count:
+            pos, line = self._end(), self._line(count - 1) + units[count - 1].newlines
+        else:
+            pos, line = 0, 1
+        if count:
+            tokens = _Relexer(source, pos, line, source.rfind("\n", 0, pos) + 1)
+        else:
+            # Primeira análise: a fonte inteira de uma vez, com o lexer normal.
+            tokens = Lexer(source).token_stream()
+        builder = _UnitBuilder(tokens)
+        parser = Parser(tokens, builder)
+
+        tail = self._end()
+        resume = first    # próximo comando antigo candidato a ponto de retomada
+        new_units = []
+        token = 0
+        try:
+            for statement in parser.parse_iter():
+                stop = tokens.ends[parser.current - 1]
+                unit = _Unit(statement, pos, line, stop - pos,
+                             source.count("\n", pos, stop), tokens.ends[token] - pos)
+                unit.operators = builder.operators
+                unit.first_line = [op for op in unit.operators if op.line == line]
+                unit.token_column = pos - source.rfind("\n", 0, pos)
+                builder.operators = []
+                new_units.append(unit)
+                token = parser.current
+                pos, line = stop, line + unit.newlines
+                if stop >= new_end:
+                    old = stop - delta
+                    while resume < count and self._offset(resume) < old:
+                        resume += 1
+                    if (resume < count and self._offset(resume) == old) or old == tail:
+                        break
+            else:
+                resume = count
+        except SyntaxError:
+            # Com a fonte inteira, o lexer roda antes do parser: um erro
+            # léxico mais adiante tem precedência sobre o erro de sintaxe.
+            if count:
+                self._check_lexing(tokens, new_end, delta, resume, tail)
+            raise
+
+        # Tipo das globais que os comandos novos usam: o da primeira
+        # declaração antes de cada um, num comando antes de first ou num
+        # dos novos.
+        declared = {}
+
+        def global_type(name):
+            var_type = self._global_type(name, first)
+            return declared.get(name) if var_type is None else var_type
+
+        for unit in new_units:
+            self._generate(unit, global_type)
+            for name, var_type, nested in unit.declared:
+                if not nested:
+                    declared.setdefault(name, var_type)
+        self.reparsed += len(new_units)
+        old_units = units[first:resume]
+        line_delta = (source.count("\n", start, new_end)
+                      - self._valid_source.count("\n", start, old_end))
+        self._splice(first, resume, new_units, delta, line_delta)
+        self._recheck(first, old_units, new_units)
+
+    def _check_lexing(self, tokens, new_end, delta, resume, tail):
+        count = len(self._units)
+        while not tokens.done:
+            tokens.scan()
+            stop = tokens.ends[-1]
+            if stop >= new_end:
+                old = stop - delta
+                while resume < count and self._offset(resume) < old:
+                    resume += 1
+                if (resume < count and self._offset(resume) == old) or old == tail:
+                    return
+
+    def _generate(self, unit, global_type):
+        resolver = _NameResolver(global_type)
+        table = resolver.table
+        generator = TACGenerator(table.names)
+        try:
+            resolver.resolve(unit.statement)
+            generator.generate(unit.statement)
+        except Exception as error:
+            # RecursionError, ou uma redeclaração no mesmo escopo (que a
+            # checagem semântica também acusa, antes).
+            unit.tac_error = error
+            return
+        unit.declared = []
+        unit.nested = []
+        order = {}
+        for slot, storage in enumerate(table.names):
+            if slot not in table.imported:
+                name = storage.partition(".")[0]
+                order[slot] = len(unit.declared)
+                unit.declared.append((name, table.types[slot], table.depths[slot] > 0))
+                if table.depths[slot]:
+                    unit.nested.append((variable(storage), name, order[slot]))
+        imported = table.imported
+        unit.slot_nodes = [(node, order[node.slot] if node.slot in order else imported[node.slot])
+                           for node in resolver.nodes]
+        unit.tac = generator.code
+        unit.temps = generator.temp_count
+        unit.labels = generator.label_count
+
+    def _splice(self, first, resume, new_units, delta, line_delta):
+        units = self._units
+        code_start, temps_start, labels_start, slots_start = self._bases(first)
+        code_end, temps_end, labels_end, slots_end = self._bases(resume)
+
+        # TAC dos comandos novos já numerado na posição deles.
+        code = []
+        position, temps, labels, slots = code_start, temps_start, labels_start, slots_start
+        for index, unit in enumerate(new_units, first):
+            unit.index = index
+            unit.code, unit.temp_base, unit.label_base = position, temps, labels
+            unit.slot_base = slots
+            unit.placed_at = (temps, labels, slots)
+            code.extend(_renumber(unit, temps, labels, slots))
+            position += len(unit.tac)
+            temps += unit.temps
+            labels += unit.labels
+            slots += len(unit.declared)
+            if unit.tac_error is not None:
+                self._tac_failing.add(unit)
+        self._code[code_start:code_end] = code
+        self._statements[first:resume] = [unit.statement for unit in new_units]
+        old_declared = [entry for unit in units[first:resume] for entry in unit.declared]
+        if old_declared != [entry for unit in new_units for entry in unit.declared]:
+            self._symbols = None
+
+        shift = (delta, line_delta, len(new_units) - (resume - first),
+                 position - code_end, temps - temps_end, labels - labels_end, slots - slots_end)
+        gap = self._gap
+        if any(self._delta):
+            if gap < first:
+                self._shift(units[gap:first], self._delta, 1)
+            elif gap > resume:
+                self._shift(units[resume:gap], self._delta, -1)
+        units[first:resume] = new_units
+        boundary = first + len(new_units)
+        self._gap = boundary
+        self._delta = tuple(map(sum, zip(self._delta, shift)))
+        self._temps += shift[4]
+        self._labels += shift[5]
+        self._slots += shift[6]
+
+        self._dirty = _moved(self._dirty, first, resume, boundary, shift[2],
+                             line_delta or shift[4] or shift[5] or shift[6])
+        self._slots_dirty = _moved(self._slots_dirty, first, resume, boundary, shift[2],
+                                   shift[6])
+
+        # Colunas: só mudam os comandos que continuam na linha da edição.
+        source = self.source
+        for index in range(boundary, len(units)):
+            unit = units[index]
+            if unit.first_line:
+                offset = self._offset(index)
+                column = offset - source.rfind("\n", 0, offset)
+                if column != unit.token_column:
+                    for token in unit.first_line:
+                        token.column += column - unit.token_column
+                    unit.token_column = column
+            if unit.newlines:
+                break
+
+    # ---------- Checagem semântica ----------
+
+    def _recheck(self, first, old_units, new_units):
+        changed = set()
+        old_order = []
+        for unit in old_units:
+            changed.update(unit.declares.items())
+            old_order.extend(unit.declares.items())
+            self._forget(unit)
+        new_order = []
+        for unit in new_units:
+            self._check(unit)
+            new_order.extend(unit.declares.items())
+        changed ^= set(new_order)
+        # Comandos depois da região cuja checagem depende de um nome cujas
+        # declarações mudaram, em ordem: uma checagem que passa a declarar
+        # (ou deixa de declarar) algo afeta os seguintes.
+        boundary = first + len(new_units)
+        queue = []
+        queued = set()
+
+        def schedule(names):
+            for name in names:
+                for unit in self._mentions.get(name, ()):
+                    position = self._position(unit)
+                    if position >= boundary and id(unit) not in queued:
+                        queued.add(id(unit))
+                        heapq.heappush(queue, (position, id(unit), unit))
+
+        schedule({name for name, _ in changed})
+        while queue:
+            _, key, unit = heapq.heappop(queue)
+            queued.discard(key)
+            before = list(unit.declares.items())
+            self._forget(unit)
+            self._check(unit)
+            self._retype(unit)
+            self.rechecked += 1
+            after = list(unit.declares.items())
+            if before != after:
+                schedule({name for name, _ in set(before) ^ set(after)})
+
+    def _retype(self, unit):
+        # Os tipos das globais que o comando usa podem ter mudado: gera o
+        # TAC de novo com os tipos de agora. A forma do TAC (instruções,
+        # temporários, rótulos, declarações) não depende dos tipos, então
+        # o trecho é trocado no lugar.
+        if unit.tac_error is not None:
+            return
+        position = self._position(unit)
+        self._generate(unit, lambda name: self._global_type(name, position))
+        code, temps, labels, slots = self._bases(position)
+        self._code[code:code + len(unit.tac)] = _renumber(unit, temps, labels, slots)
+        unit.placed_at = (temps, labels, slots)
+
+    def _forget(self, unit):
+        for name in unit.declares:
+            self._declarers[name].remove(unit)
+        for name in unit.mentions:
+            self._mentions[name].discard(unit)
+        self._failing.discard(unit)
+        self._tac_failing.discard(unit)
+        self._unresolved.discard(unit)
+
+    def _check(self, unit):
+        position = self._position(unit)
+        table = _UnitTable(self, position)
+        analyzer = SemanticAnalyzer()
+        analyzer.table = table
+        unit.error = None
+        try:
+            analyzer.analyze(unit.statement)
+        except Exception as error:
+            unit.error = error
+            self._failing.add(unit)
+        if unit.tac_error is not None:
+            self._tac_failing.add(unit)
+        unit.declares = table.declares
+        unit.mentions = table.mentions
+        self._unresolved.add(unit)
+        for name in unit.declares:
+            declarers = self._declarers.setdefault(name, [])
+            index = len(declarers)
+            while index > 0 and self._position(declarers[index - 1]) > position:
+                index -= 1
+            declarers.insert(index, unit)
+        for name in unit.mentions:
+            self._mentions.setdefault(name, set()).add(unit)
+
+    # ---------- Resultado ----------
+
+    def result(self):
+        # Mesmo resultado (ou mesmo erro) que compile_source(self.source).
+        if self.error is not None:
+            raise self.error.with_traceback(None)
+        if self._failing:
+            raise min(self._failing, key=self._position).error.with_traceback(None)
+        if self._tac_failing:
+            raise min(self._tac_failing, key=self._position).tac_error.with_traceback(None)
+        if self._dirty is not None:
+            self._refresh()
+        if self._unresolved:
+            slots = {}
+            for unit in self._unresolved:
+                self._bind_slots(unit, self._bases(self._position(unit))[3], slots)
+            self._unresolved.clear()
+        if self._symbols is None:
+            # Na ordem dos slots; as de bloco se chamam "nome.slot".
+            self._symbols = {}
+            slot = 0
+            for unit in self._units:
+                for name, var_type, nested in unit.declared:
+                    self._symbols[f"{name}.{slot}" if nested else name] = var_type
+                    slot += 1
+        return CompileResult(Program(list(self._statements)), dict(self._symbols),
+                             list(self._code))
+
+    def _refresh(self):
+        # Renumera o TAC e corrige a linha dos tokens de operador dos
+        # comandos deslocados por edições anteriores.
+        index = self._dirty
+        code, temps, labels, slots = self._bases(index)
+        line = self._line(index) if index < len(self._units) else 0
+        rebind = self._slots_dirty if self._slots_dirty is not None else len(self._units)
+        global_slots = {}
+        for position in range(index, len(self._units)):
+            unit = self._units[position]
+            if unit.placed_at != (temps, labels, slots):
+                self._code[code:code + len(unit.tac)] = _renumber(unit, temps, labels, slots)
+                unit.placed_at = (temps, labels, slots)
+            if line != unit.token_line:
+                for token in unit.operators:
+                    token.line += line - unit.token_line
+                unit.token_line = line
+            if position >= rebind:
+                self._bind_slots(unit, slots, global_slots)
+            code += len(unit.tac)
+            temps += unit.temps
+            labels += unit.labels
+            slots += len(unit.declared)
+            line += unit.newlines
+        self._dirty = None
+        self._slots_dirty = None
+
+    def _bind_slots(self, unit, base, global_slots):
+        # Grava nos nós da unidade os slots do programa: base + índice para
+        # as declarações dela, o slot da primeira declaração para as globais
+        # de outros comandos (global_slots guarda os já procurados).
+        for node, key in unit.slot_nodes:
+            if key.__class__ is int:
+                node.slot = base + key
+            else:
+                slot = global_slots.get(key)
+                if slot is None:
+                    declarer = self._declarers[key][0]
+                    slot = global_slots[key] = self._bases(self._position(declarer))[3]
+                node.slot = slot
+
+    def stats(self):
+        return {
+            "edits": self.edits,
+            "statements": len(self._units),
+            "reparsed": self.reparsed,
+            "rechecked": self.rechecked,
+        }
+
+
+def _moved(dirty, first, resume, boundary, shift, changed):
+    # Índice "desatualizado a partir de" depois de trocar as unidades
+    # [first, resume) por outras que terminam em boundary.
+    if dirty is not None:
+        if dirty >= resume:
+            dirty += shift
+        elif dirty > first:
+            dirty = boundary
+    if changed:
+        dirty = boundary if dirty is None else min(dirty, boundary)
+    return dirty
+
+
+def _renumber(unit, temps, labels, slots):
+    # TAC da unidade (numerado a partir de t1/L1 e com as variáveis de bloco
+    # nos slots locais) deslocado para depois dos temporários, rótulos e
+    # slots dos comandos anteriores.
+    if not temps and not labels and not unit.nested:
+        return unit.tac
+    moved = {temp(number): temp(number + temps) for number in range(1, unit.temps + 1)}
+    moved.update({label(number): label(number + labels) for number in range(1, unit.labels + 1)})
+    for operand, name, index in unit.nested:
+        moved[operand] = variable(f"{name}.{slots + index}")
+    get = moved.get
+    return [(opcode, get(result, result), get(arg1, arg1), get(arg2, arg2))
+            for opcode, result, arg1, arg2 in unit.tac]
@@ -0,0 +1,207 @@
+import io
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from lexer import TOKEN_TYPES
+from parser import ASTNode
+from tac import TEMP
+
+# ===============================
+# Instrumentação do compilador
+# ===============================
+# Opcional e desligada por padrão. Ligada (enable ou collect), registra
+# por fase o tempo de relógio, o tempo de CPU e o número de chamadas, e os
+# contadores de tokens por TokenType, nós da AST por classe e instruções e
+# temporários do TAC. Com memory=True cada fase registra também o pico de
+# memória (tracemalloc, que deixa tudo bem mais lento); com profile=<fase>
+# essa fase roda sob o cProfile.
+#
+# Os pontos de medição chamam phase(nome) e count_*(...); desligada, phase
+# devolve um contexto vazio já pronto e os count_* voltam logo, então o
+# custo é uma chamada de função por fase.
+#
+# Hooks: funções hook(fase, registro) chamadas ao fim de cada fase, com o
+# registro daquela execução ({"wall", "cpu"} e "peak_bytes" com memory).
+
+_NULL = nullcontext()
+_active = None
+
+
+class Stats:
+    def __init__(self, memory=False, profile=None, hooks=()):
+        self.memory = memory
+        self.profile = profile
+        self.hooks = list(hooks)
+        # fase -> {"calls", "wall", "cpu"[, "peak_bytes"]}
+        self.phases = {}
+        # nome -> Counter
+        self.counters = {}
+        self.profiler = None
+        if profile:
+            # cProfile e pstats só para quem pede perfil (pesam na partida).
+            import cProfile
+            self.profiler = cProfile.Profile()
+        # Se foi enable() que ligou o tracemalloc (e disable() o desliga).
+        self.started_tracing = False
+        # Picos das fases em andamento (fases podem se aninhar).
+        self._peaks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    @contextmanager
+    def phase(self, name):
+        profiler = self.profiler if name == self.profile else None
+        if self.memory:
+            if self._peaks:
+                # O pico da fase de fora até aqui, antes de zerar o contador.
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        if profiler is not None:
+            profiler.enable()
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        try:
+            yield self
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if profiler is not None:
+                profiler.disable()
+            record = {"wall": wall, "cpu": cpu}
+            if self.memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                record["peak_bytes"] = peak
+            self._add(name, record)
+            for hook in self.hooks:
+                hook(name, record)
+
+    def _add(self, name, record):
+        total = self.phases.get(name)
+        if total is None:
+            total = self.phases[name] = {"calls": 0, "wall": 0.0, "cpu": 0.0}
+            if self.memory:
+                total["peak_bytes"] = 0
+        total["calls"] += 1
+        total["wall"] += record["wall"]
+        total["cpu"] += record["cpu"]
+        if self.memory:
+            total["peak_bytes"] = max(total["peak_bytes"], record["peak_bytes"])
+
+    def count(self, name, counts):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = Counter()
+        counter.update(counts)
+
+    def profile_report(self, limit=25):
+        # Texto do pstats da fase perfilada, por tempo acumulado.
+        if self.profiler is None:
+            return ""
+        if self.profile not in self.phases:
+            return f"A fase {self.profile} não foi executada\n"
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def as_dict(self):
+        result = {
+            "phases": self.phases,
+            "counters": {name: dict(counter.most_common())
+                         for name, counter in self.counters.items()},
+        }
+        if self.memory:
+            result["peak_bytes"] = max((total["peak_bytes"] for total in self.phases.values()),
+                                       default=0)
+        return result
+
+
+# ===============================
+# Ligar e desligar
+# ===============================
+
+def enable(memory=False, profile=None, hooks=()):
+    global _active
+    if _active is not None:
+        raise RuntimeError("A instrumentação já está ligada")
+    _active = Stats(memory, profile, hooks)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _active.started_tracing = True
+    return _active
+
+
+def disable():
+    global _active
+    stats, _active = _active, None
+    if stats is not None and stats.started_tracing:
+        tracemalloc.stop()
+    return stats
+
+
+@contextmanager
+def collect(memory=False, profile=None, hooks=()):
+    stats = enable(memory, profile, hooks)
+    try:
+        yield stats
+    finally:
+        disable()
+
+
+def active():
+    return _active
+
+
+# ===============================
+# Pontos de medição
+# ===============================
+
+def phase(name):
+    if _active is None:
+        return _NULL
+    return _active.phase(name)
+
+
+def count_tokens(tokens):
+    # tokens: TokenStream ou lista de Token.
+    if _active is None:
+        return
+    kinds = getattr(tokens, "kinds", None)
+    if kinds is not None:
+        counts = {TOKEN_TYPES[kind].name: n for kind, n in Counter(kinds).items()}
+    else:
+        counts = Counter(token.type.name for token in tokens)
+    _active.count("tokens", counts)
+
+
+def count_nodes(ast):
+    if _active is None:
+        return
+    counts = Counter()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, ASTNode):
+            counts[type(node).__name__] += 1
+            stack.extend(getattr(node, field) for field in node._fields)
+    _active.count("nodes", counts)
+
+
+def count_tac(code, name="tac"):
+    if _active is None:
+        return
+    temps = {operand for instr in code for operand in instr[1:]
+             if operand is not None and operand.kind is TEMP}
+    _active.count(name, {"instructions": len(code), "temps": len(temps)})
+    _active.count(f"{name}_opcodes", Counter(instr[0].name for instr in code))
@@ -1,4 +1,6 @@
 import re
+from array import array
+from bisect import bisect_right
 from enum import Enum, auto
 from dataclasses import dataclass
 
@@ -56,109 +58,297 @@ class TokenType(Enum):
 
 @dataclass
 class Token:
+    __slots__ = ("type", "lexeme", "line", "column")
+
     type: TokenType
     lexeme: str
     line: int
     column: int
 
+    def __reduce__(self):
+        return (Token, (self.type, self.lexeme, self.line, self.column))
+
+
+# ===============================
+# Tabelas do lexer
+# ===============================
+
+KEYWORDS = {
+    "int": TokenType.INT,
+    "float": TokenType.FLOAT,
+    "string": TokenType.STRING,
+    "if": TokenType.IF,
+    "else": TokenType.ELSE,
+    "while": TokenType.WHILE,
+    "print": TokenType.PRINT,
+    "read": TokenType.READ,
+}
+
+# Ordem das regex prioritárias.
+TOKEN_SPECS = [
+    (r'==', TokenType.EQUAL),
+    (r'!=', TokenType.NOT_EQUAL),
+    (r'>=', TokenType.GREATER_EQUAL),
+    (r'<=', TokenType.LESS_EQUAL),
+    (r'&&', TokenType.AND),
+    (r'\|\|', TokenType.OR),
+
+    (r'>', TokenType.GREATER),
+    (r'<', TokenType.LESS),
+    (r'=', TokenType.ASSIGN),
+    (r'\+', TokenType.PLUS),
+    (r'-', TokenType.MINUS),
+    (r'\*', TokenType.MULT),
+    (r'/', TokenType.DIV),
+    (r'!', TokenType.NOT),
+
+    (r'\(', TokenType.LPAREN),
+    (r'\)', TokenType.RPAREN),
+    (r'\{', TokenType.LBRACE),
+    (r'\}', TokenType.RBRACE),
+    (r',', TokenType.COMMA),
+    (r';', TokenType.SEMICOLON),
+
+    (r'"[^"]*"', TokenType.STRING_LITERAL),
+    (r'\d+\.\d+', TokenType.FLOAT_CONST),
+    (r'\d+', TokenType.INT_CONST),
+    (r'[a-zA-Z_][a-zA-Z0-9_]*', TokenType.IDENTIFIER),
+
+    (r'[ \t]+', None),
+    (r'\n', None),
+    (r'//.*', None),
+]
+
+
+def _build_master_pattern(specs):
+    # Uma única regex com um grupo nomeado por especificação. A alternância
+    # do módulo re tenta os ramos da esquerda para a direita, então a ordem
+    # de prioridade de TOKEN_SPECS é preservada.
+    parts = []
+    group_types = {}
+    for index, (pattern, token_type) in enumerate(specs):
+        group = f"g{index}"
+        parts.append(f"(?P<{group}>{pattern})")
+        group_types[group] = token_type
+    return re.compile("|".join(parts)), group_types
+
+
+# Compilada uma única vez por processo.
+MASTER_PATTERN, GROUP_TYPES = _build_master_pattern(TOKEN_SPECS)
+
+# Versões inteiras das tabelas, usadas pelo TokenStream (0 = descartar).
+GROUP_KINDS = {
+    group: token_type.value if token_type else 0
+    for group, token_type in GROUP_TYPES.items()
+}
+KEYWORD_KINDS = {lexeme: token_type.value for lexeme, token_type in KEYWORDS.items()}
+
+TOKEN_TYPES = [None] * (max(t.value for t in TokenType) + 1)
+for _token_type in TokenType:
+    TOKEN_TYPES[_token_type.value] = _token_type
+
+
+# ===============================
+# Índice de linhas
+# ===============================
+
+class LineIndex:
+    # Converte offsets da fonte em (linha, coluna) sob demanda.
+
+    def __init__(self, source):
+        starts = [0]
+        find = source.find
+        pos = find("\n")
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = find("\n", pos + 1)
+        self.line_starts = starts
+
+    def position(self, offset):
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
 
 # ===============================
 # Lexer
 # ===============================
 
+class TokenStream:
+    # Tokens em estrutura de arrays: o tipo de cada token é um inteiro
+    # pequeno (TokenType.value) e o lexema é o trecho source[start:end].
+    # Lexemas e posições só são materializados quando pedidos.
+    def __init__(self, source, kinds, starts, ends):
+        self.source = source
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.line_index = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def type(self, index):
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def lexeme(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def position(self, index):
+        return self._lines().position(self.starts[index])
+
+    def token(self, index):
+        return Token(self.type(index), self.lexeme(index), *self.position(index))
+
+    # ---------- Visão de compatibilidade (objetos Token) ----------
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.token(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.token(index)
+
+    def __iter__(self):
+        # Percorre as linhas junto com os tokens, sem busca binária.
+        source = self.source
+        types = TOKEN_TYPES
+        line_starts = self._lines().line_starts
+        last_line = len(line_starts)
+        line = 1
+        line_start = 0
+        next_start = line_starts[1] if last_line > 1 else None
+
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            while next_start is not None and start >= next_start:
+                line_start = next_start
+                line += 1
+                next_start = line_starts[line] if line < last_line else None
+            yield Token(types[kind], source[start:end], line, start - line_start + 1)
+
+    def _lines(self):
+        if self.line_index is None:
+            self.line_index = LineIndex(self.source)
+        return self.line_index
+
+
 class Lexer:
     def __init__(self, source):
         self.source = source
         self.tokens = []
-        self.line = 1
-        self.column = 1
         self.pos = 0
-
-        self.keywords = {
-            "int": TokenType.INT,
-            "float": TokenType.FLOAT,
-            "string": TokenType.STRING,
-            "if": TokenType.IF,
-            "else": TokenType.ELSE,
-            "while": TokenType.WHILE,
-            "print": TokenType.PRINT,
-            "read": TokenType.READ,
-        }
-
-        # Ordem das regex prioritárias.
-        self.token_specs = [
-            (r'==', TokenType.EQUAL),
-            (r'!=', TokenType.NOT_EQUAL),
-            (r'>=', TokenType.GREATER_EQUAL),
-            (r'<=', TokenType.LESS_EQUAL),
-            (r'&&', TokenType.AND),
-            (r'\|\|', TokenType.OR),
-
-            (r'>', TokenType.GREATER),
-            (r'<', TokenType.LESS),
-            (r'=', TokenType.ASSIGN),
-            (r'\+', TokenType.PLUS),
-            (r'-', TokenType.MINUS),
-            (r'\*', TokenType.MULT),
-            (r'/', TokenType.DIV),
-            (r'!', TokenType.NOT),
-
-            (r'\(', TokenType.LPAREN),
-            (r'\)', TokenType.RPAREN),
-            (r'\{', TokenType.LBRACE),
-            (r'\}', TokenType.RBRACE),
-            (r',', TokenType.COMMA),
-            (r';', TokenType.SEMICOLON),
-
-            (r'"[^"]*"', TokenType.STRING_LITERAL),
-            (r'\d+\.\d+', TokenType.FLOAT_CONST),
-            (r'\d+', TokenType.INT_CONST),
-            (r'[a-zA-Z_][a-zA-Z0-9_]*', TokenType.IDENTIFIER),
-
-            (r'[ \t]+', None),
-            (r'\n', None),
-            (r'//.*', None),
-        ]
+        self.keywords = KEYWORDS
+        self.token_specs = TOKEN_SPECS
+        self.stream = None
 
     def tokenize(self):
-        while self.pos < len(self.source):
-            match = None
+        self.tokens.extend(self.token_stream())
+        return self.tokens
 
-            for pattern, token_type in self.token_specs:
-                regex = re.compile(pattern)
-                match = regex.match(self.source, self.pos)
+    def token_stream(self):
+        source = self.source
+        offset_code = "I" if len(source) < 1 << 32 else "Q"
+        kinds = array("B")
+        starts = array(offset_code)
+        ends = array(offset_code)
+        add_kind = kinds.append
+        add_start = starts.append
+        add_end = ends.append
+        group_kinds = GROUP_KINDS
+        keyword_kinds = KEYWORD_KINDS
+        identifier = TokenType.IDENTIFIER.value
 
-                if match:
-                    lexeme = match.group(0)
+        pos = self.pos
+        next_match = MASTER_PATTERN.scanner(source, pos).match
+        match = next_match()
+        while match:
+            kind = group_kinds[match.lastgroup]
+            if kind:
+                start, end = match.span()
+                if kind == identifier:
+                    kind = keyword_kinds.get(source[start:end], identifier)
+                add_kind(kind)
+                add_start(start)
+                add_end(end)
+            pos = match.end()
+            match = next_match()
 
-                    if token_type:
-                        if token_type == TokenType.IDENTIFIER and lexeme in self.keywords:
-                            token_type = self.keywords[lexeme]
+        stream = TokenStream(source, kinds, starts, ends)
+        self.stream = stream
+        self.pos = pos
+        if pos < len(source):
+            line, column = stream._lines().position(pos)
+            raise SyntaxError(
+                f"Caractere inesperado '{source[pos]}' "
+                f"na linha {line}, coluna {column}"
+            )
 
-                        self.tokens.append(
-                            Token(token_type, lexeme, self.line, self.column)
-                        )
+        add_kind(TokenType.EOF.value)
+        add_start(pos)
+        add_end(pos)
+        return stream
 
-                    self._advance(lexeme)
-                    break
 
-            if not match:
-                raise SyntaxError(
-                    f"Caractere inesperado '{self.source[self.pos]}' "
-                    f"na linha {self.line}, coluna {self.column}"
-                )
+# ===============================
+# Lexer em streaming
+# ===============================
 
-        self.tokens.append(Token(TokenType.EOF, "", self.line, self.column))
-        return self.tokens
+# Quantos caracteres além do fim de um match precisam estar no buffer para
+# que o resultado não mude com mais entrada (ex.: "12." pode virar "12.5").
+_HOLDBACK = 2
+
+
+def iter_tokens(chunks):
+    # Gera os mesmos tokens de Lexer.tokenize a partir de um iterável de
+    # pedaços de texto, mantendo em memória só o trecho ainda não consumido.
+    chunks = iter(chunks)
+    match_at = MASTER_PATTERN.match
+    group_types = GROUP_TYPES
+    keywords = KEYWORDS
+    identifier = TokenType.IDENTIFIER
 
-    def _advance(self, lexeme):
-        for char in lexeme:
-            if char == '\n':
-                self.line += 1
-                self.column = 1
+    buffer = ""
+    pos = 0
+    base = 0          # offset absoluto de buffer[0]
+    line = 1
+    line_start = 0    # offset absoluto do início da linha atual
+    eof = False
+
+    while True:
+        end = len(buffer)
+        match = match_at(buffer, pos) if pos < end else None
+
+        if not eof and (match is None or match.end() > end - _HOLDBACK):
+            chunk = next(chunks, "")
+            if not chunk:
+                eof = True
             else:
-                self.column += 1
-        self.pos += len(lexeme)
-# ===============================
+                buffer = buffer[pos:] + chunk
+                base += pos
+                pos = 0
+            continue
+
+        if pos >= end:
+            break
+
+        if not match:
+            raise SyntaxError(
+                f"Caractere inesperado '{buffer[pos]}' "
+                f"na linha {line}, coluna {base + pos - line_start + 1}"
+            )
+
+        token_type = group_types[match.lastgroup]
+        lexeme = match.group()
+        if token_type:
+            if token_type is identifier:
+                token_type = keywords.get(lexeme, identifier)
+            yield Token(token_type, lexeme, line, base + pos - line_start + 1)
+
+        if "\n" in lexeme:
+            line += lexeme.count("\n")
+            line_start = base + pos + lexeme.rindex("\n") + 1
+        pos = match.end()
+
+    yield Token(TokenType.EOF, "", line, base + pos - line_start + 1)
+
 
 # End of lexer.py
\ No newline at end of file
@@ -1,22 +1,315 @@
+import argparse
+import json
+import os
+import sys
+
 from lexer import Lexer
 from parser import Parser
 from ast_printer import ASTPrinter
-from semantic import SemanticAnalyzer
-from tac_generator import TACGenerator
+from ast_serializer import FORMATS
+from fused import check_and_generate
+from optimizer import PASSES
+from tac import format_tac
+from batch import is_batch_input
+import instrumentation
+from instrumentation import count_nodes, count_tac, count_tokens, phase
+
+# Backends, VM e ferramentas são importados nos ramos que os usam: cada
+# execução paga só pelo que roda (o C, o multiprocessing do lote ou o SSA
+# não pesam na partida de quem só checa ou executa um programa).
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compilador da linguagem .mc")
+    parser.add_argument("files", nargs="*", metavar="ARQUIVO",
+                        help="arquivos, diretórios ou globs (padrão: program.mc); "
+                             "mais de um, um diretório ou um glob compila em lote")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="compila em lote com N processos (padrão: número de CPUs)")
+    parser.add_argument("--stream", action="store_true",
+                        help="compila comando a comando e escreve o TAC na saída")
+    parser.add_argument("--compact", action="store_true",
+                        help="guarda a AST em arena (arrays paralelos)")
+    parser.add_argument("--run", action="store_true",
+                        help="compila e executa o programa na VM de TAC")
+    parser.add_argument("--tac", action="store_true",
+                        help="escreve o TAC gerado (após o otimizador, se -O)")
+    parser.add_argument("--ssa", action="store_true",
+                        help="escreve o TAC em forma SSA (após o otimizador, se -O)")
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="otimiza o TAC antes de escrever/executar")
+    parser.add_argument("--no-pass", action="append", default=[], choices=PASSES,
+                        metavar="PASSO",
+                        help=f"desliga um passo do otimizador ({', '.join(PASSES)})")
+    parser.add_argument("--alloc", action="store_true",
+                        help="reaproveita os temporários (alocação por varredura linear)")
+    parser.add_argument("--registers", type=int, metavar="N",
+                        help="com --alloc, usa no máximo N registradores e derrama o resto "
+                             "na memória")
+    parser.add_argument("--emit-bytecode", metavar="ARQUIVO",
+                        help="grava o TAC (após -O/--alloc, se dados) em bytecode binário; "
+                             "um .mcb roda sem passar pelo front-end e aceita -O, --alloc, "
+                             "--tac, --ssa e --emit-bytecode como uma fonte")
+    parser.add_argument("--opt-stats", action="store_true",
+                        help="mostra o relatório do otimizador e da alocação na saída de erro")
+    parser.add_argument("--py", action="store_true",
+                        help="compila para um code object Python (cache em .mcc) e executa")
+    parser.add_argument("--c", action="store_true",
+                        help="gera C99, compila com o cc do sistema e executa; int tem "
+                             "64 bits e um estouro encerra com erro")
+    parser.add_argument("--emit-c", action="store_true",
+                        help="escreve o código C gerado")
+    parser.add_argument("--emit-ast", choices=FORMATS, metavar="FORMATO",
+                        help=f"escreve a AST checada no formato dado ({', '.join(FORMATS)})")
+    parser.add_argument("--cache", metavar="DIR", default=os.environ.get("MC_CACHE_DIR"),
+                        help="diretório do cache de compilação (padrão: $MC_CACHE_DIR)")
+    parser.add_argument("--cache-size", type=int, metavar="MiB",
+                        help="tamanho máximo do cache (padrão: 256 MiB)")
+    parser.add_argument("--stats", action="store_true",
+                        help="mostra tempos por fase e contadores em JSON na saída de erro")
+    parser.add_argument("--stats-memory", action="store_true",
+                        help="com --stats, mede também o pico de memória de cada fase (lento)")
+    parser.add_argument("--profile", metavar="FASE",
+                        help="roda a fase dada sob o cProfile e mostra o perfil na saída de erro")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="mostra acertos/faltas do cache na saída de erro")
+    args = parser.parse_args(argv)
+    args.batch = (args.jobs is not None or len(args.files) > 1
+                  or any(is_batch_input(name) for name in args.files))
+    if args.batch:
+        for flag in ("stream", "compact", "run", "ssa", "alloc", "py", "c", "emit_c",
+                     "emit_bytecode", "stats",
+                     "profile"):
+            if getattr(args, flag):
+                parser.error(f"--{flag.replace('_', '-')} não vale para compilação em lote")
+        if args.jobs is not None and args.jobs < 1:
+            parser.error("-j precisa ser pelo menos 1")
+    else:
+        args.file = args.files[0] if args.files else "program.mc"
+    if args.registers is not None:
+        from regalloc import SCRATCH
+        if not args.alloc:
+            parser.error("--registers precisa de --alloc")
+        if args.registers <= SCRATCH:
+            parser.error(f"--registers precisa ser pelo menos {SCRATCH + 1}")
+    return args
+
+
+def print_report(report, out):
+    print(f"TAC: {report['size_before']} -> {report['size_after']} instruções "
+          f"({report['iterations']} iterações)", file=out)
+    for name, stats in report["passes"].items():
+        print(f"  {name:<12} removidas {stats['removed']:>7}  "
+              f"acrescentadas {stats['added']:>7}  "
+              f"reescritas {stats['rewritten']:>7}", file=out)
+    for entry in report["loops"]:
+        print(f"  laço {entry['loop']}: {entry['pass']} {entry['instr']}", file=out)
+
+
+def print_allocation(report, out):
+    limit = report["registers"] if report["registers"] is not None else "sem limite"
+    print(f"Alocação ({limit}): {report['temps_before']} -> {report['temps_after']} temporários, "
+          f"máximo vivo {report['max_live_before']} -> {report['max_live_after']}", file=out)
+    if report["spilled"]:
+        print(f"  derramados {report['spilled']} em {report['slots']} posições, "
+              f"{report['loads']} cargas, {report['stores']} guardas", file=out)
+
+
+def front_end(code, cache):
+    # AST, símbolos e TAC, do cache de compilação quando houver um.
+    if cache is not None:
+        return cache.compile(code)
+    from cache import compile_source
+    return compile_source(code)
+
+
+def python_code(path, code, cache):
+    # Usa o .mcc ao lado da fonte se ele foi gerado desta mesma fonte.
+    from pybackend import compile_program, load_mcc, save_mcc
+    cache_path = os.path.splitext(path)[0] + ".mcc"
+    code_object = load_mcc(cache_path, code)
+    if code_object is None:
+        result = front_end(code, cache)
+        with phase("python-backend"):
+            code_object = compile_program(result.ast, result.symbols, path)
+        save_mcc(cache_path, code_object, code)
+    return code_object
+
+
+def process_tac(args, tac_code, symbols, lines, run):
+    # -O, --alloc, --emit-bytecode, --tac, --ssa e execução na VM sobre o
+    # TAC vindo da fonte ou de um .mcb. A tabela de linhas é por comando de
+    # topo da fonte e só vale para o TAC sem otimização nem alocação.
+    if args.optimize:
+        from optimizer import Optimizer
+        optimizer = Optimizer([name for name in PASSES if name not in args.no_pass])
+        with phase("optimizer"):
+            tac_code = optimizer.optimize(tac_code)
+        count_tac(tac_code, "optimized")
+        if args.opt_stats:
+            print_report(optimizer.report(), sys.stderr)
+        lines = None
+    if args.alloc:
+        from regalloc import RegisterAllocator
+        allocator = RegisterAllocator(args.registers)
+        with phase("regalloc"):
+            tac_code = allocator.allocate(tac_code)
+        if args.opt_stats:
+            print_allocation(allocator.report(), sys.stderr)
+        lines = None
+    if args.emit_bytecode:
+        from bytecode import save_bytecode
+        with phase("bytecode"):
+            save_bytecode(args.emit_bytecode, tac_code, symbols, lines)
+    if args.tac:
+        for line in format_tac(tac_code):
+            print(line)
+    if args.ssa:
+        from ssa import format_ssa, to_ssa
+        for line in format_ssa(to_ssa(tac_code)):
+            print(line)
+    if run:
+        from vm import run_tac
+        with phase("run"):
+            run_tac(tac_code, symbols)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch:
+        main_batch(args)
+        return
+    cache = None
+    if args.cache:
+        from cache import CompileCache
+        size = args.cache_size * 2**20 if args.cache_size is not None else None
+        cache = CompileCache(args.cache, size)
+    stats = None
+    if args.stats or args.stats_memory or args.profile:
+        stats = instrumentation.enable(memory=args.stats_memory, profile=args.profile)
+    try:
+        compile_file(args, cache)
+    finally:
+        if stats is not None:
+            instrumentation.disable()
+            sys.stdout.flush()
+            if args.profile:
+                sys.stderr.write(stats.profile_report())
+            if args.stats or args.stats_memory:
+                print(json.dumps(stats.as_dict()), file=sys.stderr)
+        if cache is not None and args.cache_stats:
+            print(json.dumps(cache.stats.as_dict()), file=sys.stderr)
+
+
+def main_batch(args):
+    from batch import batch_options, compile_batch, expand_inputs
+    try:
+        paths = expand_inputs(args.files)
+    except FileNotFoundError as exc:
+        raise SystemExit(str(exc))
+    report = compile_batch(paths, args.jobs, batch_options(args))
+    sys.stdout.flush()
+    report.write(sys.stderr)
+    if report.failed:
+        sys.exit(1)
+
+
+def compile_file(args, cache):
+    if args.stream:
+        from pipeline import compile_stream
+        with open(args.file) as file, phase("stream"):
+            compile_stream(file, sys.stdout)
+        return
+
+    if args.file.endswith(".mcc"):
+        from pybackend import load_mcc, run_code
+        code_object = load_mcc(args.file)
+        if code_object is None:
+            raise SystemExit(f"Arquivo .mcc inválido ou de outra versão do Python ou do compilador: {args.file}")
+        with phase("run"):
+            run_code(code_object)
+        return
+
+    if args.file.endswith(".mcb"):
+        from bytecode import load_bytecode
+        try:
+            with phase("load"), load_bytecode(args.file) as program:
+                tac_code = program.instructions()
+                symbols = program.symbols()
+                lines = program.line_table()
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        # Sem outra saída pedida, o .mcb é executado.
+        run = args.run or not (args.tac or args.ssa or args.emit_bytecode)
+        process_tac(args, tac_code, symbols, lines, run)
+        return
+
+    code = open(args.file).read()
+
+    if args.py:
+        from pybackend import run_code
+        code_object = python_code(args.file, code, cache)
+        with phase("run"):
+            run_code(code_object)
+        return
+
+    if args.c or args.emit_c:
+        from c_backend import compile_and_run, generate_c
+        result = front_end(code, cache)
+        if args.emit_c:
+            with phase("c-backend"):
+                c_code = generate_c(result.ast, result.symbols)
+            sys.stdout.write(c_code)
+        if args.c:
+            sys.stdout.flush()
+            with phase("cc+run"):
+                status = compile_and_run(result.ast, result.symbols)
+            sys.exit(status)
+        return
+
+    if args.emit_ast:
+        from ast_serializer import dump_ast
+        ast = front_end(code, cache).ast
+        with phase("ast-dump"):
+            if args.emit_ast == "binary":
+                sys.stdout.flush()
+                dump_ast(ast, sys.stdout.buffer, "binary")
+                sys.stdout.buffer.flush()
+            else:
+                dump_ast(ast, sys.stdout, args.emit_ast)
+        return
+
+    if args.run or args.tac or args.ssa or args.optimize or args.alloc or args.emit_bytecode:
+        result = front_end(code, cache)
+        process_tac(args, result.tac, result.symbols, result.lines, args.run)
+        return
 
-code = open("program.mc").read()
+    if cache is not None and not args.compact:
+        # Com cache o programa é checado antes de a AST ser impressa.
+        ast = cache.compile(code).ast
+        with phase("printer"):
+            ASTPrinter().print(ast)
+        print("Programa válido!")
+        return
 
-lexer = Lexer(code)
-tokens = lexer.tokenize()
-parser = Parser(tokens)
-ast = parser.parse()
-printer = ASTPrinter()
-printer.print(ast)
-tac = TACGenerator()
-tac_code = tac.generate(ast)
-semantic = SemanticAnalyzer()
-semantic.analyze(ast)
+    with phase("lexer"):
+        tokens = Lexer(code).token_stream()
+    count_tokens(tokens)
+    with phase("parser"):
+        if args.compact:
+            from ast_arena import parse_compact
+            ast = parse_compact(tokens).root()
+        else:
+            ast = Parser(tokens).parse()
+    count_nodes(ast)
+    with phase("printer"):
+        ASTPrinter().print(ast)
+    with phase("check+tac"):
+        tac_code = check_and_generate(ast)[1]
+    count_tac(tac_code)
 
+    print("Programa válido!")
 
-print("Programa válido!")
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,938 @@
+import math
+
+from tac import (BINARY, CONSTANT, COPY, DIVISIONS, FUNCTIONS, GOTO, IF_FALSE, JUMPS, LABEL, READ,
+                 SPECIALIZED, TEMP, UNARY, Opcode, constant, definition, format_instr, label, temp,
+                 uses)
+
+# ===============================
+# Otimizador de TAC
+# ===============================
+# Trabalha sobre as quádruplas de tac.py. Cada passo monta o CFG a partir
+# da lista plana, analisa, reescreve e devolve uma nova lista; o Optimizer
+# repete os passos habilitados até nenhum mudar nada.
+#
+# Só print e read são observáveis: atribuições a variáveis que não são
+# lidas depois (inclusive no fim do programa) são removidas. Divisões
+# cujo divisor pode ser zero nunca são removidas nem dobradas, para não
+# esconder o erro de execução.
+#
+# Os passos de laço (licm e strength) registram cada transformação no
+# relatório do Optimizer, com o rótulo do laço em que ela foi feita.
+
+PASSES = ("sccp", "folding", "constants", "copies", "cse", "licm", "strength", "dead_code", "unreachable")
+LOOP_PASSES = ("licm", "strength")
+
+# A soma genérica não entra: com strings ela é concatenação.
+_COMMUTATIVE = frozenset((
+    Opcode.MUL, Opcode.EQ, Opcode.NE, Opcode.AND, Opcode.OR,
+    Opcode.ADD_INT, Opcode.ADD_FLOAT, Opcode.MUL_INT, Opcode.MUL_FLOAT,
+    Opcode.EQ_INT, Opcode.EQ_FLOAT, Opcode.NE_INT, Opcode.NE_FLOAT,
+))
+_COMPUTES = BINARY | UNARY | {COPY}
+# Operações que podem levantar TypeError num programa já checado: as
+# genéricas recebem strings ("-" de string) ou o bool que uma comparação
+# guarda numa variável string, e a concatenação também pode receber esse
+# bool. Igualdade e os lógicos aceitam quaisquer valores.
+_UNTYPED = ((BINARY | UNARY) - frozenset(SPECIALIZED.values())
+            - {Opcode.EQ, Opcode.NE, Opcode.AND, Opcode.OR, Opcode.NOT}) | {Opcode.CONCAT}
+# O que pode sair de um laço: as operações tipadas, as que aceitam
+# quaisquer valores e cópias. Um laço que não roda nenhuma vez não
+# executaria a instrução, então nada que possa levantar erro é movido
+# (divisões e a concatenação ainda passam por _may_fail).
+_HOISTABLE = (frozenset(SPECIALIZED.values())
+              | {COPY, Opcode.EQ, Opcode.NE, Opcode.AND, Opcode.OR, Opcode.NOT})
+
+
+# ===============================
+# CFG
+# ===============================
+
+class BasicBlock:
+    __slots__ = ("index", "instrs", "succs", "preds")
+
+    def __init__(self, index):
+        self.index = index
+        self.instrs = []
+        self.succs = []
+        self.preds = []
+
+
+class CFG:
+    def __init__(self, instrs):
+        self.blocks = []
+        self.label_blocks = {}
+        block = None
+        # body: o bloco atual já tem alguma instrução que não é rótulo.
+        body = False
+        for instr in instrs:
+            opcode = instr[0]
+            if block is None or (opcode is LABEL and body):
+                block = BasicBlock(len(self.blocks))
+                self.blocks.append(block)
+                body = False
+            if opcode is LABEL:
+                self.label_blocks[instr[1]] = block
+            else:
+                body = True
+            block.instrs.append(instr)
+            if opcode in JUMPS:
+                block = None
+
+        for index, block in enumerate(self.blocks):
+            last = block.instrs[-1]
+            following = self.blocks[index + 1] if index + 1 < len(self.blocks) else None
+            if last[0] is GOTO:
+                successors = [self._target(last[1])]
+            elif last[0] is IF_FALSE:
+                successors = [following, self._target(last[1])]
+            else:
+                successors = [following]
+            for successor in successors:
+                if successor is not None and successor not in block.succs:
+                    block.succs.append(successor)
+                    successor.preds.append(block)
+
+    def _target(self, label):
+        if label not in self.label_blocks:
+            raise SyntaxError(f"Rótulo '{label}' não definido")
+        return self.label_blocks[label]
+
+    def flatten(self):
+        return [instr for block in self.blocks for instr in block.instrs]
+
+
+# ===============================
+# Análises
+# ===============================
+
+def liveness(cfg):
+    # Operandos vivos na entrada e na saída de cada bloco.
+    gen = []
+    kill = []
+    for block in cfg.blocks:
+        used = set()
+        defined = set()
+        for instr in block.instrs:
+            for operand in uses(instr):
+                if operand.kind is not CONSTANT and operand not in defined:
+                    used.add(operand)
+            target = definition(instr)
+            if target is not None:
+                defined.add(target)
+        gen.append(used)
+        kill.append(defined)
+
+    live_in = [set() for _ in cfg.blocks]
+    live_out = [set() for _ in cfg.blocks]
+    # Pilha com o último bloco no topo: análise regressiva.
+    worklist = list(cfg.blocks)
+    pending = set(block.index for block in cfg.blocks)
+    while worklist:
+        block = worklist.pop()
+        pending.discard(block.index)
+        out = set()
+        for successor in block.succs:
+            out |= live_in[successor.index]
+        live_out[block.index] = out
+        new_in = gen[block.index] | (out - kill[block.index])
+        if new_in != live_in[block.index]:
+            live_in[block.index] = new_in
+            for predecessor in block.preds:
+                if predecessor.index not in pending:
+                    pending.add(predecessor.index)
+                    worklist.append(predecessor)
+    return live_in, live_out
+
+
+def forward_must(cfg, transfer, live_in, keep):
+    # Análise progressiva "em todos os caminhos": o estado é um dict e o
+    # encontro de dois estados mantém só os pares iguais. Na entrada de
+    # cada bloco o estado é restrito por keep(chave, valor, vivos) aos
+    # fatos que ainda podem ser usados, o que o mantém pequeno. Devolve o
+    # estado de entrada de cada bloco alcançável.
+    count = len(cfg.blocks)
+    states_in = [None] * count
+    states_out = [None] * count
+    if not count:
+        return states_in
+    states_in[0] = {}
+    worklist = [cfg.blocks[0]]
+    queued = {0}
+    while worklist:
+        block = worklist.pop()
+        queued.discard(block.index)
+        out = transfer(block, dict(states_in[block.index]))
+        if out == states_out[block.index]:
+            continue
+        states_out[block.index] = out
+        for successor in block.succs:
+            state = None if successor.index else {}
+            for predecessor in successor.preds:
+                incoming = states_out[predecessor.index]
+                if incoming is None:
+                    continue
+                if state is None:
+                    state = dict(incoming)
+                else:
+                    state = {k: v for k, v in state.items() if incoming.get(k) == v}
+            live = live_in[successor.index]
+            state = {k: v for k, v in state.items() if keep(k, v, live)}
+            if state != states_in[successor.index]:
+                states_in[successor.index] = state
+                if successor.index not in queued:
+                    queued.add(successor.index)
+                    worklist.append(successor)
+    return states_in
+
+
+def dominators(cfg):
+    # Dominador imediato de cada bloco (índice), pelo algoritmo de Cooper,
+    # Harvey e Kennedy; None nos blocos inalcançáveis e 0 na entrada.
+    count = len(cfg.blocks)
+    idom = [None] * count
+    if not count:
+        return idom
+    # Pós-ordem iterativa a partir da entrada.
+    order = []
+    visited = [False] * count
+    visited[0] = True
+    stack = [(cfg.blocks[0], iter(cfg.blocks[0].succs))]
+    while stack:
+        block, successors = stack[-1]
+        for successor in successors:
+            if not visited[successor.index]:
+                visited[successor.index] = True
+                stack.append((successor, iter(successor.succs)))
+                break
+        else:
+            stack.pop()
+            order.append(block.index)
+    number = [0] * count
+    for position, index in enumerate(order):
+        number[index] = position
+    order.reverse()
+
+    idom[0] = 0
+    changed = True
+    while changed:
+        changed = False
+        for index in order[1:]:
+            new = None
+            for predecessor in cfg.blocks[index].preds:
+                other = predecessor.index
+                if idom[other] is None:
+                    continue
+                if new is None:
+                    new = other
+                    continue
+                # Sobe pelas duas cadeias de dominadores até se encontrarem
+                # (números de pós-ordem crescem em direção à entrada).
+                while new != other:
+                    while number[new] < number[other]:
+                        new = idom[new]
+                    while number[other] < number[new]:
+                        other = idom[other]
+            if idom[index] != new:
+                idom[index] = new
+                changed = True
+    return idom
+
+
+class DominatorTree:
+    # Responde "a domina b?" em tempo constante pelos intervalos de uma
+    # busca em profundidade na árvore de dominadores.
+    def __init__(self, cfg):
+        self.idom = dominators(cfg)
+        count = len(self.idom)
+        self.children = [[] for _ in range(count)]
+        for index in range(1, count):
+            if self.idom[index] is not None:
+                self.children[self.idom[index]].append(index)
+        self.enter = [-1] * count
+        self.exit = [-1] * count
+        if not count:
+            return
+        clock = 0
+        stack = [(0, False)]
+        while stack:
+            index, done = stack.pop()
+            if done:
+                self.exit[index] = clock
+                clock += 1
+                continue
+            self.enter[index] = clock
+            clock += 1
+            stack.append((index, True))
+            stack.extend((child, False) for child in reversed(self.children[index]))
+
+    def dominates(self, a, b):
+        # Blocos inalcançáveis não dominam nem são dominados.
+        if self.enter[a] < 0 or self.enter[b] < 0:
+            return False
+        return self.enter[a] <= self.enter[b] and self.exit[b] <= self.exit[a]
+
+
+class Loop:
+    __slots__ = ("header", "blocks")
+
+    def __init__(self, header):
+        self.header = header
+        # Índices dos blocos do laço, cabeçalho incluído.
+        self.blocks = {header.index}
+
+
+def natural_loops(cfg):
+    # Laços naturais: uma aresta b -> h em que h domina b é uma volta do
+    # laço com cabeçalho h, e o corpo é h mais tudo que chega a b sem
+    # passar por h. Voltas para o mesmo cabeçalho formam um laço só. Os
+    # laços internos vêm antes dos externos.
+    tree = DominatorTree(cfg)
+    loops = {}
+    for block in cfg.blocks:
+        for successor in block.succs:
+            if not tree.dominates(successor.index, block.index):
+                continue
+            loop = loops.get(successor.index)
+            if loop is None:
+                loop = loops[successor.index] = Loop(successor)
+            stack = [block]
+            while stack:
+                member = stack.pop()
+                if member.index not in loop.blocks:
+                    loop.blocks.add(member.index)
+                    stack.extend(member.preds)
+    return sorted(loops.values(), key=lambda loop: len(loop.blocks))
+
+
+def _name_is_live(name, value, live):
+    return name in live
+
+
+def _holder_is_live(key, holder, live):
+    return holder in live
+
+
+# ===============================
+# Avaliação de constantes
+# ===============================
+
+def _evaluate(instr):
+    # Constante produzida pela instrução, ou None.
+    opcode = instr[0]
+    try:
+        if opcode is COPY:
+            return instr[2] if instr[2].kind is CONSTANT else None
+        if opcode in BINARY:
+            if instr[2].kind is CONSTANT and instr[3].kind is CONSTANT:
+                return _folded(FUNCTIONS[opcode](instr[2].value, instr[3].value))
+        elif opcode in UNARY and instr[2].kind is CONSTANT:
+            return _folded(FUNCTIONS[opcode](instr[2].value))
+    except (ArithmeticError, RuntimeError, TypeError):
+        pass
+    return None
+
+
+def _folded(value):
+    # Só dobra valores que têm forma textual no TAC.
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, str) and '"' in value:
+        return None
+    return constant(value)
+
+
+def _replace_uses(instr, replace):
+    # Cópia de instr com cada operando lido trocado por replace(operando).
+    opcode = instr[0]
+    if opcode in BINARY:
+        return (opcode, instr[1], replace(instr[2]), replace(instr[3]))
+    if opcode is LABEL or opcode is GOTO or opcode is READ:
+        return instr
+    return (opcode, instr[1], replace(instr[2]), None)
+
+
+def _may_fail(instr):
+    # Erro na execução é efeito observável: divisão por algo que pode ser
+    # zero e operação sem tipo garantido que não se sabe avaliar de
+    # antemão (com operandos constantes, a avaliação decide).
+    if instr[0] in _UNTYPED:
+        return _evaluate(instr) is None
+    if instr[0] not in DIVISIONS:
+        return False
+    divisor = instr[3]
+    return divisor.kind is not CONSTANT or divisor.value in (0, "")
+
+
+# ===============================
+# Passos
+# ===============================
+# Cada passo recebe e devolve a lista plana, junto com o número de
+# instruções reescritas.
+
+def fold_constants(instrs):
+    result = []
+    rewritten = 0
+    for instr in instrs:
+        opcode = instr[0]
+        if (opcode in BINARY or opcode in UNARY) and not _may_fail(instr):
+            value = _evaluate(instr)
+            if value is not None:
+                result.append((COPY, instr[1], value, None))
+                rewritten += 1
+                continue
+        if opcode is IF_FALSE and instr[2].kind is CONSTANT:
+            rewritten += 1
+            if not instr[2].value:
+                result.append((GOTO, instr[1], None, None))
+            continue
+        result.append(instr)
+    return result, rewritten
+
+
+def propagate_constants(instrs):
+    cfg = CFG(instrs)
+    live_in, _ = liveness(cfg)
+
+    def step(instr, state):
+        target = definition(instr)
+        if target is not None:
+            value = _evaluate(instr)
+            if value is None:
+                state.pop(target, None)
+            else:
+                state[target] = value
+
+    def transfer(block, state):
+        for instr in block.instrs:
+            step(instr, state)
+        return state
+
+    states = forward_must(cfg, transfer, live_in, _name_is_live)
+    rewritten = 0
+    for block in cfg.blocks:
+        state = states[block.index]
+        if state is None:
+            continue
+        for position, instr in enumerate(block.instrs):
+            new = _replace_uses(instr, lambda operand: state.get(operand, operand))
+            if new != instr:
+                block.instrs[position] = new
+                rewritten += 1
+            step(new, state)
+    return cfg.flatten(), rewritten
+
+
+def propagate_copies(instrs):
+    # "t = a op b; x = t" com t lido uma única vez vira "x = a op b"; em
+    # seguida, usos de x depois de "x = y" passam a ler y enquanto nenhum
+    # dos dois for redefinido.
+    reads = {}
+    for instr in instrs:
+        for operand in uses(instr):
+            reads[operand] = reads.get(operand, 0) + 1
+
+    merged = []
+    rewritten = 0
+    for instr in instrs:
+        previous = merged[-1] if merged else None
+        if (instr[0] is COPY and previous is not None
+                and previous[0] in _COMPUTES
+                and previous[1] is instr[2] and reads.get(instr[2]) == 1):
+            merged[-1] = (previous[0], instr[1], previous[2], previous[3])
+            rewritten += 1
+            continue
+        merged.append(instr)
+
+    cfg = CFG(merged)
+    live_in, _ = liveness(cfg)
+
+    def step(instr, state, sources):
+        target = definition(instr)
+        if target is None:
+            return
+        state.pop(target, None)
+        for copy in sources.pop(target, ()):
+            if state.get(copy) is target:
+                del state[copy]
+        if instr[0] is COPY and instr[2].kind is not CONSTANT and instr[2] is not target:
+            state[target] = instr[2]
+            sources.setdefault(instr[2], set()).add(target)
+
+    def index(state):
+        sources = {}
+        for copy, source in state.items():
+            sources.setdefault(source, set()).add(copy)
+        return sources
+
+    def transfer(block, state):
+        sources = index(state)
+        for instr in block.instrs:
+            step(instr, state, sources)
+        return state
+
+    states = forward_must(cfg, transfer, live_in, _name_is_live)
+    for block in cfg.blocks:
+        state = states[block.index]
+        if state is None:
+            continue
+        sources = index(state)
+        for position, instr in enumerate(block.instrs):
+            new = _replace_uses(instr, lambda operand: state.get(operand, operand))
+            if new != instr:
+                block.instrs[position] = new
+                rewritten += 1
+            step(new, state, sources)
+    return cfg.flatten(), rewritten
+
+
+def _expression_key(instr):
+    # Operandos internados: a ordem por id basta para normalizar os
+    # operadores comutativos.
+    opcode = instr[0]
+    if opcode in BINARY:
+        left, right = instr[2], instr[3]
+        if opcode in _COMMUTATIVE and id(right) < id(left):
+            left, right = right, left
+        return (opcode, left, right)
+    if opcode in UNARY:
+        return (opcode, instr[2])
+    return None
+
+
+def eliminate_common_subexpressions(instrs):
+    # Expressões disponíveis: estado chave -> operando que guarda o valor.
+    cfg = CFG(instrs)
+    live_in, _ = liveness(cfg)
+
+    def step(instr, state, users):
+        target = definition(instr)
+        if target is None:
+            return
+        for key in users.pop(target, ()):
+            state.pop(key, None)
+        key = _expression_key(instr)
+        if key is not None and target not in key[1:]:
+            state[key] = target
+            users.setdefault(target, set()).add(key)
+            for operand in key[1:]:
+                users.setdefault(operand, set()).add(key)
+
+    def index(state):
+        users = {}
+        for key, holder in state.items():
+            for operand in (holder,) + key[1:]:
+                users.setdefault(operand, set()).add(key)
+        return users
+
+    def transfer(block, state):
+        users = index(state)
+        for instr in block.instrs:
+            step(instr, state, users)
+        return state
+
+    # Só vale a pena manter a expressão enquanto quem guarda o valor está
+    # vivo; se um operando for redefinido, o fato já foi removido.
+    states = forward_must(cfg, transfer, live_in, _holder_is_live)
+    rewritten = 0
+    for block in cfg.blocks:
+        state = states[block.index]
+        if state is None:
+            continue
+        users = index(state)
+        for position, instr in enumerate(block.instrs):
+            key = _expression_key(instr)
+            holder = state.get(key) if key is not None else None
+            if holder is not None and holder is not instr[1]:
+                instr = (COPY, instr[1], holder, None)
+                block.instrs[position] = instr
+                rewritten += 1
+            step(instr, state, users)
+    return cfg.flatten(), rewritten
+
+
+def eliminate_dead_code(instrs):
+    cfg = CFG(instrs)
+    _, live_out = liveness(cfg)
+    for block in cfg.blocks:
+        live = set(live_out[block.index])
+        kept = []
+        for instr in reversed(block.instrs):
+            target = definition(instr)
+            removable = instr[0] in _COMPUTES and not _may_fail(instr)
+            if removable and (target not in live or (instr[0] is COPY and instr[2] is target)):
+                continue
+            if target is not None:
+                live.discard(target)
+            live.update(operand for operand in uses(instr) if operand.kind is not CONSTANT)
+            kept.append(instr)
+        kept.reverse()
+        block.instrs = kept
+    return cfg.flatten(), 0
+
+
+def eliminate_unreachable(instrs):
+    # Remove blocos inalcançáveis, desvios para a instrução seguinte,
+    # rótulos sem uso e encadeia "goto L" quando L começa com outro goto.
+    cfg = CFG(instrs)
+    rewritten = 0
+    reachable = set()
+    stack = cfg.blocks[:1]
+    while stack:
+        block = stack.pop()
+        if block.index not in reachable:
+            reachable.add(block.index)
+            stack.extend(block.succs)
+    blocks = [block for block in cfg.blocks if block.index in reachable]
+
+    forward = {}
+    for block in blocks:
+        body = [instr for instr in block.instrs if instr[0] is not LABEL]
+        if body and body[0][0] is GOTO:
+            for instr in block.instrs:
+                if instr[0] is LABEL and instr[1] is not body[0][1]:
+                    forward[instr[1]] = body[0][1]
+
+    def final(label):
+        seen = set()
+        while label in forward and label not in seen:
+            seen.add(label)
+            label = forward[label]
+        return label
+
+    result = []
+    for block in blocks:
+        for instr in block.instrs:
+            if instr[0] in JUMPS and final(instr[1]) is not instr[1]:
+                instr = (instr[0], final(instr[1]), instr[2], None)
+                rewritten += 1
+            result.append(instr)
+
+    # Desvio para o rótulo logo a seguir é inútil.
+    cleaned = []
+    for position, instr in enumerate(result):
+        if instr[0] in JUMPS:
+            label = instr[1]
+            following = position + 1
+            while following < len(result) and result[following][0] is LABEL:
+                if result[following][1] is label:
+                    break
+                following += 1
+            if (following < len(result) and result[following][0] is LABEL
+                    and result[following][1] is label):
+                continue
+        cleaned.append(instr)
+
+    targets = {instr[1] for instr in cleaned if instr[0] in JUMPS}
+    cleaned = [instr for instr in cleaned if instr[0] is not LABEL or instr[1] in targets]
+    return cleaned, rewritten
+
+
+# ===============================
+# Laços
+# ===============================
+# O gerador traduz while como "Ls: <condição> ifFalse c goto Le <corpo>
+# goto Ls Le:", então cada while vira um laço natural com cabeçalho em Ls.
+# O código tirado de um laço vai para um pré-cabeçalho: um rótulo novo
+# logo antes do cabeçalho, para onde passam a ir os desvios que entram no
+# laço por fora (as voltas continuam indo para o cabeçalho). Rótulos sem
+# uso somem depois em eliminate_unreachable.
+
+def _next_numbers(instrs):
+    # Primeiro temporário e primeiro rótulo numerado ainda não usados. Todo
+    # temporário lido foi escrito antes por alguma instrução.
+    temps = 0
+    labels = 0
+    for instr in instrs:
+        target = instr[1]
+        if target is None:
+            continue
+        if target.kind is TEMP:
+            temps = max(temps, int(target.name[1:]))
+        elif instr[0] is LABEL and target.name[0] == "L" and target.name[1:].isdigit():
+            labels = max(labels, int(target.name[1:]))
+    return temps + 1, labels + 1
+
+
+def _movable_loops(cfg):
+    # Laços que aceitam um pré-cabeçalho: o bloco anterior ao cabeçalho no
+    # código não pode ser do laço e cair nele, senão o pré-cabeçalho
+    # rodaria a cada volta.
+    loops = []
+    for loop in natural_loops(cfg):
+        index = loop.header.index
+        previous = cfg.blocks[index - 1] if index else None
+        if (previous is not None and previous.index in loop.blocks
+                and previous.instrs[-1][0] is not GOTO):
+            continue
+        loops.append(loop)
+    return loops
+
+
+def _loop_name(loop):
+    first = loop.header.instrs[0]
+    return first[1].name if first[0] is LABEL else f"B{loop.header.index}"
+
+
+def _loop_definitions(cfg, loop):
+    # Operando -> quantas instruções do laço o escrevem.
+    counts = {}
+    for index in loop.blocks:
+        for instr in cfg.blocks[index].instrs:
+            target = definition(instr)
+            if target is not None:
+                counts[target] = counts.get(target, 0) + 1
+    return counts
+
+
+def _with_preheaders(cfg, loops, preheaders, next_label):
+    # Lista plana com o código de preheaders[índice do cabeçalho] num
+    # pré-cabeçalho antes de cada laço que tiver algum.
+    entries = {}
+    # Rótulo do cabeçalho -> (rótulo do pré-cabeçalho, blocos do laço).
+    redirect = {}
+    for loop in loops:
+        if preheaders.get(loop.header.index):
+            entry = entries[loop.header.index] = label(next_label)
+            next_label += 1
+            for instr in loop.header.instrs:
+                if instr[0] is LABEL:
+                    redirect[instr[1]] = (entry, loop.blocks)
+    result = []
+    for block in cfg.blocks:
+        entry = entries.get(block.index)
+        if entry is not None:
+            result.append((LABEL, entry, None, None))
+            result.extend(preheaders[block.index])
+        for instr in block.instrs:
+            if instr[0] in JUMPS and instr[1] in redirect:
+                entry, members = redirect[instr[1]]
+                if block.index not in members:
+                    instr = (instr[0], entry, instr[2], None)
+            result.append(instr)
+    return result
+
+
+def hoist_invariants(instrs, log=None):
+    # Tira do laço as instruções cujos operandos não mudam dentro dele.
+    # O destino precisa ser escrito só ali e não pode estar vivo nem na
+    # entrada do cabeçalho nem nas saídas do laço: assim todo uso dentro do
+    # laço vem depois dessa escrita, e ninguém fora dele nota que ela
+    # passou a acontecer uma vez só (mesmo se o laço não der nenhuma volta).
+    cfg = CFG(instrs)
+    loops = _movable_loops(cfg)
+    if not loops:
+        return instrs, 0
+    live_in, _ = liveness(cfg)
+    _, next_label = _next_numbers(instrs)
+    preheaders = {}
+    # (bloco, posição) das instruções já tiradas de algum laço.
+    moved = set()
+    for loop in loops:
+        defined = _loop_definitions(cfg, loop)
+        blocked = set(live_in[loop.header.index])
+        for index in loop.blocks:
+            for successor in cfg.blocks[index].succs:
+                if successor.index not in loop.blocks:
+                    blocked |= live_in[successor.index]
+        hoisted = []
+        invariant = set()
+        found = True
+        while found:
+            found = False
+            for index in sorted(loop.blocks):
+                for position, instr in enumerate(cfg.blocks[index].instrs):
+                    target = instr[1]
+                    if (instr[0] not in _HOISTABLE or (index, position) in moved
+                            or defined[target] != 1 or target in blocked or _may_fail(instr)):
+                        continue
+                    if all(operand.kind is CONSTANT or operand in invariant
+                           or operand not in defined for operand in uses(instr)):
+                        moved.add((index, position))
+                        invariant.add(target)
+                        hoisted.append(instr)
+                        found = True
+                        if log is not None:
+                            log.append({"pass": "licm", "loop": _loop_name(loop),
+                                        "instr": format_instr(instr)})
+        if hoisted:
+            preheaders[loop.header.index] = hoisted
+    if not moved:
+        return instrs, 0
+    for index, position in sorted(moved, reverse=True):
+        del cfg.blocks[index].instrs[position]
+    return _with_preheaders(cfg, loops, preheaders, next_label), len(moved)
+
+
+def _induction_step(instr, defined):
+    # (operação, passo) se instr for "i = i + c", "i = c + i" ou
+    # "i = i - c" inteiros com c invariante no laço.
+    opcode, target, left, right = instr
+    if opcode is Opcode.ADD_INT and right is target:
+        left, right = right, left
+    if opcode not in (Opcode.ADD_INT, Opcode.SUB_INT) or left is not target or right is target:
+        return None
+    if right.kind is not CONSTANT and right in defined:
+        return None
+    return opcode, right
+
+
+def reduce_strength(instrs, log=None):
+    # Para cada variável de indução i ("i = i +/- c", a única escrita de i
+    # no laço) e multiplicação inteira "t = i * k" com k invariante, mantém
+    # s = i * k num temporário novo: s é calculado no pré-cabeçalho e
+    # atualizado com s +/- c * k logo depois de cada passo de i, e a
+    # multiplicação vira "t = s".
+    cfg = CFG(instrs)
+    loops = _movable_loops(cfg)
+    if not loops:
+        return instrs, 0
+    next_temp, next_label = _next_numbers(instrs)
+    preheaders = {}
+    # (bloco, posição) -> instruções que a substituem.
+    replaced = {}
+    for loop in loops:
+        defined = _loop_definitions(cfg, loop)
+        steps = {}
+        for index in loop.blocks:
+            for position, instr in enumerate(cfg.blocks[index].instrs):
+                if definition(instr) is not None and defined[instr[1]] == 1:
+                    step = _induction_step(instr, defined)
+                    if step is not None:
+                        steps[instr[1]] = (index, position) + step
+        if not steps:
+            continue
+        preheader = []
+        # (i, k) -> s, para reaproveitar o mesmo s em multiplicações iguais.
+        reduced = {}
+        for index in sorted(loop.blocks):
+            for position, instr in enumerate(cfg.blocks[index].instrs):
+                if instr[0] is not Opcode.MUL_INT or (index, position) in replaced:
+                    continue
+                counter, factor = instr[2], instr[3]
+                if counter not in steps:
+                    counter, factor = factor, counter
+                if counter not in steps or counter is factor:
+                    continue
+                if factor.kind is not CONSTANT and factor in defined:
+                    continue
+                holder = reduced.get((counter, factor))
+                if holder is None:
+                    holder = reduced[(counter, factor)] = temp(next_temp)
+                    next_temp += 1
+                    step_index, step_position, opcode, amount = steps[counter]
+                    preheader.append((Opcode.MUL_INT, holder, counter, factor))
+                    if amount.kind is CONSTANT and factor.kind is CONSTANT:
+                        increment = constant(amount.value * factor.value)
+                    else:
+                        increment = temp(next_temp)
+                        next_temp += 1
+                        preheader.append((Opcode.MUL_INT, increment, amount, factor))
+                    update = (opcode, holder, holder, increment)
+                    key = (step_index, step_position)
+                    replaced.setdefault(key, [cfg.blocks[step_index].instrs[step_position]])
+                    replaced[key].append(update)
+                replaced[(index, position)] = [(COPY, instr[1], holder, None)]
+                if log is not None:
+                    log.append({"pass": "strength", "loop": _loop_name(loop),
+                                "instr": format_instr(instr)})
+        if preheader:
+            preheaders[loop.header.index] = preheader
+    if not preheaders:
+        return instrs, 0
+    rewritten = sum(1 for replacement in replaced.values() if replacement[0][0] is COPY)
+    for (index, position), replacement in sorted(replaced.items(), reverse=True):
+        cfg.blocks[index].instrs[position:position + 1] = replacement
+    return _with_preheaders(cfg, loops, preheaders, next_label), rewritten
+
+
+def propagate_conditional_constants(instrs):
+    # SCCP sobre a forma SSA (ssa.py, que usa o CFG e os dominadores
+    # daqui).
+    from ssa import sccp
+    return sccp(instrs)
+
+
+PASS_FUNCTIONS = {
+    "sccp": propagate_conditional_constants,
+    "folding": fold_constants,
+    "constants": propagate_constants,
+    "copies": propagate_copies,
+    "cse": eliminate_common_subexpressions,
+    "licm": hoist_invariants,
+    "strength": reduce_strength,
+    "dead_code": eliminate_dead_code,
+    "unreachable": eliminate_unreachable,
+}
+
+
+# ===============================
+# Optimizer
+# ===============================
+
+class PassStats:
+    # removed/added somam, por execução do passo, quanto o código diminuiu
+    # ou cresceu (licm e strength podem acrescentar instruções).
+    __slots__ = ("removed", "added", "rewritten", "runs")
+
+    def __init__(self):
+        self.removed = 0
+        self.added = 0
+        self.rewritten = 0
+        self.runs = 0
+
+    def as_dict(self):
+        return {"removed": self.removed, "added": self.added,
+                "rewritten": self.rewritten, "runs": self.runs}
+
+
+class Optimizer:
+    def __init__(self, passes=PASSES, max_iterations=50):
+        unknown = set(passes) - set(PASSES)
+        if unknown:
+            raise ValueError(f"Passos desconhecidos: {', '.join(sorted(unknown))}")
+        self.passes = [name for name in PASSES if name in passes]
+        self.max_iterations = max_iterations
+        self.stats = {name: PassStats() for name in self.passes}
+        self.iterations = 0
+        self.size_before = 0
+        self.size_after = 0
+        # Transformações dos passos de laço, na ordem em que foram feitas.
+        self.loops = []
+
+    def optimize(self, instrs):
+        # Recebe e devolve uma lista de quádruplas.
+        self.size_before = len(instrs)
+        for _ in range(self.max_iterations):
+            self.iterations += 1
+            changed = False
+            for name in self.passes:
+                before = len(instrs)
+                if name in LOOP_PASSES:
+                    instrs, rewritten = PASS_FUNCTIONS[name](instrs, self.loops)
+                else:
+                    instrs, rewritten = PASS_FUNCTIONS[name](instrs)
+                stats = self.stats[name]
+                stats.runs += 1
+                if len(instrs) < before:
+                    stats.removed += before - len(instrs)
+                else:
+                    stats.added += len(instrs) - before
+                stats.rewritten += rewritten
+                changed = changed or rewritten or before != len(instrs)
+            if not changed:
+                break
+        self.size_after = len(instrs)
+        return instrs
+
+    def report(self):
+        return {
+            "size_before": self.size_before,
+            "size_after": self.size_after,
+            "iterations": self.iterations,
+            "passes": {name: stats.as_dict() for name, stats in self.stats.items()},
+            "loops": list(self.loops),
+        }
+
+
+def optimize(tac_code, passes=PASSES):
+    return Optimizer(passes).optimize(tac_code)
@@ -1,42 +1,83 @@
-from lexer import TokenType
+from array import array
+from sys import intern
+
+from lexer import TokenType, TOKEN_TYPES
 
 # ===============================
 # AST
 # ===============================
 
 class ASTNode:
-    pass
+    # _fields lista os atributos sintáticos na ordem do construtor; é o que
+    # os visitantes genéricos (ex.: ASTPrinter) percorrem. _annotations são
+    # os atributos preenchidos pela análise semântica, fora de _fields.
+    __slots__ = ()
+    _fields = ()
+    _annotations = ()
+
+    def __reduce__(self):
+        # pickle reconstrói o nó pelo construtor; bem mais rápido que o
+        # protocolo genérico para classes com __slots__.
+        args = tuple([getattr(self, field) for field in self._fields])
+        if not self._annotations:
+            return (type(self), args)
+        return (type(self), args, tuple([getattr(self, name) for name in self._annotations]))
+
+    def __setstate__(self, state):
+        for name, value in zip(self._annotations, state):
+            setattr(self, name, value)
+
+
+class NamedNode(ASTNode):
+    # Nós que se referem a uma variável pelo nome; `slot` é o slot dela na
+    # SymbolTable.
+    __slots__ = _annotations = ("slot",)
 
 
 class Program(ASTNode):
+    __slots__ = _fields = ("statements",)
+
     def __init__(self, statements):
         self.statements = statements
 
 
-class VarDecl(ASTNode):
+class VarDecl(NamedNode):
+    __slots__ = _fields = ("var_type", "name", "initializer")
+
     def __init__(self, var_type, name, initializer):
         self.var_type = var_type
         self.name = name
         self.initializer = initializer
+        self.slot = None
+
 
+class Assignment(NamedNode):
+    __slots__ = _fields = ("name", "value")
 
-class Assignment(ASTNode):
     def __init__(self, name, value):
         self.name = name
         self.value = value
+        self.slot = None
 
 
 class Print(ASTNode):
+    __slots__ = _fields = ("expressions",)
+
     def __init__(self, expressions):
         self.expressions = expressions
 
 
-class Read(ASTNode):
+class Read(NamedNode):
+    __slots__ = _fields = ("name",)
+
     def __init__(self, name):
         self.name = name
+        self.slot = None
 
 
 class If(ASTNode):
+    __slots__ = _fields = ("condition", "then_branch", "else_branch")
+
     def __init__(self, condition, then_branch, else_branch):
         self.condition = condition
         self.then_branch = then_branch
@@ -44,101 +85,328 @@ class If(ASTNode):
 
 
 class While(ASTNode):
+    __slots__ = _fields = ("condition", "body")
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
 
 class Block(ASTNode):
+    __slots__ = _fields = ("statements",)
+
     def __init__(self, statements):
         self.statements = statements
 
 
-class BinaryExpr(ASTNode):
+class ExprNode(ASTNode):
+    # Expressões; `expr_type` é o tipo (TokenType.INT/FLOAT/STRING) que a
+    # análise semântica calculou para ela.
+    __slots__ = _annotations = ("expr_type",)
+
+
+class BinaryExpr(ExprNode):
+    __slots__ = _fields = ("left", "operator", "right")
+
     def __init__(self, left, operator, right):
         self.left = left
         self.operator = operator
         self.right = right
+        self.expr_type = None
 
 
-class UnaryExpr(ASTNode):
+class UnaryExpr(ExprNode):
+    __slots__ = _fields = ("operator", "expr")
+
     def __init__(self, operator, expr):
         self.operator = operator
         self.expr = expr
+        self.expr_type = None
+
 
+class Literal(ExprNode):
+    __slots__ = _fields = ("value", "literal_type")
 
-class Literal(ASTNode):
     def __init__(self, value, literal_type):
         self.value = value
         self.literal_type = literal_type
+        self.expr_type = None
+
 
+class Variable(NamedNode):
+    # Também é uma expressão, mas os __slots__ de NamedNode e ExprNode não
+    # podem ser combinados: o expr_type fica aqui.
+    _fields = ("name",)
+    __slots__ = ("name", "expr_type")
+    _annotations = ("slot", "expr_type")
 
-class Variable(ASTNode):
     def __init__(self, name):
         self.name = name
+        self.slot = None
+        self.expr_type = None
 
 
 # ===============================
-# PARSER
+# Construtor da AST
 # ===============================
+# O Parser cria os nós através de um builder. TreeBuilder produz a árvore
+# de objetos acima; ast_arena.ASTArena implementa a mesma interface
+# gravando os nós em arrays paralelos.
 
-class Parser:
+class TreeBuilder:
     def __init__(self, tokens):
         self.tokens = tokens
-        self.current = 0
 
-    def parse(self):
-        statements = []
-        while not self._is_at_end():
-            statements.append(self._statement())
+    def _name(self, index):
+        # Nomes repetidos compartilham a mesma string.
+        return intern(self.tokens.lexeme(index))
+
+    def program(self, statements):
         return Program(statements)
 
-    # ---------- Statements ----------
+    def var_decl(self, var_type, name_index, initializer):
+        return VarDecl(var_type, self._name(name_index), initializer)
 
-    def _statement(self):
-        if self._match(TokenType.INT, TokenType.FLOAT, TokenType.STRING):
-            return self._var_declaration()
+    def assignment(self, name_index, value):
+        return Assignment(self._name(name_index), value)
+
+    def print_stmt(self, expressions):
+        return Print(expressions)
+
+    def read(self, name_index):
+        return Read(self._name(name_index))
+
+    def if_stmt(self, condition, then_branch, else_branch):
+        return If(condition, then_branch, else_branch)
 
-        if self._match(TokenType.IDENTIFIER):
-            return self._assignment()
+    def while_stmt(self, condition, body):
+        return While(condition, body)
+
+    def block(self, statements):
+        return Block(statements)
+
+    def binary(self, left, operator_index, right):
+        return BinaryExpr(left, self.tokens.token(operator_index), right)
+
+    def unary(self, operator_index, expr):
+        return UnaryExpr(self.tokens.token(operator_index), expr)
 
-        if self._match(TokenType.PRINT):
-            return self._print_statement()
+    def literal(self, index, value, literal_type):
+        return Literal(value, literal_type)
 
-        if self._match(TokenType.READ):
-            return self._read_statement()
+    def variable(self, index):
+        return Variable(self._name(index))
 
-        if self._match(TokenType.IF):
-            return self._if_statement()
 
-        if self._match(TokenType.WHILE):
-            return self._while_statement()
+# ===============================
+# PARSER
+# ===============================
 
-        if self._match(TokenType.LBRACE):
-            return self._block()
+_EOF = TokenType.EOF.value
+_IDENTIFIER = TokenType.IDENTIFIER.value
+_INT_CONST = TokenType.INT_CONST.value
+_FLOAT_CONST = TokenType.FLOAT_CONST.value
+_STRING_LITERAL = TokenType.STRING_LITERAL.value
+_LPAREN = TokenType.LPAREN.value
+_RPAREN = TokenType.RPAREN.value
+
+# Operadores binários: tipo do token -> (precedência, associativo à direita).
+# Quanto maior a precedência, mais forte a ligação.
+BINARY_OPERATORS = {
+    TokenType.OR.value: (1, False),
+    TokenType.AND.value: (2, False),
+    TokenType.EQUAL.value: (3, False),
+    TokenType.NOT_EQUAL.value: (3, False),
+    TokenType.LESS.value: (4, False),
+    TokenType.GREATER.value: (4, False),
+    TokenType.LESS_EQUAL.value: (4, False),
+    TokenType.GREATER_EQUAL.value: (4, False),
+    TokenType.PLUS.value: (5, False),
+    TokenType.MINUS.value: (5, False),
+    TokenType.MULT.value: (6, False),
+    TokenType.DIV.value: (6, False),
+}
+
+_RBRACE = TokenType.RBRACE.value
+
+# Comandos compostos em aberto na pilha de _statement.
+_IF = TokenType.IF.value
+_ELSE = TokenType.ELSE.value
+_WHILE = TokenType.WHILE.value
+_BLOCK = TokenType.LBRACE.value
+
+
+class _Open:
+    # kind: _IF (esperando o ramo then), _ELSE (esperando o else),
+    # _WHILE (esperando o corpo) ou _BLOCK (juntando comandos até '}').
+    __slots__ = ("kind", "condition", "then_branch", "statements")
+
+    def __init__(self, kind, condition=None):
+        self.kind = kind
+        self.condition = condition
+        self.then_branch = None
+        self.statements = [] if kind == _BLOCK else None
 
-        if self._match(TokenType.SEMICOLON):
-            return None
 
-        raise SyntaxError("Comando inválido")
+# Marcadores na pilha de operadores de _expression.
+_GROUP = 0
+_PREFIX = -1
+_PREFIX_KINDS = frozenset((TokenType.NOT.value, TokenType.MINUS.value, _LPAREN))
+
+# ===============================
+# Fontes de tokens
+# ===============================
+# O parser lê os tipos por self.kinds[i] (inteiros, como no TokenStream) e
+# pede lexema/Token só quando precisa. TokenList e TokenWindow adaptam
+# listas e iteradores de objetos Token a essa mesma interface.
+
+class TokenList:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.kinds = array("B", [token.type.value for token in tokens])
+
+    def lexeme(self, index):
+        return self.tokens[index].lexeme
+
+    def token(self, index):
+        return self.tokens[index]
+
+
+class _WindowKinds:
+    def __init__(self, window):
+        self._window = window
+
+    def __getitem__(self, index):
+        return self._window.token(index).type.value
+
+
+class TokenWindow:
+    # Janela deslizante sobre um iterador de tokens: indexável como uma
+    # lista, mas só guarda os tokens ainda não liberados pelo parser.
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+        self._buffer = []
+        self._base = 0
+        self.kinds = _WindowKinds(self)
+
+    def token(self, index):
+        offset = index - self._base
+        buffer = self._buffer
+        while offset >= len(buffer):
+            buffer.append(next(self._tokens))
+        return buffer[offset]
+
+    def lexeme(self, index):
+        return self.token(index).lexeme
+
+    def release(self, index):
+        # Descarta os tokens anteriores a index.
+        drop = index - self._base
+        if drop > 0:
+            del self._buffer[:drop]
+            self._base = index
+
+
+class Parser:
+    def __init__(self, tokens, builder=None):
+        # Aceita um TokenStream, uma lista de Token ou um iterador de Token.
+        if isinstance(tokens, list):
+            tokens = TokenList(tokens)
+        elif not hasattr(tokens, "kinds"):
+            tokens = TokenWindow(tokens)
+        self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.builder = builder if builder is not None else TreeBuilder(tokens)
+        self.current = 0
+
+    def parse(self, starts=None):
+        # starts, se dada, recebe o índice do primeiro token de cada comando
+        # de topo (para a tabela de linhas do bytecode).
+        if starts is None:
+            return self.builder.program(list(self.parse_iter()))
+        statements = []
+        start = self.current
+        for statement in self.parse_iter():
+            starts.append(start)
+            statements.append(statement)
+            start = self.current
+        return self.builder.program(statements)
+
+    def parse_iter(self):
+        # Produz um comando de topo por vez; com uma TokenWindow, os tokens
+        # do comando já entregue são liberados antes do próximo.
+        release = getattr(self.tokens, "release", None)
+        while not self._is_at_end():
+            statement = self._statement()
+            if release:
+                release(self.current - 1)
+            yield statement
+
+    # ---------- Statements ----------
+
+    def _statement(self):
+        # Sem recursão: if, while e blocos ainda abertos ficam numa pilha
+        # explícita (_Open), e cada comando completo é entregue ao do topo.
+        # Aninhamento de comandos não consome a pilha do Python.
+        kinds = self.kinds
+        builder = self.builder
+        pending = []
+        while True:
+            handler = STATEMENT_HANDLERS.get(kinds[self.current])
+            if handler is None:
+                raise SyntaxError("Comando inválido")
+            self.current += 1
+            node = handler(self)
+            if node.__class__ is _Open:
+                if node.kind != _BLOCK or kinds[self.current] != _RBRACE:
+                    pending.append(node)
+                    continue
+                self.current += 1
+                node = builder.block(node.statements)
+
+            while pending:
+                top = pending[-1]
+                if top.kind == _BLOCK:
+                    top.statements.append(node)
+                    if kinds[self.current] != _RBRACE:
+                        break
+                    self.current += 1
+                    node = builder.block(top.statements)
+                elif top.kind == _IF:
+                    if kinds[self.current] == _ELSE:
+                        self.current += 1
+                        top.kind = _ELSE
+                        top.then_branch = node
+                        break
+                    node = builder.if_stmt(top.condition, node, None)
+                elif top.kind == _ELSE:
+                    node = builder.if_stmt(top.condition, top.then_branch, node)
+                else:
+                    node = builder.while_stmt(top.condition, node)
+                pending.pop()
+            else:
+                return node
+
+    def _empty_statement(self):
+        return None
 
     def _var_declaration(self):
-        var_type = self._previous().type
-        name = self._consume(TokenType.IDENTIFIER, "Esperado identificador").lexeme
+        var_type = TOKEN_TYPES[self.kinds[self.current - 1]]
+        name = self._consume(TokenType.IDENTIFIER, "Esperado identificador")
 
         initializer = None
         if self._match(TokenType.ASSIGN):
             initializer = self._expression()
 
         self._consume(TokenType.SEMICOLON, "Esperado ';'")
-        return VarDecl(var_type, name, initializer)
+        return self.builder.var_decl(var_type, name, initializer)
 
     def _assignment(self):
-        name = self._previous().lexeme
+        name = self.current - 1
         self._consume(TokenType.ASSIGN, "Esperado '='")
         value = self._expression()
         self._consume(TokenType.SEMICOLON, "Esperado ';'")
-        return Assignment(name, value)
+        return self.builder.assignment(name, value)
 
     def _print_statement(self):
         self._consume(TokenType.LPAREN, "Esperado '('")
@@ -147,134 +415,129 @@ class Parser:
             exprs.append(self._expression())
         self._consume(TokenType.RPAREN, "Esperado ')'")
         self._consume(TokenType.SEMICOLON, "Esperado ';'")
-        return Print(exprs)
+        return self.builder.print_stmt(exprs)
 
     def _read_statement(self):
         self._consume(TokenType.LPAREN, "Esperado '('")
-        name = self._consume(TokenType.IDENTIFIER, "Esperado identificador").lexeme
+        name = self._consume(TokenType.IDENTIFIER, "Esperado identificador")
         self._consume(TokenType.RPAREN, "Esperado ')'")
         self._consume(TokenType.SEMICOLON, "Esperado ';'")
-        return Read(name)
+        return self.builder.read(name)
 
     def _if_statement(self):
         self._consume(TokenType.LPAREN, "Esperado '('")
         condition = self._expression()
         self._consume(TokenType.RPAREN, "Esperado ')'")
-        then_branch = self._statement()
-        else_branch = None
-        if self._match(TokenType.ELSE):
-            else_branch = self._statement()
-        return If(condition, then_branch, else_branch)
+        return _Open(_IF, condition)
 
     def _while_statement(self):
         self._consume(TokenType.LPAREN, "Esperado '('")
         condition = self._expression()
         self._consume(TokenType.RPAREN, "Esperado ')'")
-        body = self._statement()
-        return While(condition, body)
+        return _Open(_WHILE, condition)
 
     def _block(self):
-        statements = []
-        while not self._check(TokenType.RBRACE):
-            statements.append(self._statement())
-        self._consume(TokenType.RBRACE, "Esperado '}'")
-        return Block(statements)
+        return _Open(_BLOCK)
 
     # ---------- Expressões ----------
 
     def _expression(self):
-        return self._logic_or()
-
-    def _logic_or(self):
-        expr = self._logic_and()
-        while self._match(TokenType.OR):
-            expr = BinaryExpr(expr, self._previous(), self._logic_and())
-        return expr
-
-    def _logic_and(self):
-        expr = self._equality()
-        while self._match(TokenType.AND):
-            expr = BinaryExpr(expr, self._previous(), self._equality())
-        return expr
-
-    def _equality(self):
-        expr = self._relational()
-        while self._match(TokenType.EQUAL, TokenType.NOT_EQUAL):
-            expr = BinaryExpr(expr, self._previous(), self._relational())
-        return expr
-
-    def _relational(self):
-        expr = self._additive()
-        while self._match(TokenType.LESS, TokenType.GREATER,
-                          TokenType.LESS_EQUAL, TokenType.GREATER_EQUAL):
-            expr = BinaryExpr(expr, self._previous(), self._additive())
-        return expr
-
-    def _additive(self):
-        expr = self._multiplicative()
-        while self._match(TokenType.PLUS, TokenType.MINUS):
-            expr = BinaryExpr(expr, self._previous(), self._multiplicative())
-        return expr
-
-    def _multiplicative(self):
-        expr = self._unary()
-        while self._match(TokenType.MULT, TokenType.DIV):
-            expr = BinaryExpr(expr, self._previous(), self._unary())
-        return expr
-
-    def _unary(self):
-        if self._match(TokenType.NOT, TokenType.MINUS):
-            return UnaryExpr(self._previous(), self._unary())
-        return self._primary()
-
-    def _primary(self):
-        if self._match(TokenType.INT_CONST):
-            return Literal(int(self._previous().lexeme), TokenType.INT)
-
-        if self._match(TokenType.FLOAT_CONST):
-            return Literal(float(self._previous().lexeme), TokenType.FLOAT)
-
-        if self._match(TokenType.STRING_LITERAL):
-            return Literal(self._previous().lexeme, TokenType.STRING)
-
-        if self._match(TokenType.IDENTIFIER):
-            return Variable(self._previous().lexeme)
-
-        if self._match(TokenType.LPAREN):
-            expr = self._expression()
-            self._consume(TokenType.RPAREN, "Esperado ')'")
-            return expr
-
-        raise SyntaxError("Expressão inválida")
+        # Precedence climbing iterativo (shunting-yard): operandos e
+        # operadores pendentes ficam em pilhas explícitas, então nem cadeias
+        # longas nem parênteses profundos consomem a pilha do Python.
+        # Na pilha de operadores: (precedência, índice do token), com
+        # _GROUP para '(' e _PREFIX para operadores unários.
+        kinds = self.kinds
+        tokens = self.tokens
+        builder = self.builder
+        binary = builder.binary
+        binary_operators = BINARY_OPERATORS
+        operands = []
+        operators = []
+        current = self.current
+
+        while True:
+            kind = kinds[current]
+            while kind in _PREFIX_KINDS:
+                operators.append((_GROUP if kind == _LPAREN else _PREFIX, current))
+                current += 1
+                kind = kinds[current]
+
+            if kind == _IDENTIFIER:
+                operand = builder.variable(current)
+            elif kind == _INT_CONST:
+                operand = builder.literal(current, int(tokens.lexeme(current)), TokenType.INT)
+            elif kind == _FLOAT_CONST:
+                operand = builder.literal(current, float(tokens.lexeme(current)), TokenType.FLOAT)
+            elif kind == _STRING_LITERAL:
+                operand = builder.literal(current, tokens.lexeme(current), TokenType.STRING)
+            else:
+                self.current = current
+                raise SyntaxError("Expressão inválida")
+            current += 1
+
+            while True:
+                while operators and operators[-1][0] == _PREFIX:
+                    operand = builder.unary(operators.pop()[1], operand)
+
+                kind = kinds[current]
+                entry = binary_operators.get(kind)
+                if entry is not None:
+                    precedence, right_assoc = entry
+                    while operators:
+                        top = operators[-1][0]
+                        if top < precedence or (top == precedence and right_assoc):
+                            break
+                        operand = binary(operands.pop(), operators.pop()[1], operand)
+                    operands.append(operand)
+                    operators.append((precedence, current))
+                    current += 1
+                    break
+
+                # Fim do operando: fecha os binários até o '(' mais próximo.
+                while operators and operators[-1][0] > _GROUP:
+                    operand = binary(operands.pop(), operators.pop()[1], operand)
+                if not operators:
+                    self.current = current
+                    return operand
+                if kind != _RPAREN:
+                    self.current = current
+                    raise SyntaxError("Esperado ')'")
+                operators.pop()
+                current += 1
 
     # ---------- Utilitários ----------
 
-    def _match(self, *types):
-        for t in types:
-            if self._check(t):
-                self._advance()
-                return True
+    def _match(self, token_type):
+        if self.kinds[self.current] == token_type.value:
+            self.current += 1
+            return True
         return False
 
     def _consume(self, token_type, message):
-        if self._check(token_type):
-            return self._advance()
+        # Devolve o índice do token consumido.
+        if self.kinds[self.current] == token_type.value:
+            self.current += 1
+            return self.current - 1
         raise SyntaxError(message)
 
     def _check(self, token_type):
-        return not self._is_at_end() and self._peek().type == token_type
-
-    def _advance(self):
-        if not self._is_at_end():
-            self.current += 1
-        return self._previous()
-
-    def _peek(self):
-        return self.tokens[self.current]
-
-    def _previous(self):
-        return self.tokens[self.current - 1]
+        return self.kinds[self.current] == token_type.value
 
     def _is_at_end(self):
-        return self._peek().type == TokenType.EOF
-
+        return self.kinds[self.current] == _EOF
+
+
+# Tipo do token inicial -> método que analisa o resto do comando.
+STATEMENT_HANDLERS = {
+    TokenType.INT.value: Parser._var_declaration,
+    TokenType.FLOAT.value: Parser._var_declaration,
+    TokenType.STRING.value: Parser._var_declaration,
+    TokenType.IDENTIFIER.value: Parser._assignment,
+    TokenType.PRINT.value: Parser._print_statement,
+    TokenType.READ.value: Parser._read_statement,
+    TokenType.IF.value: Parser._if_statement,
+    TokenType.WHILE.value: Parser._while_statement,
+    TokenType.LBRACE.value: Parser._block,
+    TokenType.SEMICOLON.value: Parser._empty_statement,
+}
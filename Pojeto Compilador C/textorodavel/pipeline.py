@@ -0,0 +1,35 @@
+from lexer import iter_tokens
+from parser import Parser
+from fused import FusedCompiler
+from tac import format_instr
+
+CHUNK_SIZE = 1 << 16
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+# ===============================
+# Compilação em streaming
+# ===============================
+
+def compile_stream(file, out, chunk_size=CHUNK_SIZE):
+    # Lê a fonte em pedaços e processa um comando de topo por vez: cada
+    # comando é checado, traduzido para TAC e escrito em out antes de o
+    # próximo ser analisado. A memória fica limitada pelo maior comando
+    # (mais a tabela de símbolos), não pelo tamanho do arquivo.
+    parser = Parser(iter_tokens(read_chunks(file, chunk_size)))
+    tac = FusedCompiler()
+    write = out.write
+
+    for statement in parser.parse_iter():
+        tac.generate(statement)
+        for instr in tac.code:
+            write(format_instr(instr))
+            write("\n")
+        tac.code.clear()
@@ -0,0 +1,65 @@
+import json
+import os
+import struct
+import tempfile
+
+# ===============================
+# Protocolo do servidor de compilação
+# ===============================
+# Cada mensagem é um quadro: 4 bytes com o tamanho (big-endian, sem
+# sinal) seguidos de um objeto JSON em UTF-8. Uma conexão pode levar
+# vários pedidos, um de cada vez; o servidor responde cada um antes de
+# ler o próximo.
+#
+# Pedido:   {"op": "check" | "tac" | "run" | "ping" | "shutdown",
+#            "source": str  ou  "path": str,
+#            "optimize": bool, "no_pass": [str], "timeout": float}
+#
+# Enquanto atende um pedido, o servidor pode mandar:
+#   {"output": str}   um trecho da saída, assim que o programa a produz
+#   {"input": true}   o programa executou read; o cliente responde com
+#                     {"line": str}, a próxima linha da sua entrada ("" no
+#                     fim da entrada)
+# e termina com a resposta {"status": int, "stderr": str}.
+#
+# Este módulo não importa o compilador: o cliente só precisa dele.
+
+MAX_FRAME = 64 * 1024 * 1024
+_HEADER = struct.Struct(">I")
+
+
+def default_socket_path():
+    return os.environ.get("MC_SERVER_SOCKET") or os.path.join(
+        tempfile.gettempdir(), f"mcc-{os.getuid()}.sock")
+
+
+def send_frame(sock, message):
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    if len(data) > MAX_FRAME:
+        raise ValueError("Mensagem grande demais para o protocolo")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    # Devolve a próxima mensagem ou None se a conexão fechou entre quadros.
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError("Quadro grande demais")
+    data = _recv_exact(sock, size)
+    if data is None:
+        raise ConnectionError("Conexão fechada no meio de um quadro")
+    return json.loads(data.decode("utf-8"))
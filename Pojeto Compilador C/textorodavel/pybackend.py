@@ -0,0 +1,303 @@
+import hashlib
+import importlib.util
+import marshal
+import sys
+
+from lexer import TokenType
+from parser import *
+from tac import DEFAULT_VALUES, FUNCTIONS, Opcode
+from vm import read_value
+from cache import compiler_version
+from visitor import Visitor, children
+
+# ===============================
+# Backend Python (AOT)
+# ===============================
+# Traduz a AST checada para código Python e compila com compile(): cada
+# variável vira um local de uma função main, while vira while, if vira
+# if. Não há laço de interpretação nosso; quem executa é o próprio
+# CPython. A semântica é a mesma do TAC/VM:
+#
+#   - variáveis declaradas começam com o valor padrão do tipo no início
+#     do programa (uma declaração sem inicializador não gera código);
+#   - "/" usa as mesmas funções da VM (divisão inteira truncada, erro em
+#     divisão por zero; em float, bool / bool é inteira e o resto real);
+#   - && e || avaliam os dois lados, como no TAC, exceto em condições
+#     cujo lado direito não pode falhar;
+#   - valores booleanos são impressos como 1/0.
+#
+# O código compilado pode ser salvo com marshal em um arquivo .mcc.
+
+MCC_MAGIC = b"MCC3"
+
+_TYPE_NAMES = {
+    TokenType.INT: "_INT",
+    TokenType.FLOAT: "_FLOAT",
+    TokenType.STRING: "_STRING",
+}
+
+
+def _format_line(value):
+    if value.__class__ is bool:
+        return "1\n" if value else "0\n"
+    return f"{value}\n"
+
+
+class _Condition:
+    # Expressão em posição de condição (ver PythonBackend.gen__Condition).
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+
+class PythonBackend(Visitor):
+    # Visitante sem recursão (ver visitor.py): comandos emitem linhas e
+    # cada expressão devolve o seu texto Python.
+    prefix = "gen_"
+
+    def __init__(self, var_types):
+        self.var_types = var_types
+        # var_types está na ordem dos slots: o nome de cada slot.
+        self.names = list(var_types)
+        self.lines = []
+        self.depth = 1
+
+    def emit(self, line):
+        self.lines.append("    " * self.depth + line)
+
+    def generate(self, node):
+        return self.visit(node)
+
+    def source(self, program):
+        # Texto Python do módulo com a função main.
+        self.lines = ["def main(_write, _read, _div, _fdiv, _fmt, _INT, _FLOAT, _STRING):"]
+        for name, var_type in self.var_types.items():
+            self.emit(f"{_local(name)} = {DEFAULT_VALUES.get(var_type, 0)!r}")
+        self.generate(program)
+        self.emit("return None")
+        return "\n".join(self.lines) + "\n"
+
+    def gen_None(self, node):
+        return None
+
+    # =========================
+    # Program & Statements
+    # =========================
+
+    @children("statements")
+    def gen_Program(self, node, statements):
+        pass
+
+    @children("statements")
+    def gen_Block(self, node, statements):
+        pass
+
+    @children("initializer")
+    def gen_VarDecl(self, node, value):
+        if node.initializer:
+            self.emit(f"{self.local(node)} = {value}")
+        elif "." in self.names[node.slot]:
+            # Variável de bloco: nova a cada execução da declaração.
+            self.emit(f"{self.local(node)} = {DEFAULT_VALUES[node.var_type]!r}")
+
+    @children("value")
+    def gen_Assignment(self, node, value):
+        self.emit(f"{self.local(node)} = {value}")
+
+    def gen_Print(self, node):
+        for expr in node.expressions:
+            if isinstance(expr, Literal):
+                text = _format_line(_literal_value(expr))
+                self.emit(f"_write({text!r})")
+            else:
+                value = yield expr
+                self.emit(f"_write(_fmt({value}))")
+
+    def gen_Read(self, node):
+        var_type = _TYPE_NAMES.get(self.var_types.get(self.names[node.slot]), "None")
+        self.emit(f"{self.local(node)} = _read({var_type})")
+
+    # =========================
+    # Control Flow
+    # =========================
+
+    def gen_If(self, node):
+        condition = yield _Condition(node.condition)
+        self.emit(f"if {condition}:")
+        size = self.indent()
+        yield node.then_branch
+        self.dedent(size)
+        if node.else_branch:
+            self.emit("else:")
+            size = self.indent()
+            yield node.else_branch
+            self.dedent(size)
+
+    def gen_While(self, node):
+        condition = yield _Condition(node.condition)
+        self.emit(f"while {condition}:")
+        size = self.indent()
+        yield node.body
+        self.dedent(size)
+
+    def indent(self):
+        # Abre o corpo de um if/while; dedent fecha, com pass se ficou vazio.
+        self.depth += 1
+        return len(self.lines)
+
+    def dedent(self, size):
+        if len(self.lines) == size:
+            self.emit("pass")
+        self.depth -= 1
+
+    # =========================
+    # Expressions
+    # =========================
+
+    def gen__Condition(self, wrapper):
+        # Em condições só a verdade importa: && e || podem usar o curto-
+        # circuito do Python quando o lado direito não tem divisão (a
+        # única operação que pode falhar e portanto precisa ser avaliada).
+        node = wrapper.node
+        if isinstance(node, BinaryExpr) and node.operator.lexeme in ("&&", "||"):
+            if not _may_fail(node.right):
+                keyword = "and" if node.operator.lexeme == "&&" else "or"
+                left = yield _Condition(node.left)
+                right = yield _Condition(node.right)
+                return f"({left} {keyword} {right})"
+        return (yield node)
+
+    @children("left", "right")
+    def gen_BinaryExpr(self, node, left, right):
+        op = node.operator.lexeme
+        if op == "/":
+            # Como DIV_FLOAT da VM: int / int (de bools) é divisão real.
+            divide = "_fdiv" if node.expr_type == TokenType.FLOAT else "_div"
+            return f"{divide}({left}, {right})"
+        if op == "&&":
+            return f"(bool({left}) & bool({right}))"
+        if op == "||":
+            return f"(bool({left}) | bool({right}))"
+        return f"({left} {op} {right})"
+
+    @children("expr")
+    def gen_UnaryExpr(self, node, expr):
+        if node.operator.lexeme == "!":
+            return f"(not {expr})"
+        return f"(-{expr})"
+
+    def gen_Literal(self, node):
+        return repr(_literal_value(node))
+
+    def gen_Variable(self, node):
+        return self.local(node)
+
+    def local(self, node):
+        return _local(self.names[node.slot])
+
+
+def _local(name):
+    # Prefixo evita colisão com palavras reservadas e nomes do Python.
+    # Variáveis de blocos internos se chamam "nome.slot" (ver SymbolTable).
+    base, _, slot = name.partition(".")
+    return f"s{slot}_{base}" if slot else f"v_{name}"
+
+
+def _literal_value(node):
+    if node.literal_type == TokenType.STRING:
+        return node.value[1:-1]
+    return node.value
+
+
+def _may_fail(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinaryExpr):
+            if node.operator.lexeme == "/":
+                return True
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, UnaryExpr):
+            stack.append(node.expr)
+    return False
+
+
+# ===============================
+# Compilação e execução
+# ===============================
+
+def compile_program(ast, var_types, filename="<mc>"):
+    # AST checada -> code object do módulo (que define main).
+    source = PythonBackend(var_types).source(ast)
+    try:
+        return compile(source, filename, "exec")
+    except (SyntaxError, RecursionError, MemoryError) as error:
+        # A tradução não tem limite de profundidade, mas o compile() do
+        # CPython limita o aninhamento de blocos e parênteses.
+        raise SyntaxError(f"Programa aninhado demais para o backend Python: {error}") from None
+
+
+def run_code(code, stdin=None, stdout=None):
+    stdin = stdin if stdin is not None else sys.stdin
+    stdout = stdout if stdout is not None else sys.stdout
+
+    def read(var_type):
+        stdout.flush()
+        return read_value(stdin, var_type)
+
+    namespace = {}
+    exec(code, namespace)
+    try:
+        namespace["main"](stdout.write, read, FUNCTIONS[Opcode.DIV], FUNCTIONS[Opcode.DIV_FLOAT],
+                          _format_line,
+                          TokenType.INT, TokenType.FLOAT, TokenType.STRING)
+    finally:
+        stdout.flush()
+
+
+# ===============================
+# Arquivos .mcc
+# ===============================
+# Cabeçalho: MCC_MAGIC, o número mágico do bytecode do Python (o formato
+# do marshal muda entre versões), a versão do compilador (hash do front
+# end e deste backend, como no cache de compilação: qualquer mudança no
+# código gerado invalida os .mcc antigos) e o SHA-256 da fonte, usado para
+# saber se o cache ainda corresponde ao .mc.
+
+def _mcc_header():
+    version = compiler_version("pybackend", "vm")
+    return MCC_MAGIC + importlib.util.MAGIC_NUMBER + bytes.fromhex(version)
+
+
+def _source_hash(source):
+    return hashlib.sha256(source.encode("utf-8")).digest()
+
+
+def save_mcc(path, code, source):
+    with open(path, "wb") as file:
+        file.write(_mcc_header())
+        file.write(_source_hash(source))
+        marshal.dump(code, file)
+
+
+def load_mcc(path, source=None):
+    # Devolve o code object, ou None se o arquivo não existe, é de outra
+    # versão do Python ou do compilador ou (quando source é dado) foi
+    # gerado de outra fonte.
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    header = _mcc_header()
+    if not data.startswith(header):
+        return None
+    digest = data[len(header):len(header) + 32]
+    if source is not None and digest != _source_hash(source):
+        return None
+    try:
+        return marshal.loads(data[len(header) + 32:])
+    except (EOFError, ValueError, TypeError):
+        return None
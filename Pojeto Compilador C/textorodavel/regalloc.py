@@ -0,0 +1,206 @@
+from heapq import heappop, heappush
+
+from tac import COPY, TEMP, definition, temp, uses, variable
+from optimizer import CFG, liveness
+
+# ===============================
+# Alocação de temporários
+# ===============================
+# O gerador dá um tN novo a cada expressão. Aqui os temporários viram
+# registradores virtuais reaproveitados: cada um ganha um intervalo de
+# vida sobre a lista plana, calculado pela vivacidade do otimizador, e uma
+# varredura linear (Poletto e Sarkar) dá o mesmo registrador a intervalos
+# que não se sobrepõem. Os registradores são de novo temporários, t1..tN,
+# então o resultado continua sendo TAC comum.
+#
+# As posições são dobradas: a instrução i lê na posição 2i e escreve em
+# 2i + 1. Assim "t9 = t8 + 1" pode usar o registrador de t8 (que morre ao
+# ser lido), mas uma escrita nunca cai num registrador ainda vivo.
+#
+# Com um número fixo de registradores, os intervalos que não cabem são
+# derramados em posições de memória com nome (@1, @2...; variáveis do TAC
+# que nenhum programa pode declarar): a escrita vai para um registrador de
+# trabalho e é guardada na memória logo depois, e cada leitura é precedida
+# de uma carga. Dois dos registradores ficam reservados para isso.
+
+SCRATCH = 2
+
+
+class RegisterAllocator:
+    def __init__(self, registers=None):
+        if registers is not None and registers <= SCRATCH:
+            raise ValueError(f"São precisos pelo menos {SCRATCH + 1} registradores")
+        self.registers = registers
+        self.temps_before = 0
+        self.temps_after = 0
+        self.max_live_before = 0
+        self.max_live_after = 0
+        self.spilled = 0
+        self.slots = 0
+        self.loads = 0
+        self.stores = 0
+
+    def allocate(self, instrs):
+        # Recebe e devolve uma lista de quádruplas.
+        cfg = CFG(instrs)
+        live_in, live_out = liveness(cfg)
+        intervals = live_intervals(cfg, live_in, live_out)
+        self.temps_before = len(intervals)
+        self.max_live_before = max_live(cfg, live_out)
+
+        limit = None if self.registers is None else self.registers - SCRATCH
+        registers, spilled = _linear_scan(intervals, limit)
+        slots, _ = _linear_scan({operand: intervals[operand] for operand in spilled}, None)
+        mapping = {operand: temp(number) for operand, number in registers.items()}
+        memory = {operand: variable(f"@{number}") for operand, number in slots.items()}
+        self.spilled = len(spilled)
+        self.slots = max(slots.values(), default=0)
+
+        code = []
+        if memory:
+            scratch = [temp(self.registers - SCRATCH + n) for n in range(1, SCRATCH + 1)]
+        for instr in cfg.flatten():
+            renamed = [mapping.get(operand, operand) for operand in instr]
+            if memory:
+                self._spill(instr, renamed, memory, scratch, code)
+            else:
+                code.append(tuple(renamed))
+
+        final = CFG(code)
+        temps = set()
+        for instr in code:
+            target = definition(instr)
+            if target is not None and target.kind is TEMP:
+                temps.add(target)
+        self.temps_after = len(temps)
+        self.max_live_after = max_live(final, liveness(final)[1])
+        return code
+
+    def _spill(self, instr, renamed, memory, scratch, code):
+        # Cargas antes e guarda depois das leituras e da escrita em
+        # temporários derramados. Uma cópia escreve direto na memória.
+        loaded = {}
+        for operand in uses(instr):
+            if operand in memory and operand not in loaded:
+                loaded[operand] = scratch[len(loaded)]
+                code.append((COPY, loaded[operand], memory[operand], None))
+                self.loads += 1
+        for position in (2, 3):
+            if instr[position] in loaded:
+                renamed[position] = loaded[instr[position]]
+        target = definition(instr)
+        if target is None or target not in memory:
+            code.append(tuple(renamed))
+        elif instr[0] is COPY:
+            renamed[1] = memory[target]
+            code.append(tuple(renamed))
+            self.stores += 1
+        else:
+            renamed[1] = scratch[0]
+            code.append(tuple(renamed))
+            code.append((COPY, memory[target], scratch[0], None))
+            self.stores += 1
+
+    def report(self):
+        return {
+            "registers": self.registers,
+            "temps_before": self.temps_before,
+            "temps_after": self.temps_after,
+            "max_live_before": self.max_live_before,
+            "max_live_after": self.max_live_after,
+            "spilled": self.spilled,
+            "slots": self.slots,
+            "loads": self.loads,
+            "stores": self.stores,
+        }
+
+
+# ===============================
+# Análises
+# ===============================
+
+def live_intervals(cfg, live_in, live_out):
+    # Temporário -> [início, fim] em posições dobradas, cobrindo cada
+    # leitura, escrita e bloco em que ele entra ou sai vivo.
+    intervals = {}
+
+    def extend(operand, point):
+        interval = intervals.get(operand)
+        if interval is None:
+            intervals[operand] = [point, point]
+        elif point < interval[0]:
+            interval[0] = point
+        elif point > interval[1]:
+            interval[1] = point
+
+    position = 0
+    for block in cfg.blocks:
+        for operand in live_in[block.index]:
+            if operand.kind is TEMP:
+                extend(operand, 2 * position)
+        for instr in block.instrs:
+            for operand in uses(instr):
+                if operand.kind is TEMP:
+                    extend(operand, 2 * position)
+            target = definition(instr)
+            if target is not None and target.kind is TEMP:
+                extend(target, 2 * position + 1)
+            position += 1
+        for operand in live_out[block.index]:
+            if operand.kind is TEMP:
+                extend(operand, 2 * position - 1)
+    return intervals
+
+
+def max_live(cfg, live_out):
+    # Maior número de temporários vivos ao mesmo tempo.
+    best = 0
+    for block in cfg.blocks:
+        live = {operand for operand in live_out[block.index] if operand.kind is TEMP}
+        best = max(best, len(live))
+        for instr in reversed(block.instrs):
+            target = definition(instr)
+            if target is not None:
+                live.discard(target)
+            for operand in uses(instr):
+                if operand.kind is TEMP:
+                    live.add(operand)
+            best = max(best, len(live))
+    return best
+
+
+def _linear_scan(intervals, limit):
+    # Operando -> número (1, 2...), sem dar o mesmo número a intervalos
+    # que se sobrepõem e usando no máximo limit números (None: sem
+    # limite). Quando não há número livre, sai o intervalo que termina
+    # mais tarde; devolve também a lista dos que saíram.
+    order = sorted(intervals, key=lambda operand: (intervals[operand][0], operand.name))
+    assigned = {}
+    spilled = []
+    # (fim, ordem, operando) dos intervalos com número; os derramados
+    # continuam no heap e são ignorados quando saem.
+    active = []
+    free = []
+    used = 0
+    for sequence, operand in enumerate(order):
+        start, end = intervals[operand]
+        while active and active[0][0] < start:
+            _, _, finished = heappop(active)
+            if finished in assigned:
+                heappush(free, assigned[finished])
+        if free:
+            assigned[operand] = heappop(free)
+        elif limit is None or used < limit:
+            used += 1
+            assigned[operand] = used
+        else:
+            victim = max((entry for entry in active if entry[2] in assigned),
+                         key=lambda entry: entry[0])
+            if victim[0] > end:
+                assigned[operand] = assigned.pop(victim[2])
+                spilled.append(victim[2])
+            else:
+                spilled.append(operand)
+                continue
+        heappush(active, (end, sequence, operand))
+    return assigned, spilled
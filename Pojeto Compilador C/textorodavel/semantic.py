@@ -1,82 +1,187 @@
 from lexer import TokenType
 from parser import *
+from visitor import Visitor, children
+
+# ===============================
+# Tabela de símbolos
+# ===============================
+# Cada identificador é internado uma vez e ganha um id inteiro; cada
+# variável declarada ganha um slot, o índice dela em `types`/`names`, na
+# ordem das declarações. O que está visível em cada momento fica em
+# `bindings` (id -> slot, -1 = nenhum). Abrir um escopo só marca o tamanho
+# do log de desfazer; fechar restaura as entradas registradas desde a
+# marca, sem copiar dicionários.
+#
+# Variáveis do escopo global se chamam pelo próprio nome no TAC e nos
+# backends; as de blocos internos se chamam "nome.slot", já que o mesmo
+# nome pode ser declarado de novo em outro bloco ou ocultar um de fora.
+# `symbols` mapeia esses nomes para o tipo, na ordem dos slots.
 
 class SymbolTable:
     def __init__(self):
+        self.ids = {}
+        self.bindings = []
+        self.types = []
+        self.names = []
+        self.depths = []
         self.symbols = {}
+        self.undo = []
+        self.marks = []
+
+    def intern(self, name):
+        identifier = self.ids.get(name)
+        if identifier is None:
+            identifier = self.ids[name] = len(self.bindings)
+            self.bindings.append(-1)
+        return identifier
+
+    def push_scope(self):
+        self.marks.append(len(self.undo))
+
+    def pop_scope(self):
+        mark = self.marks.pop()
+        undo = self.undo
+        bindings = self.bindings
+        while len(undo) > mark:
+            identifier, slot = undo.pop()
+            bindings[identifier] = slot
 
     def declare(self, name, var_type):
-        if name in self.symbols:
+        identifier = self.intern(name)
+        current = self.bindings[identifier]
+        depth = len(self.marks)
+        if current >= 0 and self.depths[current] == depth:
             raise Exception(f"Variável '{name}' já declarada")
-        self.symbols[name] = var_type
+        slot = len(self.types)
+        storage = name if depth == 0 else f"{name}.{slot}"
+        self.types.append(var_type)
+        self.names.append(storage)
+        self.depths.append(depth)
+        self.symbols[storage] = var_type
+        if depth:
+            self.undo.append((identifier, current))
+        self.bindings[identifier] = slot
+        return slot
+
+    def lookup(self, name):
+        identifier = self.ids.get(name)
+        slot = self.bindings[identifier] if identifier is not None else -1
+        if slot < 0:
+            raise Exception(f"Variável '{name}' não declarada")
+        return slot
 
     def get(self, name):
-        if name not in self.symbols:
-            raise Exception(f"Variável '{name}' não declarada")
-        return self.symbols[name]
+        return self.types[self.lookup(name)]
+
+
+# Operadores aritméticos que não valem para string (só + concatena); "-"
+# vale também para o menos unário.
+NOT_FOR_STRINGS = frozenset(("-", "*", "/"))
+
 
+def check_string_operator(operator, operand_type):
+    if operand_type == TokenType.STRING and operator.lexeme in NOT_FOR_STRINGS:
+        raise Exception(f"Operação '{operator.lexeme}' não suportada em string")
 
-class SemanticAnalyzer:
+
+class SemanticAnalyzer(Visitor):
+    # Visitante sem recursão (ver visitor.py); cada expressão devolve o
+    # seu tipo.
     def __init__(self):
         self.table = SymbolTable()
 
     def analyze(self, node):
-        if node is None:
-            return None
-        method = f"visit_{type(node).__name__}"
-        return getattr(self, method)(node)
-
-    def visit_Program(self, node):
-        for stmt in node.statements:
-            self.analyze(stmt)
-
-    def visit_Block(self, node):
-        for stmt in node.statements:
-            self.analyze(stmt)
-
-    def visit_VarDecl(self, node):
-        self.table.declare(node.name, node.var_type)
-        if node.initializer:
-            init_type = self.analyze(node.initializer)
-            if init_type != node.var_type:
-                raise Exception("Tipos incompatíveis na inicialização")
-
-    def visit_Assignment(self, node):
-        var_type = self.table.get(node.name)
-        value_type = self.analyze(node.value)
-        if var_type != value_type:
+        return self.visit(node)
+
+    def visit_None(self, node):
+        return None
+
+    @children("statements")
+    def visit_Program(self, node, statements):
+        pass
+
+    def _push_scope(self, node):
+        self.table.push_scope()
+
+    @children("statements", enter=_push_scope)
+    def visit_Block(self, node, statements):
+        self.table.pop_scope()
+
+    def _declare(self, node):
+        node.slot = self.table.declare(node.name, node.var_type)
+
+    @children("initializer", enter=_declare)
+    def visit_VarDecl(self, node, init_type):
+        if node.initializer and init_type != node.var_type:
+            raise Exception("Tipos incompatíveis na inicialização")
+
+    def _lookup(self, node):
+        node.slot = self.table.lookup(node.name)
+
+    @children("value", enter=_lookup)
+    def visit_Assignment(self, node, value_type):
+        if self.table.types[node.slot] != value_type:
             raise Exception("Tipos incompatíveis na atribuição")
 
-    def visit_Print(self, node):
-        for expr in node.expressions:
-            self.analyze(expr)
+    @children("expressions")
+    def visit_Print(self, node, expressions):
+        pass
 
     def visit_Read(self, node):
-        self.table.get(node.name)
+        node.slot = self.table.lookup(node.name)
+
+    # Os ramos do if e o corpo do while são escopos próprios mesmo sem
+    # chaves, como em C (um Block já abre o seu).
 
     def visit_If(self, node):
-        self.analyze(node.condition)
-        self.analyze(node.then_branch)
+        table = self.table
+        yield node.condition
+        scoped = _needs_scope(node.then_branch)
+        if scoped:
+            table.push_scope()
+        yield node.then_branch
+        if scoped:
+            table.pop_scope()
         if node.else_branch:
-            self.analyze(node.else_branch)
+            scoped = _needs_scope(node.else_branch)
+            if scoped:
+                table.push_scope()
+            yield node.else_branch
+            if scoped:
+                table.pop_scope()
 
     def visit_While(self, node):
-        self.analyze(node.condition)
-        self.analyze(node.body)
-
-    def visit_BinaryExpr(self, node):
-        left = self.analyze(node.left)
-        right = self.analyze(node.right)
+        yield node.condition
+        scoped = _needs_scope(node.body)
+        if scoped:
+            self.table.push_scope()
+        yield node.body
+        if scoped:
+            self.table.pop_scope()
+
+    @children("left", "right")
+    def visit_BinaryExpr(self, node, left, right):
         if left != right:
             raise Exception("Operação entre tipos incompatíveis")
+        check_string_operator(node.operator, left)
+        node.expr_type = left
         return left
 
-    def visit_UnaryExpr(self, node):
-        return self.analyze(node.expr)
+    @children("expr")
+    def visit_UnaryExpr(self, node, expr_type):
+        check_string_operator(node.operator, expr_type)
+        node.expr_type = expr_type
+        return expr_type
 
     def visit_Literal(self, node):
+        node.expr_type = node.literal_type
         return node.literal_type
 
     def visit_Variable(self, node):
-        return self.table.get(node.name)
-    
\ No newline at end of file
+        node.slot = self.table.lookup(node.name)
+        node.expr_type = self.table.types[node.slot]
+        return node.expr_type
+
+
+def _needs_scope(node):
+    return node is not None and not isinstance(node, Block)
@@ -0,0 +1,244 @@
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+
+from lexer import Lexer
+from parser import Parser
+from ast_printer import ASTPrinter
+from fused import check_and_generate
+from optimizer import Optimizer, PASSES
+from tac import format_tac, interning
+from vm import VM
+from protocol import default_socket_path, recv_frame, send_frame
+
+# ===============================
+# Servidor de compilação
+# ===============================
+# Processo de longa duração que escuta num socket Unix e atende pedidos
+# de compilação/execução com os módulos do compilador já importados e as
+# tabelas do lexer já compiladas: o custo de subir o interpretador e
+# importar tudo é pago uma vez, não a cada arquivo. Cada conexão é
+# atendida na sua própria thread.
+#
+# A saída volta ao cliente em trechos enquanto o programa roda, e cada
+# read pede uma linha ao cliente só quando é executado. Um pedido "run"
+# com "timeout" (ou com o limite do --timeout do servidor) é interrompido
+# ao fim do prazo; se o cliente desconectar, o programa para na próxima
+# escrita ou leitura.
+#
+# Só erros do programa ou da entrada (sintaxe, semântica, execução,
+# arquivo) voltam ao cliente como diagnóstico; qualquer outra exceção é
+# falha do compilador: o servidor a registra com o traceback no seu
+# stderr e responde só que houve um erro interno.
+
+_CHUNK = 64 * 1024
+
+
+def execute(request, stdout, stdin=None):
+    # Atende um pedido escrevendo a saída em stdout. Devolve (status,
+    # mensagem de erro ou ""). Usado pelo servidor e, sem servidor, pelo
+    # próprio cliente, então as duas formas produzem a mesma saída. Uma
+    # falha do compilador não é capturada.
+    op = request.get("op", "check")
+    if op not in ("check", "tac", "run"):
+        return 2, f"Operação desconhecida: {op}"
+    if "source" not in request and "path" not in request:
+        return 2, "Pedido sem source nem path"
+    # Os operandos do TAC só vivem durante o pedido.
+    with interning():
+        return _execute(op, request, stdout, stdin)
+
+
+def _execute(op, request, stdout, stdin):
+    try:
+        if "source" in request:
+            source = request["source"]
+        else:
+            with open(request["path"], encoding="utf-8") as file:
+                source = file.read()
+
+        tokens = Lexer(source).token_stream()
+        ast = Parser(tokens).parse()
+        if op == "check":
+            ASTPrinter(stdout).print(ast)
+        symbols, tac_code = check_and_generate(ast)
+        if request.get("optimize"):
+            no_pass = request.get("no_pass", ())
+            tac_code = Optimizer([name for name in PASSES if name not in no_pass]).optimize(tac_code)
+
+        if op == "check":
+            stdout.write("Programa válido!\n")
+        elif op == "tac":
+            for line in format_tac(tac_code):
+                stdout.write(line + "\n")
+        else:
+            run_program(tac_code, symbols, stdin, stdout, request.get("timeout"))
+        return 0, ""
+    except RecursionError:
+        return 1, "Programa aninhado demais"
+    except (SyntaxError, RuntimeError, OSError, UnicodeDecodeError) as exc:
+        # RuntimeError: erros da VM; OSError: o arquivo, o prazo
+        # (TimeoutError) ou o cliente que desconectou.
+        return 1, str(exc)
+    except Exception as exc:
+        # Os erros semânticos são Exception puras; uma subclasse que chega
+        # aqui é falha do compilador.
+        if type(exc) is not Exception:
+            raise
+        return 1, str(exc)
+
+
+def run_program(tac_code, symbols, stdin, stdout, timeout=None):
+    vm = VM(tac_code, symbols, stdin, stdout)
+    if timeout is None:
+        vm.run()
+        return
+    timer = threading.Timer(timeout, vm.cancel,
+                            (TimeoutError(f"Tempo limite de {timeout:g} s esgotado"),))
+    timer.daemon = True
+    timer.start()
+    try:
+        vm.run()
+    finally:
+        timer.cancel()
+
+
+class _RemoteOutput:
+    # stdout de um pedido: junta as escritas e manda um trecho ao cliente
+    # a cada flush (a VM faz um a cada lote de prints e antes de cada read)
+    # ou quando passam de _CHUNK.
+    def __init__(self, sock):
+        self.sock = sock
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= _CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.size:
+            text = "".join(self.parts)
+            self.parts.clear()
+            self.size = 0
+            send_frame(self.sock, {"output": text})
+
+
+class _RemoteInput:
+    # stdin de um pedido: cada linha é pedida ao cliente quando o programa
+    # executa read; uma conexão fechada conta como fim da entrada.
+    def __init__(self, sock, output):
+        self.sock = sock
+        self.output = output
+
+    def readline(self):
+        self.output.flush()
+        send_frame(self.sock, {"input": True})
+        reply = recv_frame(self.sock)
+        if reply is None:
+            return ""
+        return reply.get("line", "")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                request = recv_frame(sock)
+            except (ValueError, ConnectionError):
+                return
+            if request is None:
+                return
+            op = request.get("op")
+            if op == "ping":
+                send_frame(sock, {"status": 0, "stderr": "", "pid": os.getpid()})
+                continue
+            if op == "shutdown":
+                send_frame(sock, {"status": 0, "stderr": ""})
+                # shutdown() espera o laço de serve_forever, que roda em
+                # outra thread.
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            limit = self.server.run_timeout
+            if limit is not None:
+                timeout = request.get("timeout")
+                request["timeout"] = limit if timeout is None else min(timeout, limit)
+            stdout = _RemoteOutput(sock)
+            try:
+                status, error = execute(request, stdout, _RemoteInput(sock, stdout))
+            except Exception:
+                traceback.print_exc()
+                status, error = 1, "Erro interno do compilador (ver o log do servidor)"
+            try:
+                stdout.flush()
+                send_frame(sock, {"status": status, "stderr": error})
+            except OSError:
+                return
+
+
+class CompileServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, run_timeout=None):
+        _claim_socket(path)
+        # Só o dono pode conectar.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+        self.path = path
+        self.run_timeout = run_timeout
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _claim_socket(path):
+    # Um socket que ainda aceita conexões pertence a outro servidor vivo;
+    # um que recusa é sobra de um servidor que morreu.
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"Já existe um servidor em {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de compilação da linguagem .mc")
+    parser.add_argument("--socket", default=default_socket_path(),
+                        help="caminho do socket Unix (padrão: $MC_SERVER_SOCKET)")
+    parser.add_argument("--timeout", type=float, metavar="SEGUNDOS",
+                        help="tempo máximo de execução de cada programa (padrão: sem limite)")
+    args = parser.parse_args(argv)
+    try:
+        server = CompileServer(args.socket, args.timeout)
+    except OSError as exc:
+        raise SystemExit(str(exc))
+    print(f"servidor em {args.socket} (pid {os.getpid()})", file=sys.stderr)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
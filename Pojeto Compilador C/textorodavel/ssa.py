@@ -0,0 +1,469 @@
+from tac import (CONSTANT, COPY, GOTO, IF_FALSE, JUMPS, LABEL, READ, Operand, definition,
+                 format_instr, label, temp, uses)
+from optimizer import CFG, DominatorTree, _evaluate, _may_fail, _next_numbers, _replace_uses
+
+# ===============================
+# Forma SSA do TAC
+# ===============================
+# to_ssa monta o CFG da lista plana, calcula os dominadores (Cooper,
+# Harvey e Kennedy, em optimizer.dominators), as fronteiras de dominância
+# e põe funções phi só para os nomes lidos em algum bloco antes de serem
+# escritos nele (SSA semi-podada); depois renomeia cada escrita para uma
+# versão nova, numa busca em profundidade sem recursão pela árvore de
+# dominadores. Tudo é linear no tamanho do código, fora as fronteiras, que
+# em programas estruturados (if/while) também ficam pequenas.
+#
+# Versões se chamam "a#1", "a#2"... e guardam em bases o nome original.
+# Um uso sem escrita antes (o valor inicial da variável) continua com o
+# próprio nome, e nomes escritos uma só vez e lidos só no mesmo bloco
+# depois da escrita (quase todos os temporários) não ganham versão.
+#
+# from_ssa volta para a lista plana trocando cada versão pelo nome
+# original e cada phi por cópias nos predecessores (dividindo arestas
+# críticas) quando o que chega por uma aresta não é a própria variável.
+# Isso só vale se as versões de um mesmo nome nunca estão vivas ao mesmo
+# tempo, o que a construção garante e sccp preserva: ela só troca usos por
+# constantes e apaga código.
+
+_TOP = object()       # ainda sem valor conhecido
+_BOTTOM = object()    # não é constante
+
+
+class Phi:
+    __slots__ = ("base", "target", "args")
+
+    def __init__(self, base):
+        self.base = base
+        self.target = base
+        # Índice do bloco predecessor (None: a entrada do programa) ->
+        # operando que chega por aquela aresta.
+        self.args = {}
+
+
+class SSAForm:
+    def __init__(self, cfg, tree, phis, bases):
+        self.cfg = cfg
+        self.tree = tree
+        # Phis no começo de cada bloco, por índice.
+        self.phis = phis
+        # Versão -> nome original.
+        self.bases = bases
+
+    def reachable(self, index):
+        return self.tree.enter[index] >= 0
+
+
+# ===============================
+# Construção
+# ===============================
+
+def dominance_frontiers(cfg, tree):
+    # Fronteira de cada bloco alcançável: sobe dos predecessores de cada
+    # junção até o dominador imediato dela.
+    idom = tree.idom
+    frontiers = [[] for _ in cfg.blocks]
+    for block in cfg.blocks:
+        index = block.index
+        if idom[index] is None or len(block.preds) + (index == 0) < 2:
+            continue
+        stop = idom[index] if index else None
+        for predecessor in block.preds:
+            runner = predecessor.index
+            if idom[runner] is None:
+                continue
+            while runner != stop:
+                frontier = frontiers[runner]
+                if frontier and frontier[-1] == index:
+                    # Daqui para cima a junção já foi anotada.
+                    break
+                frontier.append(index)
+                if runner == 0:
+                    break
+                runner = idom[runner]
+    return frontiers
+
+
+def to_ssa(instrs):
+    cfg = CFG(instrs)
+    tree = DominatorTree(cfg)
+    reachable = [enter >= 0 for enter in tree.enter]
+
+    # Nomes lidos antes de escritos em algum bloco (os únicos que podem
+    # precisar de phi) e blocos que escrevem cada nome.
+    exposed = set()
+    sites = {}
+    for block in cfg.blocks:
+        if not reachable[block.index]:
+            continue
+        written = set()
+        for instr in block.instrs:
+            for operand in uses(instr):
+                if operand.kind is not CONSTANT and operand not in written:
+                    exposed.add(operand)
+            target = definition(instr)
+            if target is not None:
+                written.add(target)
+                blocks = sites.get(target)
+                if blocks is None:
+                    sites[target] = [block.index]
+                else:
+                    blocks.append(block.index)
+
+    frontiers = dominance_frontiers(cfg, tree)
+    phis = [[] for _ in cfg.blocks]
+    for name, blocks in sites.items():
+        if name not in exposed:
+            continue
+        placed = set()
+        work = list(dict.fromkeys(blocks))
+        queued = set(work)
+        while work:
+            for index in frontiers[work.pop()]:
+                if index not in placed:
+                    placed.add(index)
+                    phis[index].append(Phi(name))
+                    if index not in queued:
+                        queued.add(index)
+                        work.append(index)
+
+    # Escrito uma vez e nunca lido antes da escrita: já está em SSA.
+    renamed = {name for name, blocks in sites.items() if len(blocks) > 1 or name in exposed}
+    bases = {}
+    counters = {}
+    stacks = {}
+
+    def fresh(base):
+        number = counters.get(base, 0) + 1
+        counters[base] = number
+        version = Operand(base.kind, f"{base.name}#{number}")
+        bases[version] = base
+        stack = stacks.get(base)
+        if stack is None:
+            stacks[base] = [version]
+        else:
+            stack.append(version)
+        return version
+
+    def current(operand):
+        stack = stacks.get(operand)
+        return stack[-1] if stack else operand
+
+    if not cfg.blocks:
+        return SSAForm(cfg, tree, phis, bases)
+    for phi in phis[0]:
+        phi.args[None] = phi.base
+    # (bloco, None) entra no bloco; (bloco, nomes) desempilha as versões
+    # que ele criou, depois de visitados os filhos na árvore.
+    tasks = [(0, None)]
+    while tasks:
+        index, pushed = tasks.pop()
+        if pushed is not None:
+            for base in pushed:
+                stacks[base].pop()
+            continue
+        pushed = []
+        for phi in phis[index]:
+            phi.target = fresh(phi.base)
+            pushed.append(phi.base)
+        block = cfg.blocks[index]
+        instrs = block.instrs
+        for position, instr in enumerate(instrs):
+            instr = _replace_uses(instr, current)
+            target = definition(instr)
+            if target is not None and target in renamed:
+                instr = (instr[0], fresh(target), instr[2], instr[3])
+                pushed.append(target)
+            instrs[position] = instr
+        for successor in block.succs:
+            for phi in phis[successor.index]:
+                phi.args[index] = current(phi.base)
+        tasks.append((index, pushed))
+        tasks.extend((child, None) for child in reversed(tree.children[index]))
+    return SSAForm(cfg, tree, phis, bases)
+
+
+def format_ssa(ssa):
+    # Texto do TAC em SSA, com as phis no começo de cada bloco e a origem
+    # de cada argumento (B<índice> do bloco predecessor).
+    lines = []
+    for block in ssa.cfg.blocks:
+        instrs = block.instrs
+        start = 1 if instrs and instrs[0][0] is LABEL else 0
+        lines.extend(format_instr(instr) for instr in instrs[:start])
+        lines.append(f"# B{block.index}")
+        for phi in ssa.phis[block.index]:
+            args = ", ".join(f"{arg.name} [{'entrada' if pred is None else f'B{pred}'}]"
+                             for pred, arg in phi.args.items())
+            lines.append(f"{phi.target.name} = phi({args})")
+        lines.extend(format_instr(instr) for instr in instrs[start:])
+    return lines
+
+
+# ===============================
+# Volta da SSA
+# ===============================
+
+def _sequential(copies, new_temp):
+    # Ordena cópias paralelas (destino, origem) de forma que nenhuma leia
+    # um destino já escrito; num ciclo, uma origem é salva antes num
+    # temporário novo.
+    pending = {target: source for target, source in copies if target is not source}
+    result = []
+    while pending:
+        read = set(pending.values())
+        ready = [target for target in pending if target not in read]
+        if ready:
+            for target in ready:
+                result.append((COPY, target, pending.pop(target), None))
+            continue
+        target, source = next(iter(pending.items()))
+        saved = new_temp()
+        result.append((COPY, saved, source, None))
+        for other, value in pending.items():
+            if value is source:
+                pending[other] = saved
+    return result
+
+
+def from_ssa(ssa):
+    cfg = ssa.cfg
+    get = ssa.bases.get
+    stripped = [[(instr[0], get(instr[1], instr[1]), get(instr[2], instr[2]),
+                  get(instr[3], instr[3])) for instr in block.instrs] for block in cfg.blocks]
+
+    # (predecessor, bloco) -> cópias paralelas daquela aresta.
+    edges = {}
+    for index, phis in enumerate(ssa.phis):
+        for phi in phis:
+            target = get(phi.target, phi.target)
+            for predecessor, arg in phi.args.items():
+                source = get(arg, arg)
+                if source is not target:
+                    edges.setdefault((predecessor, index), []).append((target, source))
+    if not edges:
+        return [instr for instrs in stripped for instr in instrs]
+
+    numbers = list(_next_numbers([instr for instrs in stripped for instr in instrs]))
+
+    def new_temp():
+        numbers[0] += 1
+        return temp(numbers[0] - 1)
+
+    def new_label():
+        numbers[1] += 1
+        return label(numbers[1] - 1)
+
+    result = []
+    if (None, 0) in edges:
+        result.extend(_sequential(edges[(None, 0)], new_temp))
+    # Blocos das arestas divididas, que vão para o fim do código.
+    trailers = []
+    for index, instrs in enumerate(stripped):
+        last = instrs[-1] if instrs else None
+        following = index + 1
+        if last is not None and last[0] is GOTO:
+            copies = edges.get((index, cfg.label_blocks[last[1]].index))
+            if copies:
+                instrs[-1:] = _sequential(copies, new_temp) + [last]
+        elif last is not None and last[0] is IF_FALSE:
+            copies = edges.get((index, cfg.label_blocks[last[1]].index))
+            if copies:
+                # Aresta crítica do desvio: as cópias vão num bloco próprio.
+                split = new_label()
+                trailers.append((LABEL, split, None, None))
+                trailers.extend(_sequential(copies, new_temp))
+                trailers.append((GOTO, last[1], None, None))
+                instrs[-1] = (IF_FALSE, split, last[2], None)
+            copies = edges.get((index, following))
+            if copies:
+                # Aresta crítica da passagem direta: logo depois do desvio.
+                instrs.extend(_sequential(copies, new_temp))
+        else:
+            copies = edges.get((index, following))
+            if copies:
+                instrs.extend(_sequential(copies, new_temp))
+        result.extend(instrs)
+    if trailers:
+        end = new_label()
+        result.append((GOTO, end, None, None))
+        result.extend(trailers)
+        result.append((LABEL, end, None, None))
+    return result
+
+
+# ===============================
+# Propagação de constantes esparsa condicional
+# ===============================
+# Wegman e Zadeck: cada versão começa em _TOP e só desce (constante, depois
+# _BOTTOM); arestas do CFG só passam a executáveis quando o desvio que as
+# usa pode tomá-las. Um ifFalse de condição constante tem uma só aresta
+# executável: o outro lado nunca é visitado e sai do código junto com o
+# desvio, e as phis perdem os argumentos que chegavam por ele.
+
+def propagate(ssa):
+    # Analisa e reescreve ssa no lugar; devolve o número de instruções
+    # reescritas ou removidas.
+    cfg = ssa.cfg
+    blocks = cfg.blocks
+    phis = ssa.phis
+    count = len(blocks)
+    if not count:
+        return 0
+
+    # Operando -> lugares que o leem: (bloco, posição) ou (bloco, phi).
+    readers = {}
+    defined = set()
+    for block in blocks:
+        if not ssa.reachable(block.index):
+            continue
+        index = block.index
+        for phi in phis[index]:
+            defined.add(phi.target)
+            for arg in phi.args.values():
+                readers.setdefault(arg, []).append((index, phi))
+        for position, instr in enumerate(block.instrs):
+            for operand in uses(instr):
+                if operand.kind is not CONSTANT:
+                    readers.setdefault(operand, []).append((index, position))
+            target = definition(instr)
+            if target is not None:
+                defined.add(target)
+
+    values = {}
+    executable = set()
+    visited = [False] * count
+    flow = [(None, 0)]
+    changed = []
+
+    def value(operand):
+        if operand.kind is CONSTANT:
+            return operand
+        if operand in defined:
+            return values.get(operand, _TOP)
+        # Valor inicial da variável, que depende do tipo.
+        return _BOTTOM
+
+    def lower(target, new):
+        if values.get(target, _TOP) is not new:
+            values[target] = new
+            changed.append(target)
+
+    def edge(source, destination):
+        if (source, destination) not in executable:
+            flow.append((source, destination))
+
+    def evaluate(index, position):
+        instr = blocks[index].instrs[position]
+        opcode = instr[0]
+        if opcode is GOTO:
+            edge(index, cfg.label_blocks[instr[1]].index)
+            return
+        if opcode is IF_FALSE:
+            condition = value(instr[2])
+            if condition is _TOP:
+                return
+            if condition is _BOTTOM or not condition.value:
+                edge(index, cfg.label_blocks[instr[1]].index)
+            if (condition is _BOTTOM or condition.value) and index + 1 < count:
+                edge(index, index + 1)
+            return
+        target = definition(instr)
+        if target is None:
+            return
+        if opcode is READ:
+            lower(target, _BOTTOM)
+            return
+        known = {}
+        for operand in uses(instr):
+            result = value(operand)
+            if result is _TOP or result is _BOTTOM:
+                if result is _BOTTOM:
+                    lower(target, _BOTTOM)
+                return
+            known[operand] = result
+        result = _evaluate(_replace_uses(instr, known.get))
+        lower(target, _BOTTOM if result is None else result)
+
+    def merge(index, phi):
+        result = _TOP
+        for predecessor, arg in phi.args.items():
+            if (predecessor, index) not in executable:
+                continue
+            incoming = value(arg)
+            if incoming is _TOP:
+                continue
+            if incoming is _BOTTOM or (result is not _TOP and result is not incoming):
+                result = _BOTTOM
+                break
+            result = incoming
+        if result is not _TOP:
+            lower(phi.target, result)
+
+    while flow or changed:
+        if flow:
+            source, index = flow.pop()
+            if (source, index) in executable:
+                continue
+            executable.add((source, index))
+            for phi in phis[index]:
+                merge(index, phi)
+            if visited[index]:
+                continue
+            visited[index] = True
+            instrs = blocks[index].instrs
+            for position in range(len(instrs)):
+                evaluate(index, position)
+            if instrs[-1][0] not in JUMPS and index + 1 < count:
+                edge(index, index + 1)
+            continue
+        for index, reader in readers.get(changed.pop(), ()):
+            if not visited[index]:
+                continue
+            if reader.__class__ is Phi:
+                merge(index, reader)
+            else:
+                evaluate(index, reader)
+
+    def known(operand):
+        result = value(operand)
+        return operand if result is _TOP or result is _BOTTOM else result
+
+    rewritten = 0
+    for block in blocks:
+        index = block.index
+        if not visited[index]:
+            rewritten += len(block.instrs)
+            block.instrs = []
+            phis[index] = []
+            continue
+        for phi in phis[index]:
+            phi.args = {predecessor: arg for predecessor, arg in phi.args.items()
+                        if (predecessor, index) in executable}
+        kept = []
+        for instr in block.instrs:
+            new = _replace_uses(instr, known)
+            opcode = new[0]
+            if opcode is IF_FALSE and new[2].kind is CONSTANT:
+                rewritten += 1
+                if not new[2].value:
+                    kept.append((GOTO, new[1], None, None))
+                continue
+            target = definition(new)
+            if target is not None and opcode is not COPY and opcode is not READ:
+                result = values.get(target, _TOP)
+                if result is not _TOP and result is not _BOTTOM and not _may_fail(new):
+                    new = (COPY, target, result, None)
+            if new != instr:
+                rewritten += 1
+            kept.append(new)
+        block.instrs = kept
+    return rewritten
+
+
+def sccp(instrs):
+    # Passo do otimizador: SSA, propagação e volta para a lista plana.
+    ssa = to_ssa(instrs)
+    rewritten = propagate(ssa)
+    if not rewritten:
+        return instrs, 0
+    return from_ssa(ssa), rewritten
@@ -0,0 +1,494 @@
+import operator
+import re
+import threading
+from contextlib import contextmanager
+from enum import IntEnum
+from sys import intern
+
+from lexer import TokenType
+
+# ===============================
+# TAC: quádruplas
+# ===============================
+# Representação estruturada compartilhada pelo gerador, pelo otimizador e
+# pela VM. Cada instrução é uma tupla (opcode, result, arg1, arg2):
+#
+#   LABEL     result = rótulo                   L:
+#   GOTO      result = rótulo                   goto L
+#   IF_FALSE  result = rótulo, arg1 = condição  ifFalse c goto L
+#   PRINT     arg1 = valor                      print v
+#   READ      result = variável                 read x
+#   COPY      result, arg1                      x = v
+#   ADD..OR   result, arg1, arg2                x = a op b
+#   NEG, NOT  result, arg1                      x = op a
+#
+# As operações aritméticas e as comparações também têm versões por tipo
+# dos operandos (ADD_INT, ADD_FLOAT, CONCAT, LT_INT...), escolhidas pelo
+# gerador a partir dos tipos anotados na AST (ver specialize); as genéricas
+# ficam para o que não tem versão própria (comparação de strings, &&, ||,
+# !) e para TAC sem tipos (decode_tac). As duas formas têm o mesmo texto.
+#
+# Campos não usados são None. Os operandos são objetos Operand internados
+# (um por nome/constante), então podem ser comparados com "is" e usados
+# como chave de dict sem custo de hash de string. O texto do TAC é só uma
+# forma de impressão (format_tac) e de leitura (decode_tac).
+
+
+class Opcode(IntEnum):
+    LABEL = 0
+    GOTO = 1
+    IF_FALSE = 2
+    PRINT = 3
+    READ = 4
+    COPY = 5
+    ADD = 6
+    SUB = 7
+    MUL = 8
+    DIV = 9
+    EQ = 10
+    NE = 11
+    LT = 12
+    GT = 13
+    LE = 14
+    GE = 15
+    AND = 16
+    OR = 17
+    NEG = 18
+    NOT = 19
+    ADD_INT = 20
+    ADD_FLOAT = 21
+    CONCAT = 22
+    SUB_INT = 23
+    SUB_FLOAT = 24
+    MUL_INT = 25
+    MUL_FLOAT = 26
+    DIV_INT = 27
+    DIV_FLOAT = 28
+    EQ_INT = 29
+    EQ_FLOAT = 30
+    NE_INT = 31
+    NE_FLOAT = 32
+    LT_INT = 33
+    LT_FLOAT = 34
+    GT_INT = 35
+    GT_FLOAT = 36
+    LE_INT = 37
+    LE_FLOAT = 38
+    GE_INT = 39
+    GE_FLOAT = 40
+    NEG_INT = 41
+    NEG_FLOAT = 42
+
+
+LABEL = Opcode.LABEL
+GOTO = Opcode.GOTO
+IF_FALSE = Opcode.IF_FALSE
+PRINT = Opcode.PRINT
+READ = Opcode.READ
+COPY = Opcode.COPY
+
+BINARY_OPCODES = {
+    "+": Opcode.ADD,
+    "-": Opcode.SUB,
+    "*": Opcode.MUL,
+    "/": Opcode.DIV,
+    "==": Opcode.EQ,
+    "!=": Opcode.NE,
+    "<": Opcode.LT,
+    ">": Opcode.GT,
+    "<=": Opcode.LE,
+    ">=": Opcode.GE,
+    "&&": Opcode.AND,
+    "||": Opcode.OR,
+}
+
+UNARY_OPCODES = {
+    "-": Opcode.NEG,
+    "!": Opcode.NOT,
+}
+
+# (opcode genérico, tipo dos operandos) -> opcode especializado.
+SPECIALIZED = {
+    (Opcode.ADD, TokenType.INT): Opcode.ADD_INT,
+    (Opcode.ADD, TokenType.FLOAT): Opcode.ADD_FLOAT,
+    (Opcode.ADD, TokenType.STRING): Opcode.CONCAT,
+    (Opcode.SUB, TokenType.INT): Opcode.SUB_INT,
+    (Opcode.SUB, TokenType.FLOAT): Opcode.SUB_FLOAT,
+    (Opcode.MUL, TokenType.INT): Opcode.MUL_INT,
+    (Opcode.MUL, TokenType.FLOAT): Opcode.MUL_FLOAT,
+    (Opcode.DIV, TokenType.INT): Opcode.DIV_INT,
+    (Opcode.DIV, TokenType.FLOAT): Opcode.DIV_FLOAT,
+    (Opcode.EQ, TokenType.INT): Opcode.EQ_INT,
+    (Opcode.EQ, TokenType.FLOAT): Opcode.EQ_FLOAT,
+    (Opcode.NE, TokenType.INT): Opcode.NE_INT,
+    (Opcode.NE, TokenType.FLOAT): Opcode.NE_FLOAT,
+    (Opcode.LT, TokenType.INT): Opcode.LT_INT,
+    (Opcode.LT, TokenType.FLOAT): Opcode.LT_FLOAT,
+    (Opcode.GT, TokenType.INT): Opcode.GT_INT,
+    (Opcode.GT, TokenType.FLOAT): Opcode.GT_FLOAT,
+    (Opcode.LE, TokenType.INT): Opcode.LE_INT,
+    (Opcode.LE, TokenType.FLOAT): Opcode.LE_FLOAT,
+    (Opcode.GE, TokenType.INT): Opcode.GE_INT,
+    (Opcode.GE, TokenType.FLOAT): Opcode.GE_FLOAT,
+    (Opcode.NEG, TokenType.INT): Opcode.NEG_INT,
+    (Opcode.NEG, TokenType.FLOAT): Opcode.NEG_FLOAT,
+}
+
+# Opcode genérico de cada opcode (ele mesmo, se já for genérico).
+GENERIC = {opcode: opcode for opcode in Opcode}
+GENERIC.update({typed: generic for (generic, _), typed in SPECIALIZED.items()})
+
+
+def specialize(opcode, operand_type):
+    # Versão de opcode para operandos de operand_type (o tipo anotado pela
+    # análise semântica); a própria opcode se não houver uma ou se o tipo
+    # for desconhecido (None).
+    return SPECIALIZED.get((opcode, operand_type), opcode)
+
+
+SYMBOLS = {opcode: symbol for symbol, opcode in BINARY_OPCODES.items()}
+SYMBOLS.update({opcode: symbol for symbol, opcode in UNARY_OPCODES.items()})
+SYMBOLS.update({typed: SYMBOLS[generic] for (generic, _), typed in SPECIALIZED.items()})
+
+BINARY = frozenset(opcode for opcode in Opcode if GENERIC[opcode] in BINARY_OPCODES.values())
+UNARY = frozenset(opcode for opcode in Opcode if GENERIC[opcode] in UNARY_OPCODES.values())
+DIVISIONS = frozenset((Opcode.DIV, Opcode.DIV_INT, Opcode.DIV_FLOAT))
+JUMPS = frozenset((GOTO, IF_FALSE))
+# Instruções que escrevem em result.
+DEFINES = BINARY | UNARY | {COPY, READ}
+
+
+# ===============================
+# Semântica das operações
+# ===============================
+
+def _divide(left, right):
+    if right == 0:
+        raise RuntimeError("Divisão por zero")
+    if isinstance(left, int) and isinstance(right, int):
+        # Divisão inteira truncada em direção a zero, como em C.
+        quotient = abs(left) // abs(right)
+        return quotient if (left < 0) == (right < 0) else -quotient
+    return left / right
+
+
+def _divide_int(left, right):
+    if right == 0:
+        raise RuntimeError("Divisão por zero")
+    quotient = left // right
+    if quotient < 0 and quotient * right != left:
+        quotient += 1
+    return quotient
+
+
+def _divide_float(left, right):
+    if right == 0:
+        raise RuntimeError("Divisão por zero")
+    if left.__class__ is bool and right.__class__ is bool:
+        # Comparações têm o tipo dos operandos mas valem True/False, e
+        # bool / bool é divisão inteira em _divide.
+        return _divide_int(left, right)
+    return left / right
+
+
+# Valor de uma variável antes da primeira atribuição.
+DEFAULT_VALUES = {
+    TokenType.INT: 0,
+    TokenType.FLOAT: 0.0,
+    TokenType.STRING: "",
+}
+
+
+FUNCTIONS = {
+    Opcode.ADD: operator.add,
+    Opcode.SUB: operator.sub,
+    Opcode.MUL: operator.mul,
+    Opcode.DIV: _divide,
+    Opcode.EQ: operator.eq,
+    Opcode.NE: operator.ne,
+    Opcode.LT: operator.lt,
+    Opcode.GT: operator.gt,
+    Opcode.LE: operator.le,
+    Opcode.GE: operator.ge,
+    Opcode.AND: lambda left, right: bool(left) and bool(right),
+    Opcode.OR: lambda left, right: bool(left) or bool(right),
+    Opcode.NEG: operator.neg,
+    Opcode.NOT: operator.not_,
+}
+FUNCTIONS.update({typed: FUNCTIONS[generic] for (generic, _), typed in SPECIALIZED.items()})
+FUNCTIONS[Opcode.DIV_INT] = _divide_int
+FUNCTIONS[Opcode.DIV_FLOAT] = _divide_float
+
+
+# ===============================
+# Operandos
+# ===============================
+
+class OperandKind(IntEnum):
+    TEMP = 0
+    VARIABLE = 1
+    CONSTANT = 2
+    LABEL = 3
+
+
+TEMP = OperandKind.TEMP
+VARIABLE = OperandKind.VARIABLE
+CONSTANT = OperandKind.CONSTANT
+
+
+class Operand:
+    # name é o texto do operando no TAC; value só existe para constantes.
+    __slots__ = ("kind", "name", "value")
+
+    def __init__(self, kind, name, value=None):
+        self.kind = kind
+        self.name = name
+        self.value = value
+
+    def __repr__(self):
+        return self.name
+
+    __str__ = __repr__
+
+    def __reduce__(self):
+        # pickle passa pelas tabelas de internação, para que o operando
+        # carregado seja o mesmo objeto que o gerador usaria.
+        return (_load_operand, (self.kind, self.name, self.value))
+
+
+# Tabelas de internação por tipo de operando. Temporários e rótulos são
+# numerados (t1, t2... e L1, L2...) em espaços separados: um rótulo nunca
+# colide com um temporário, e nenhum dos dois com uma variável, mesmo que
+# ela se chame t1.
+_temps = [None]
+_labels = [None]
+_variables = {}
+_constants = {}
+_named_labels = {}
+
+
+def _numbered(table, kind, prefix, number):
+    while len(table) <= number:
+        table.append(Operand(kind, intern(f"{prefix}{len(table)}")))
+    return table[number]
+
+
+def temp(number):
+    if number < len(_temps):
+        return _temps[number]
+    return _numbered(_temps, OperandKind.TEMP, "t", number)
+
+
+def label(number):
+    if number < len(_labels):
+        return _labels[number]
+    return _numbered(_labels, OperandKind.LABEL, "L", number)
+
+
+def variable(name):
+    operand = _variables.get(name)
+    if operand is None:
+        name = intern(name)
+        operand = _variables.setdefault(name, Operand(OperandKind.VARIABLE, name))
+    return operand
+
+
+def _constant_text(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, str):
+        return f'"{value}"'
+    return repr(value)
+
+
+def constant(value):
+    # O tipo entra na chave (1, 1.0 e True são constantes diferentes) e o
+    # texto também, para não confundir 0.0 com -0.0.
+    text = _constant_text(value)
+    key = (type(value), text)
+    operand = _constants.get(key)
+    if operand is None:
+        operand = _constants.setdefault(key, Operand(OperandKind.CONSTANT, text, value))
+    return operand
+
+
+def _load_operand(kind, name, value):
+    if kind == OperandKind.CONSTANT:
+        return constant(value)
+    if kind == OperandKind.VARIABLE:
+        return variable(name)
+    if kind == OperandKind.TEMP:
+        return temp(int(name[1:]))
+    return _parse_label(name)
+
+
+# Num processo de longa duração (o servidor) as tabelas cresceriam com
+# cada variável e constante já vista. interning() delimita uma
+# compilação, do front end ao fim da execução; quando a última em
+# andamento termina, nenhum operando das tabelas segue em uso e elas são
+# esvaziadas. Quem guarda TAC além disso não deve usar interning().
+_users = 0
+_users_lock = threading.Lock()
+
+
+@contextmanager
+def interning():
+    global _users
+    with _users_lock:
+        _users += 1
+    try:
+        yield
+    finally:
+        with _users_lock:
+            _users -= 1
+            if not _users:
+                _clear_tables()
+
+
+def _clear_tables():
+    del _temps[1:]
+    del _labels[1:]
+    _variables.clear()
+    _constants.clear()
+    _named_labels.clear()
+
+
+def is_constant(operand):
+    return operand.kind is CONSTANT
+
+
+# ===============================
+# Consultas sobre instruções
+# ===============================
+
+def uses(instr):
+    # Operandos lidos pela instrução (constantes incluídas).
+    opcode = instr[0]
+    if opcode in BINARY:
+        return (instr[2], instr[3])
+    if opcode is LABEL or opcode is GOTO or opcode is READ:
+        return ()
+    return (instr[2],)
+
+
+def definition(instr):
+    # Operando escrito pela instrução, ou None.
+    return instr[1] if instr[0] in DEFINES else None
+
+
+# ===============================
+# Impressão
+# ===============================
+
+def format_instr(instr):
+    opcode, result, arg1, arg2 = instr
+    if opcode is LABEL:
+        return f"{result.name}:"
+    if opcode is GOTO:
+        return f"goto {result.name}"
+    if opcode is IF_FALSE:
+        return f"ifFalse {arg1.name} goto {result.name}"
+    if opcode is PRINT:
+        return f"print {arg1.name}"
+    if opcode is READ:
+        return f"read {result.name}"
+    if opcode is COPY:
+        return f"{result.name} = {arg1.name}"
+    if opcode in UNARY:
+        return f"{result.name} = {SYMBOLS[opcode]}{arg1.name}"
+    return f"{result.name} = {arg1.name} {SYMBOLS[opcode]} {arg2.name}"
+
+
+def format_tac(code):
+    return [format_instr(instr) for instr in code]
+
+
+# ===============================
+# Leitura do texto do TAC
+# ===============================
+
+# Variáveis de blocos internos se chamam "nome.slot".
+_OPERAND = r'"[^"]*"|-?\d+(?:\.\d+)?(?:e[+-]?\d+)?|[A-Za-z_]\w*(?:\.\d+)?'
+_NAME = r'[A-Za-z_]\w*(?:\.\d+)?'
+_LABEL_RE = re.compile(rf'({_NAME}):$')
+_IF_FALSE_RE = re.compile(rf'ifFalse ({_OPERAND}) goto ({_NAME})$')
+_GOTO_RE = re.compile(rf'goto ({_NAME})$')
+_ASSIGN_RE = re.compile(rf'({_NAME}) = (.*)$')
+_BINARY_RE = re.compile(rf'({_OPERAND}) (\S+) ({_OPERAND})$')
+_UNARY_RE = re.compile(rf'([-!])({_OPERAND})$')
+_OPERAND_RE = re.compile(rf'({_OPERAND})$')
+_TEMP_RE = re.compile(r't(\d+)$')
+_LABEL_NAME_RE = re.compile(r'L(\d+)$')
+
+
+def parse_operand(text):
+    # No texto, tN é sempre um temporário (como o gerador escreve).
+    if text.startswith('"'):
+        return constant(text[1:-1])
+    if text[0].isdigit() or text[0] == "-":
+        return constant(float(text) if ("." in text or "e" in text) else int(text))
+    match = _TEMP_RE.match(text)
+    if match:
+        return temp(int(match.group(1)))
+    return variable(text)
+
+
+def _parse_label(text):
+    match = _LABEL_NAME_RE.match(text)
+    if match:
+        return label(int(match.group(1)))
+    # Rótulos escritos à mão: internados com o próprio nome.
+    operand = _named_labels.get(text)
+    if operand is None:
+        text = intern(text)
+        operand = _named_labels.setdefault(text, Operand(OperandKind.LABEL, text))
+    return operand
+
+
+def decode_tac(lines):
+    # Converte as linhas de texto em quádruplas. print e read são palavras
+    # reservadas, então não colidem com nomes de variáveis; as demais
+    # formas são reconhecidas pela linha inteira.
+    code = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("print "):
+            code.append((PRINT, None, parse_operand(line[len("print "):]), None))
+            continue
+        if line.startswith("read "):
+            code.append((READ, parse_operand(line[len("read "):]), None, None))
+            continue
+        match = _LABEL_RE.match(line)
+        if match:
+            code.append((LABEL, _parse_label(match.group(1)), None, None))
+            continue
+        match = _IF_FALSE_RE.match(line)
+        if match:
+            code.append((IF_FALSE, _parse_label(match.group(2)),
+                         parse_operand(match.group(1)), None))
+            continue
+        match = _GOTO_RE.match(line)
+        if match:
+            code.append((GOTO, _parse_label(match.group(1)), None, None))
+            continue
+        match = _ASSIGN_RE.match(line)
+        if not match:
+            raise SyntaxError(f"Instrução TAC inválida na linha {number}: {line}")
+        target, expr = match.groups()
+        target = parse_operand(target)
+        match = _BINARY_RE.match(expr)
+        if match and match.group(2) in BINARY_OPCODES:
+            code.append((BINARY_OPCODES[match.group(2)], target,
+                         parse_operand(match.group(1)), parse_operand(match.group(3))))
+            continue
+        match = _UNARY_RE.match(expr)
+        if match:
+            code.append((UNARY_OPCODES[match.group(1)], target,
+                         parse_operand(match.group(2)), None))
+            continue
+        if not _OPERAND_RE.match(expr):
+            raise SyntaxError(f"Instrução TAC inválida na linha {number}: {line}")
+        code.append((COPY, target, parse_operand(expr), None))
+    return code
@@ -1,95 +1,140 @@
 from parser import *
-
-class TACGenerator:
-    def __init__(self):
+from lexer import TokenType
+from tac import (BINARY_OPCODES, COPY, DEFAULT_VALUES, GOTO, IF_FALSE, LABEL, PRINT, READ,
+                 UNARY_OPCODES, constant, label, specialize, temp, variable)
+from visitor import Visitor, children
+
+class TACGenerator(Visitor):
+    # Visitante sem recursão (ver visitor.py); cada expressão devolve o
+    # operando com o seu valor.
+    prefix = "gen_"
+
+    def __init__(self, names=None):
+        # names: nome de cada slot (SymbolTable.names) de uma AST já
+        # checada. Sem ele as variáveis usam o nome do fonte, o que só vale
+        # para programas sem declarações dentro de blocos.
+        self.names = names
         self.code = []
         self.temp_count = 0
+        self.label_count = 0
+        # Cache dos operandos de literais, por (tipo, valor).
+        self.literals = {}
+
+    # O código é uma lista de quádruplas (ver tac.py); tac.format_tac
+    # produz o texto.
 
     def new_temp(self):
         self.temp_count += 1
-        return f"t{self.temp_count}"
+        return temp(self.temp_count)
+
+    def new_label(self):
+        self.label_count += 1
+        return label(self.label_count)
 
     def generate(self, node):
-        method = f"gen_{type(node).__name__}"
-        return getattr(self, method)(node)
+        return self.visit(node)
+
+    def gen_None(self, node):
+        return None
 
     # =========================
     # Program & Statements
     # =========================
 
-    def gen_Program(self, node):
-        for stmt in node.statements:
-            self.generate(stmt)
+    @children("statements")
+    def gen_Program(self, node, statements):
         return self.code
 
-    def gen_Block(self, node):
-        for stmt in node.statements:
-            self.generate(stmt)
+    @children("statements")
+    def gen_Block(self, node, statements):
+        pass
 
-    def gen_VarDecl(self, node):
+    @children("initializer")
+    def gen_VarDecl(self, node, value):
         if node.initializer:
-            value = self.generate(node.initializer)
-            self.code.append(f"{node.name} = {value}")
+            self.code.append((COPY, self.variable(node), value, None))
+        elif self.names is not None and "." in self.names[node.slot]:
+            # Variável de bloco: cada execução da declaração cria uma nova,
+            # com o valor padrão do tipo.
+            default = constant(DEFAULT_VALUES[node.var_type])
+            self.code.append((COPY, self.variable(node), default, None))
 
-    def gen_Assignment(self, node):
-        value = self.generate(node.value)
-        self.code.append(f"{node.name} = {value}")
+    @children("value")
+    def gen_Assignment(self, node, value):
+        self.code.append((COPY, self.variable(node), value, None))
 
     def gen_Print(self, node):
         for expr in node.expressions:
-            value = self.generate(expr)
-            self.code.append(f"print {value}")
+            value = yield expr
+            self.code.append((PRINT, None, value, None))
 
     def gen_Read(self, node):
-        self.code.append(f"read {node.name}")
+        self.code.append((READ, self.variable(node), None, None))
 
     # =========================
     # Control Flow
     # =========================
 
     def gen_If(self, node):
-        cond = self.generate(node.condition)
-        label_else = self.new_temp()
-        label_end = self.new_temp()
-
-        self.code.append(f"ifFalse {cond} goto {label_else}")
-        self.generate(node.then_branch)
-        self.code.append(f"goto {label_end}")
-        self.code.append(f"{label_else}:")
+        cond = yield node.condition
+        label_else = self.new_label()
+        label_end = self.new_label()
+
+        self.code.append((IF_FALSE, label_else, cond, None))
+        yield node.then_branch
+        self.code.append((GOTO, label_end, None, None))
+        self.code.append((LABEL, label_else, None, None))
         if node.else_branch:
-            self.generate(node.else_branch)
-        self.code.append(f"{label_end}:")
+            yield node.else_branch
+        self.code.append((LABEL, label_end, None, None))
 
     def gen_While(self, node):
-        label_start = self.new_temp()
-        label_end = self.new_temp()
+        label_start = self.new_label()
+        label_end = self.new_label()
 
-        self.code.append(f"{label_start}:")
-        cond = self.generate(node.condition)
-        self.code.append(f"ifFalse {cond} goto {label_end}")
-        self.generate(node.body)
-        self.code.append(f"goto {label_start}")
-        self.code.append(f"{label_end}:")
+        self.code.append((LABEL, label_start, None, None))
+        cond = yield node.condition
+        self.code.append((IF_FALSE, label_end, cond, None))
+        yield node.body
+        self.code.append((GOTO, label_start, None, None))
+        self.code.append((LABEL, label_end, None, None))
 
     # =========================
     # Expressions
     # =========================
 
-    def gen_BinaryExpr(self, node):
-        left = self.generate(node.left)
-        right = self.generate(node.right)
+    @children("left", "right")
+    def gen_BinaryExpr(self, node, left, right):
         temp = self.new_temp()
-        self.code.append(f"{temp} = {left} {node.operator.lexeme} {right}")
+        # Os tipos anotados pela análise semântica escolhem a versão da
+        # operação; numa AST não checada eles são None e fica a genérica.
+        opcode = specialize(BINARY_OPCODES[node.operator.lexeme], node.left.expr_type)
+        self.code.append((opcode, temp, left, right))
         return temp
 
-    def gen_UnaryExpr(self, node):
-        expr = self.generate(node.expr)
+    @children("expr")
+    def gen_UnaryExpr(self, node, expr):
         temp = self.new_temp()
-        self.code.append(f"{temp} = {node.operator.lexeme}{expr}")
+        opcode = specialize(UNARY_OPCODES[node.operator.lexeme], node.expr.expr_type)
+        self.code.append((opcode, temp, expr, None))
         return temp
 
     def gen_Literal(self, node):
-        return str(node.value)
+        key = (node.literal_type, node.value)
+        operand = self.literals.get(key)
+        if operand is None:
+            if node.literal_type == TokenType.STRING:
+                # O valor do literal de string ainda tem as aspas do lexema.
+                operand = constant(node.value[1:-1])
+            else:
+                operand = constant(node.value)
+            self.literals[key] = operand
+        return operand
 
     def gen_Variable(self, node):
-        return node.name
+        return self.variable(node)
+
+    def variable(self, node):
+        if self.names is None:
+            return variable(node.name)
+        return variable(self.names[node.slot])
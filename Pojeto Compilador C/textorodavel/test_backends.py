@@ -0,0 +1,151 @@
+import io
+import os
+import subprocess
+import tempfile
+
+from c_backend import build_executable, find_cc, generate_c
+from pybackend import compile_program, load_mcc, run_code, save_mcc
+from test_vm import EXPECTED, STDIN, random_program, run
+from test_vm import compile_program as compile_checked
+from workload import generate_program
+
+# ===============================
+# Backends x VM
+# ===============================
+# O backend Python (direto e pelo .mcc) e o backend C têm que imprimir o
+# mesmo que a VM para o mesmo programa. Num erro de execução a mensagem
+# vem de cada backend, então só conta que houve erro e o que foi impresso
+# antes dele.
+#
+# Uso: python test_backends.py (ou pytest; o C é pulado sem cc)
+
+DEEP_IF = "int x;\n" + "if (x < 1) {\n" * 3000 + "x = x + 1;\nprint(x);\n" + "}\n" * 3000
+
+# Uma variável float pode guardar o bool de uma comparação; a VM segue o
+# Python (imprime 1/0, bool + bool é int).
+FLOAT_BOOLS = [
+    "float f; float g; f = 2.0; g = f > 1.0; print(g, g + g, g / (g + g), -g);",
+    "float f; float g; float h; f = 0.5; g = f < 1.0; h = g * f; print(h, g - g, 0.0 - g);",
+    "float g; g = 1.0 == 1.0; g = g + 1.5; print(g, g == g);",
+]
+
+# Em string só valem +, comparações e os operadores lógicos.
+STRINGS = [
+    "string s; string t; s = \"b\"; print(s == s, !s, !t, s && t, s || t, s + s < s, t < s);",
+]
+
+
+def _sources(count):
+    for source, _ in EXPECTED:
+        yield source
+    yield from FLOAT_BOOLS
+    yield from STRINGS
+    for seed in range(count):
+        yield random_program(seed)
+    for seed in range(count // 5):
+        yield generate_program(30, seed=seed)
+
+
+def _vm_output(tac, symbols):
+    lines = run(tac, symbols)
+    if lines and lines[-1].startswith("!"):
+        lines[-1] = "!erro"
+    return lines
+
+
+def _python_output(code):
+    out = io.StringIO()
+    try:
+        run_code(code, stdin=io.StringIO(STDIN), stdout=out)
+    except RuntimeError:
+        return out.getvalue().splitlines() + ["!erro"]
+    return out.getvalue().splitlines()
+
+
+def test_python_backend():
+    for source in _sources(150):
+        ast, symbols, tac = compile_checked(source)
+        code = compile_program(ast, symbols)
+        assert _python_output(code) == _vm_output(tac, symbols), source
+
+
+def test_python_backend_mcc():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.mcc")
+        assert load_mcc(path) is None
+        for source in _sources(20):
+            ast, symbols, tac = compile_checked(source)
+            save_mcc(path, compile_program(ast, symbols), source)
+            assert load_mcc(path, source + " ") is None
+            code = load_mcc(path, source)
+            assert _python_output(code) == _vm_output(tac, symbols), source
+
+
+def test_python_backend_deep():
+    # Fundo demais para o compile() do CPython: erro limpo, não um estouro.
+    ast, symbols, tac = compile_checked(DEEP_IF)
+    try:
+        code = compile_program(ast, symbols)
+    except SyntaxError as error:
+        assert "aninhado demais" in str(error)
+    else:
+        assert _python_output(code) == _vm_output(tac, symbols)
+
+
+def _c_output(ast, symbols, directory):
+    executable = build_executable(generate_c(ast, symbols), os.path.join(directory, "program"))
+    process = subprocess.run([executable], input=STDIN, capture_output=True, text=True)
+    lines = process.stdout.splitlines()
+    return lines + ["!erro"] if process.returncode else lines
+
+
+def test_c_backend():
+    try:
+        find_cc()
+    except RuntimeError:
+        return
+    # Cada programa passa pelo cc: poucos, mas com os casos conhecidos.
+    with tempfile.TemporaryDirectory() as directory:
+        for source in [*_sources(6), DEEP_IF]:
+            ast, symbols, tac = compile_checked(source)
+            assert _c_output(ast, symbols, directory) == _vm_output(tac, symbols), source
+
+
+# int no C tem 64 bits: o que a VM calcula sem limite vira erro de execução.
+OVERFLOWS = [
+    ("int x; x = 9223372036854775807; print(x - 1); x = x + 1; print(x);",
+     ["9223372036854775806"]),
+    ("int x; x = 3037000500; print(x * x);", []),
+    ("int x; x = 0 - 9223372036854775807 - 1; print(x); print(-x);",
+     ["-9223372036854775808"]),
+    ("int x; int y; x = 0 - 9223372036854775807 - 1; y = 0 - 1; print(x / y);", []),
+    ("int x; x = 0 - 9223372036854775807; print(x - 2);", []),
+]
+
+
+def test_c_overflow():
+    try:
+        find_cc()
+    except RuntimeError:
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        for source, printed in OVERFLOWS:
+            ast, symbols, _ = compile_checked(source)
+            executable = build_executable(generate_c(ast, symbols),
+                                          os.path.join(directory, "program"))
+            process = subprocess.run([executable], capture_output=True, text=True)
+            assert process.returncode != 0, source
+            assert process.stdout.splitlines() == printed, source
+            assert "Estouro de inteiro" in process.stderr, source
+        ast, symbols, _ = compile_checked("int x; read(x); print(x);")
+        executable = build_executable(generate_c(ast, symbols), os.path.join(directory, "program"))
+        process = subprocess.run([executable], input="99999999999999999999\n",
+                                 capture_output=True, text=True)
+        assert process.returncode != 0 and "Estouro de inteiro" in process.stderr
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+
+from batch import compile_batch, expand_inputs
+from cache import compile_source
+from optimizer import PASSES, Optimizer
+from tac import format_tac
+from test_vm import random_program
+
+# ===============================
+# Lote x compilação arquivo a arquivo
+# ===============================
+# compile_batch, em processo ou com vários workers, com e sem cache e -O,
+# tem que escrever para cada arquivo (na ordem de entrada) o mesmo TAC da
+# compilação isolada dele, ou o mesmo erro.
+#
+# Uso: python test_batch.py (ou pytest)
+
+INVALID = ["int x; x = y;", "int x = ;", "int x; int x;"]
+
+
+def _write_sources(directory):
+    sources = {}
+    for seed in range(12):
+        sources[os.path.join(directory, "sub" if seed % 3 else "", f"p{seed:02}.mc")] = random_program(seed)
+    for index, source in enumerate(INVALID):
+        sources[os.path.join(directory, f"z{index}.mc")] = source
+    for path, source in sources.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(source)
+    return sources
+
+
+def _single(path, source, passes):
+    try:
+        tac = compile_source(source).tac
+    except Exception as error:
+        return "", f"{path}: erro: {error}\n"
+    if passes is not None:
+        tac = Optimizer(passes).optimize(tac)
+    return f"// {path}\n" + "".join(line + "\n" for line in format_tac(tac)), ""
+
+
+def _expected(paths, sources, passes):
+    outputs = [_single(path, sources[path], passes) for path in paths]
+    return "".join(out for out, _ in outputs), "".join(err for _, err in outputs)
+
+
+def test_expand_inputs():
+    with tempfile.TemporaryDirectory() as directory:
+        sources = _write_sources(directory)
+        everything = sorted(sources)
+        assert sorted(expand_inputs([directory])) == everything
+        pattern = os.path.join(directory, "**", "*.mc")
+        assert sorted(expand_inputs([pattern])) == everything
+        first = everything[0]
+        assert expand_inputs([first, directory])[0] == first
+        assert len(expand_inputs([first, directory])) == len(everything)
+
+
+def test_batch_matches_single_files():
+    with tempfile.TemporaryDirectory() as directory:
+        sources = _write_sources(directory)
+        paths = expand_inputs([directory])
+        cache_dir = os.path.join(directory, "cache")
+        for passes in (None, list(PASSES)):
+            expected = _expected(paths, sources, passes)
+            cached = {"cache_dir": cache_dir, "cache_bytes": 2**20}
+            default_size = {"cache_dir": cache_dir}
+            for jobs, options in ((1, {}), (2, {}), (2, cached), (1, cached),
+                                  (2, default_size)):
+                out, err = io.StringIO(), io.StringIO()
+                report = compile_batch(paths, jobs, dict(options, emit_tac=True, passes=passes),
+                                       out, err)
+                assert (out.getvalue(), err.getvalue()) == expected, (jobs, options, passes)
+                assert (report.files, report.failed) == (len(paths), len(INVALID))
+
+
+def test_batch_summary_lines():
+    with tempfile.TemporaryDirectory() as directory:
+        sources = _write_sources(directory)
+        paths = expand_inputs([directory])
+        out, err = io.StringIO(), io.StringIO()
+        compile_batch(paths, 2, {}, out, err)
+        expected = []
+        for path in paths:
+            try:
+                count = len(compile_source(sources[path]).tac)
+            except Exception:
+                continue
+            expected.append(f"{path}: ok ({count} instruções)")
+        assert out.getvalue().splitlines() == expected
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,147 @@
+import contextlib
+import io
+import os
+import struct
+import sys
+import tempfile
+
+import main
+from bytecode import FORMAT_VERSION, load_bytecode, save_bytecode
+from cache import compile_source
+from test_vm import EXPECTED, STDIN, random_program
+from workload import generate_program
+
+# ===============================
+# Bytecode .mcb
+# ===============================
+# Um .mcb gravado pelo main.py tem que rodar (e imprimir --tac) igual à
+# compilação da fonte, com e sem -O, e aceitar -O, --alloc e
+# --emit-bytecode como uma fonte; a tabela de linhas aponta cada
+# instrução para a linha do seu comando de topo; arquivos com outro
+# número mágico, outra versão, truncados ou vazios são recusados com
+# ValueError.
+#
+# Uso: python test_bytecode.py (ou pytest)
+
+
+def _sources():
+    for source, _ in EXPECTED:
+        yield source
+    for seed in range(8):
+        yield random_program(seed)
+    for seed in range(3):
+        yield generate_program(30, seed=seed, string_density=0.3)
+
+
+def _main(*argv):
+    out = io.StringIO()
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(STDIN)
+    try:
+        with contextlib.redirect_stdout(out):
+            main.main(list(argv))
+    except RuntimeError as error:
+        return out.getvalue().splitlines() + [f"!{error}"]
+    finally:
+        sys.stdin = stdin
+    return out.getvalue().splitlines()
+
+
+def test_runs_like_source():
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, "program.mc")
+        mcb = os.path.join(directory, "program.mcb")
+        for source in _sources():
+            with open(source_path, "w") as file:
+                file.write(source)
+            for flags in ((), ("-O",)):
+                expected = _main(*flags, "--run", source_path)
+                tac = _main(*flags, "--tac", source_path)
+                assert _main(*flags, "--emit-bytecode", mcb, source_path) == []
+                assert _main(mcb) == expected, (flags, source)
+                assert _main("--run", mcb) == expected, (flags, source)
+                assert _main("--tac", mcb) == tac, (flags, source)
+
+
+def test_mcb_accepts_source_options():
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, "program.mc")
+        mcb = os.path.join(directory, "program.mcb")
+        again = os.path.join(directory, "again.mcb")
+        for source in _sources():
+            with open(source_path, "w") as file:
+                file.write(source)
+            _main("--emit-bytecode", mcb, source_path)
+            for flags in (("-O",), ("--alloc",), ("-O", "--alloc")):
+                expected = _main(*flags, "--run", source_path)
+                assert _main(*flags, "--run", mcb) == expected, (flags, source)
+                assert _main(*flags, "--tac", mcb) == _main(*flags, "--tac", source_path)
+            # Reescrito sem mudanças, o .mcb mantém a tabela de linhas.
+            assert _main("--emit-bytecode", again, mcb) == []
+            with load_bytecode(mcb) as first, load_bytecode(again) as second:
+                assert second.instructions() == first.instructions()
+                assert second.line_table() == first.line_table()
+
+
+def test_line_table():
+    source = "int x;\nx = 1;\n\nif (x) {\n  x = x + 1;\n  print(x);\n}\nprint(x * 2, x);\n"
+    result = compile_source(source)
+    symbols, code, lines = result.symbols, result.tac, result.lines
+    assert [line for _, line in lines] == [2, 4, 8]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.mcb")
+        save_bytecode(path, code, symbols, lines)
+        with load_bytecode(path) as program:
+            assert program.has_lines()
+            assert program.line_table() == lines
+            assert program.symbols() == symbols
+            expected = []
+            for first, line in lines:
+                expected.extend([None] * (first - len(expected)))
+                expected[first:] = [line] * (len(code) - first)
+            assert [program.line(index) for index in range(len(code))] == expected
+        save_bytecode(path, code, symbols)
+        with load_bytecode(path) as program:
+            assert not program.has_lines()
+            assert program.line_table() is None
+            assert program.line(0) is None
+
+
+def _rejected(path, data):
+    with open(path, "wb") as file:
+        file.write(data)
+    try:
+        load_bytecode(path).close()
+    except ValueError as error:
+        return str(error)
+    raise AssertionError(f"aceito: {data[:16]!r}")
+
+
+def test_rejects_bad_files():
+    result = compile_source(random_program(0))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.mcb")
+        save_bytecode(path, result.tac, result.symbols)
+        with open(path, "rb") as file:
+            data = file.read()
+        version = struct.pack("<H", FORMAT_VERSION + 1)
+        assert "inválido" in _rejected(path, b"XXXX" + data[4:])
+        assert "Versão" in _rejected(path, data[:4] + version + data[6:])
+        assert "truncado" in _rejected(path, data[:len(data) // 2])
+        assert "inválido" in _rejected(path, data[:10])
+        assert "inválido" in _rejected(path, b"")
+        # main.py termina com a mensagem, sem traceback.
+        for flags in ((), ("--tac",)):
+            try:
+                _main(*flags, path)
+            except SystemExit as exit:
+                assert "inválido" in str(exit.code)
+            else:
+                raise AssertionError("main aceitou um .mcb inválido")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,101 @@
+import os
+import tempfile
+
+from cache import CompileCache, compile_source
+from tac import format_tac
+from test_vm import random_program
+
+# ===============================
+# Cache de compilação
+# ===============================
+# Uma falta compila e guarda, um acerto devolve o mesmo resultado que o
+# front end; entradas corrompidas contam como falta e a remoção por
+# tamanho apaga as entradas usadas há mais tempo.
+#
+# Uso: python test_cache.py (ou pytest)
+
+
+def _same_result(result, expected):
+    assert result.symbols == expected.symbols
+    assert format_tac(result.tac) == format_tac(expected.tac)
+    assert result.lines == expected.lines
+
+
+def test_hit_and_miss():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory)
+        source = random_program(0)
+        assert cache.get(source) is None
+        first = cache.compile(source)
+        second = cache.compile(source)
+        _same_result(first, compile_source(source))
+        _same_result(second, first)
+        assert cache.get(source + "\n") is None
+        stats = cache.stats.as_dict()
+        assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 3, 1), stats
+
+        # Outra instância no mesmo diretório enxerga a entrada.
+        other = CompileCache(directory)
+        _same_result(other.compile(source), first)
+        assert other.stats.hits == 1
+
+
+def test_corrupt_entry_is_a_miss():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory)
+        source = random_program(1)
+        cache.compile(source)
+        path = cache._path(cache.key(source))
+        with open(path, "wb") as file:
+            file.write(b"lixo")
+        assert cache.get(source) is None
+        assert not os.path.exists(path)
+        assert cache.stats.errors == 1
+        _same_result(cache.compile(source), compile_source(source))
+
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory)
+        sources = [random_program(seed) for seed in (2, 3, 4)]
+        paths = []
+        for age, source in enumerate(sources):
+            cache.compile(source)
+            paths.append(cache._path(cache.key(source)))
+            os.utime(paths[-1], (1000 + age, 1000 + age))
+        sizes = [os.path.getsize(path) for path in paths]
+
+        # Um acerto renova a entrada mais antiga; a do meio vira a menos usada.
+        assert cache.get(sources[0]) is not None
+        cache.max_bytes = int((sizes[0] + sizes[2]) / 0.9) + 1
+        assert cache.max_bytes < sum(sizes)
+        cache.evict()
+        assert [os.path.exists(path) for path in paths] == [True, False, True]
+        assert cache.stats.evictions == 1
+        assert cache.size() == sizes[0] + sizes[2]
+
+
+def test_put_respects_limit():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory, max_bytes=1)
+        for seed in range(5):
+            cache.compile(random_program(seed))
+        assert cache.size() == 0
+        assert cache.stats.evictions == 5
+
+
+def test_line_table():
+    source = "int x;\nx = 1;\n\nif (x) {\n  x = x + 1;\n  print(x);\n}\nprint(x * 2, x);\n"
+    result = compile_source(source)
+    assert [line for _, line in result.lines] == [2, 4, 8]
+    firsts = [first for first, _ in result.lines]
+    assert firsts[0] == 0 and firsts == sorted(set(firsts)) and firsts[-1] < len(result.tac)
+    deep = "int x;\n" + "if (x < 1) {\n" * 3000 + "x = x + 1;\n" + "}\n" * 3000
+    assert compile_source(deep).lines == [(0, 2)]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
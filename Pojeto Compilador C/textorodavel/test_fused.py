@@ -0,0 +1,163 @@
+import io
+
+from lexer import Lexer
+from parser import Parser
+from ast_arena import parse_compact
+from ast_serializer import dump_ast
+from fused import _STATEMENT_DEPTH, check_and_generate
+from semantic import SemanticAnalyzer
+from tac_generator import TACGenerator
+from test_vm import random_program
+from workload import generate_program
+
+# ===============================
+# Passada única x semântica + TAC
+# ===============================
+# check_and_generate tem que dar os mesmos símbolos, o mesmo TAC, as
+# mesmas anotações na AST (slot e expr_type) e o mesmo erro que as duas
+# passadas separadas, também sobre a AST compacta e em árvores fundas
+# demais para um percurso recursivo.
+#
+# Uso: python test_fused.py (ou pytest)
+
+SCOPES = [
+    "int a; { int a; a = 2; print(a); } print(a);",
+    "int a; if (a) int a = 1; else { string a; a = \"x\"; print(a); }",
+    "int a; while (a < 2) { int a; a = 5; } { float a; { int a; a = a; } }",
+    "int x = 1 + 2; float y = x * 1.5; string s = \"k\"; print(x, y, s);",
+]
+
+# Erros de semântica e casos no limite da checagem (nem todos são erro).
+CHECKS = [
+    "int a; int a;",
+    "a = 1;",
+    "int a; a = \"x\";",
+    "string s; s = s - \"a\";",
+    "string s; s = \"a\"; print(s * s);",
+    "string s; print(s / s);",
+    "string s; s = -s;",
+    "string s; print(1, -(s + s));",
+    "string s; print(s == s, !s, s && s, s + s < s);",
+    "int a; { int b; } b = 1;",
+    "float f; read(g);",
+    "int a; print(a + \"x\");",
+    "string s; if (s) print(1);",
+    "int a; a = !1.5;",
+]
+
+DEEP_IF = "int x;\n" + "if (x < 1) {\n" * 3000 + "int y = x;\nx = y + 1;\n" + "}\n" * 3000
+DEEP_EXPR = "int x;\nx = " + "(" * 3000 + "x" + " + 1)" * 3000 + ";\n"
+DEEP_AND = "int x;\nif (" + " && ".join(["x < 1"] * 3000) + ") print(x);\n"
+
+
+def _sources():
+    yield from SCOPES
+    yield from CHECKS
+    for seed in range(100):
+        yield random_program(seed)
+    for seed in range(10):
+        yield generate_program(40, seed=seed, string_density=0.3)
+
+
+def _annotations(ast):
+    out = io.StringIO()
+    dump_ast(ast, out, "jsonl")
+    return out.getvalue()
+
+
+def _separate(ast):
+    try:
+        semantic = SemanticAnalyzer()
+        semantic.analyze(ast)
+        result = semantic.table.symbols, TACGenerator(semantic.table.names).generate(ast)
+    except Exception as error:
+        return ("erro", type(error).__name__, str(error))
+    return result + (_annotations(ast),)
+
+
+def _fused(ast):
+    try:
+        result = check_and_generate(ast)
+    except Exception as error:
+        return ("erro", type(error).__name__, str(error))
+    return result + (_annotations(ast),)
+
+
+def _parse(source):
+    return Parser(Lexer(source).token_stream()).parse()
+
+
+def test_same_as_separate_passes():
+    for source in _sources():
+        expected = _separate(_parse(source))
+        assert _fused(_parse(source)) == expected, source
+
+
+def test_compact_ast():
+    for source in _sources():
+        expected = _fused(_parse(source))
+        assert _fused(parse_compact(Lexer(source).token_stream()).root()) == expected, source
+
+
+def test_deep_programs():
+    for source in (DEEP_IF, DEEP_EXPR, DEEP_AND):
+        expected = _separate(_parse(source))
+        assert expected[0] != "erro"
+        assert _fused(_parse(source)) == expected
+        assert _fused(parse_compact(Lexer(source).token_stream()).root()) == expected
+
+
+def _nested(levels, inner, blocks=0):
+    # Comandos aninhados de vários tipos (if com e sem else, while, blocos,
+    # ramos sem chaves), cada nível com uma declaração que oculta a de fora,
+    # dentro de `blocks` blocos vazios.
+    opening, closing = [], []
+    for level in range(levels):
+        kind = level % 4
+        if kind == 0:
+            opening.append(f"if (x < {level}) {{ int y = {level};")
+            closing.append("}")
+        elif kind == 1:
+            opening.append("if (x) print(y); else {")
+            closing.append("x = x - 1; }")
+        elif kind == 2:
+            opening.append("while (x < 3) { x = x + 1; { string y;")
+            closing.append("} }")
+        else:
+            opening.append("if (x == 2) print(x); else if (x) { float y;")
+            closing.append("}")
+    return ("int x; int y;\n" + "{" * blocks + "\n".join(opening) + inner
+            + "".join(reversed(closing)) + "}" * blocks)
+
+
+def test_statement_depth_limit():
+    # Em volta de _STATEMENT_DEPTH a tradução passa da recursão para o
+    # visitante no meio de um comando (os blocos de fora mudam o tipo do
+    # nó onde isso acontece); o resultado e o erro são os mesmos.
+    levels = _STATEMENT_DEPTH * 2 // 5
+    for blocks in range(4):
+        for inner in (" print(y); ", " x = y; ", " z = 1; "):
+            for count in (levels - 4, levels - 1, levels + 2):
+                source = _nested(count, inner, blocks)
+                expected = _separate(_parse(source))
+                assert _fused(_parse(source)) == expected, (count, inner, blocks)
+                assert _fused(parse_compact(Lexer(source).token_stream()).root()) == expected
+
+
+def test_starts_mark_top_level_code():
+    source = "int x;\nx = 1;\nif (x) { print(x); }\nprint(x + 1);\n"
+    starts = []
+    symbols, code = check_and_generate(_parse(source), starts)
+    assert (symbols, code) == check_and_generate(_parse(source))
+    assert len(starts) == 4
+    assert starts == sorted(starts) and starts[0] == 0 and starts[-1] < len(code)
+    starts = []
+    check_and_generate(_parse(DEEP_IF), starts)
+    assert starts == [0, 0]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
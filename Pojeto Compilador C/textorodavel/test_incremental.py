@@ -0,0 +1,137 @@
+import io
+import random
+import re
+
+from ast_serializer import dump_ast
+from cache import compile_source
+from incremental import IncrementalCompiler
+from workload import generate_program
+
+# ===============================
+# Compilação incremental x compilação completa
+# ===============================
+# Depois de cada edição, result() tem que dar o mesmo que compile_source
+# da fonte inteira: mesmos símbolos (na mesma ordem), mesmo TAC e mesma
+# AST, anotações e posição dos operadores incluídas (o jsonl de
+# ast_serializer guarda tudo isso), ou o mesmo erro. As edições são
+# aleatórias e passam por fontes inválidas no meio do caminho.
+#
+# Uso: python test_incremental.py (ou pytest)
+
+STATEMENTS = [
+    "int x;", "x = a;", "a = a + 1;", "print(a, b * 2);", "if (a > b) print(a);",
+    "if (a) { int y; y = 1; }", "else print(b);", "float q; q = 1.5;", "while (a < 0) a = a + 1;",
+    "{ }", ";", "int a;", 'string z; z = "k";', "b = -a / (b + 3);", "read(a);",
+    "{ int a; a = 2; print(a); }", "if (b) int a = 1; else { string a; }",
+    "while (a < 2) { int a; a = 5; }",
+]
+
+SNIPPETS = [
+    "", "a", "b", " ", "\n", ";", "}", "{", "int x;", "x = 1;", "+ 1", '"', "else ", "if (a > 1) ",
+    "1.5", "/", "@", "print(a);", "float a;", "int a;", "int zz;", "zz = a;", "-", "(", ")",
+    "while (a < 3) ", "\n\n", "string s;", "{ int q; q = 2; }", "print(a * (b + 1), -a);",
+    "{ int a; { int a; a = a; } }",
+]
+
+NAMES = ["7", "a", "b", "v1", "v0", "f", "99", "1.5", "c0", "s"]
+
+BASE = "int a; int b; float f; string s;\na = 1; b = 2; f = 0.5; s = \"ab\";\n"
+
+
+def snapshot(compile):
+    try:
+        result = compile()
+    except Exception as error:
+        return ("erro", type(error).__name__, str(error))
+    out = io.StringIO()
+    dump_ast(result.ast, out, "jsonl")
+    return (list(result.symbols.items()), result.tac, out.getvalue())
+
+
+def check(compiler, context):
+    expected = snapshot(lambda: compile_source(compiler.source))
+    assert snapshot(compiler.result) == expected, (context, compiler.source)
+
+
+def random_edit(rnd, source):
+    # (offset, apagados, inserido) de um dos tipos de edição.
+    choice = rnd.random()
+    if choice < 0.25:
+        # Um comando inteiro numa fronteira de comando
+        offsets = [0] + [match.end() for match in re.finditer(r"[;}]\s*", source)]
+        return rnd.choice(offsets), 0, rnd.choice(STATEMENTS) + rnd.choice([" ", "\n", ""])
+    if choice < 0.45:
+        # Apaga até o próximo ';'
+        ends = [match.end() for match in re.finditer(";", source)]
+        if ends:
+            end = rnd.choice(ends)
+            start = source.rfind(";", 0, end - 1) + 1
+            return start, end - start, ""
+    elif choice < 0.6:
+        # Troca um número ou nome
+        matches = list(re.finditer(r"\b(\d+|[a-z]\w*)\b", source))
+        if matches:
+            match = rnd.choice(matches)
+            return match.start(), match.end() - match.start(), rnd.choice(NAMES)
+    elif choice < 0.8:
+        # Espaços e quebras de linha (mudam só posições)
+        offsets = [match.start() for match in re.finditer(r"\s", source)] or [0]
+        offset = rnd.choice(offsets)
+        deleted = rnd.choice([0, 1]) if offset < len(source) else 0
+        return offset, deleted, rnd.choice(["\n", " ", "\n\n", "  ", ""])
+    offset = rnd.randint(0, len(source))
+    return offset, min(rnd.choice([0, 1, 2]), len(source) - offset), rnd.choice(SNIPPETS)
+
+
+def _initial(seed):
+    rnd = random.Random(seed)
+    return BASE + generate_program(rnd.randint(1, 15), seed=seed)
+
+
+def test_random_edits():
+    for seed in range(25):
+        rnd = random.Random(seed)
+        compiler = IncrementalCompiler(_initial(seed))
+        check(compiler, (seed, "início"))
+        for step in range(40):
+            source = compiler.source
+            offset, deleted, inserted = random_edit(rnd, source)
+            compiler.edit(offset, deleted, inserted)
+            check(compiler, (seed, step, offset, deleted, inserted))
+            if compiler.error is not None and rnd.random() < 0.7:
+                # Desfaz a edição que quebrou a fonte
+                compiler.edit(offset, len(inserted), source[offset:offset + deleted])
+                assert compiler.source == source
+                check(compiler, (seed, step, "desfeita"))
+
+
+def test_replace_everything():
+    compiler = IncrementalCompiler()
+    check(compiler, "vazio")
+    for seed in range(10):
+        compiler.edit(0, len(compiler.source), _initial(seed))
+        check(compiler, seed)
+    compiler.edit(0, len(compiler.source), "")
+    check(compiler, "vazio de novo")
+
+
+def test_edits_far_apart():
+    # Edições no começo e no fim de uma fonte grande: os comandos do meio
+    # são reaproveitados e renumerados.
+    source = BASE + generate_program(400, seed=1)
+    compiler = IncrementalCompiler(source)
+    before = compiler.stats()["reparsed"]
+    compiler.edit(len(BASE), 0, "int extra; extra = a * 2; if (extra > 1) { print(extra); }\n")
+    check(compiler, "início")
+    compiler.edit(len(compiler.source), 0, "\nprint(a, b);\n")
+    check(compiler, "fim")
+    compiler.edit(0, 0, "\n\n")
+    check(compiler, "linhas")
+    assert compiler.stats()["reparsed"] - before < 10
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,107 @@
+import contextlib
+import io
+import json
+import os
+from collections import Counter
+
+import instrumentation
+import main
+from cache import compile_source
+from lexer import Lexer
+from optimizer import optimize
+from tac import TEMP
+
+# ===============================
+# Instrumentação
+# ===============================
+# O JSON de --stats tem que ter o formato documentado (fases com calls,
+# wall e cpu; peak_bytes com --stats-memory) e contadores iguais aos
+# contados direto da compilação; desligada, a instrumentação não guarda
+# nada.
+#
+# Uso: python test_instrumentation.py (ou pytest)
+
+PROGRAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "program.mc")
+
+
+def _stats(*flags):
+    out, err = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        main.main([*flags, PROGRAM])
+    assert instrumentation.active() is None
+    return json.loads(err.getvalue().splitlines()[-1])
+
+
+def _source():
+    with open(PROGRAM) as file:
+        return file.read()
+
+
+def _check_phases(phases, memory):
+    keys = {"calls", "wall", "cpu"} | ({"peak_bytes"} if memory else set())
+    for name, record in phases.items():
+        assert set(record) == keys, name
+        assert record["calls"] >= 1 and record["wall"] >= 0 and record["cpu"] >= 0, name
+        assert isinstance(record["calls"], int), name
+        if memory:
+            assert isinstance(record["peak_bytes"], int), name
+
+
+def _tac_counters(code):
+    temps = {operand for instr in code for operand in instr[1:]
+             if operand is not None and operand.kind is TEMP}
+    return ({"instructions": len(code), "temps": len(temps)},
+            dict(Counter(instr[0].name for instr in code)))
+
+
+def test_stats_json():
+    data = _stats("--stats", "-O", "--run")
+    assert set(data) == {"phases", "counters"}
+    assert list(data["phases"]) == ["lexer", "parser", "check+tac", "optimizer", "run"]
+    _check_phases(data["phases"], memory=False)
+
+    source = _source()
+    counters = data["counters"]
+    assert set(counters) == {"tokens", "nodes", "tac", "tac_opcodes",
+                             "optimized", "optimized_opcodes"}
+    tokens = Counter(token.type.name for token in Lexer(source).tokenize())
+    assert counters["tokens"] == dict(tokens)
+    assert sum(counters["nodes"].values()) > 0 and counters["nodes"]["Program"] == 1
+    code = compile_source(source).tac
+    assert (counters["tac"], counters["tac_opcodes"]) == _tac_counters(code)
+    optimized = optimize(code)
+    assert (counters["optimized"], counters["optimized_opcodes"]) == _tac_counters(optimized)
+
+
+def test_stats_memory():
+    data = _stats("--stats-memory", "--tac")
+    assert set(data) == {"phases", "counters", "peak_bytes"}
+    _check_phases(data["phases"], memory=True)
+    assert data["peak_bytes"] == max(record["peak_bytes"] for record in data["phases"].values())
+
+
+def test_collect_and_hooks():
+    seen = []
+    with instrumentation.collect(hooks=[lambda name, record: seen.append(name)]) as stats:
+        compile_source(_source())
+        with instrumentation.phase("extra"):
+            pass
+    assert instrumentation.active() is None
+    assert seen == list(stats.phases) and seen[-1] == "extra"
+    assert stats.as_dict()["counters"]["tac"]["instructions"] == len(compile_source(_source()).tac)
+
+
+def test_disabled():
+    assert instrumentation.active() is None
+    assert instrumentation.phase("nada") is instrumentation.phase("outra")
+    instrumentation.count_tokens(Lexer(_source()).tokenize())
+    with instrumentation.collect() as stats:
+        pass
+    assert stats.as_dict() == {"phases": {}, "counters": {}}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,197 @@
+import io
+import itertools
+import os
+
+from lexer import Lexer, Token, iter_tokens
+from parser import ASTNode, Parser
+from ast_arena import parse_compact
+from pipeline import read_chunks
+
+# ===============================
+# Parser: a mesma AST por todos os caminhos
+# ===============================
+# parse sobre uma lista de Token, sobre o TokenStream, sobre tokens em
+# streaming, parse_iter e a arena compacta (parse_compact) têm que dar a
+# mesma árvore: mesma classe, mesmos campos, mesmos tokens de operador
+# (posição incluída). A precedência é
+# conferida contra o mesmo texto com os parênteses explícitos, e a
+# profundidade contra árvores (expressões e comandos aninhados) que
+# estourariam a pilha de um parser recursivo.
+#
+# Uso: python test_parser.py (ou pytest)
+
+PROGRAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "program.mc")
+
+DEEP_IF = "int x;\n" + "if (x < 1) {\n" * 3000 + "x = x + 1;\n" + "}\n" * 3000
+DEEP_PARENS = "int x;\nx = " + "(" * 5000 + "1" + ")" * 5000 + ";\n"
+LONG_CHAIN = "int x;\nx = 1" + " + x * 2" * 5000 + ";\n"
+
+EDGE_CASES = [
+    "",
+    "int x;",
+    "int x = 1 + 2;",
+    "float f; f = -1.5 * -(2.0 - 3.0);",
+    'string s; s = "a" + "b";',
+    "int x; read(x); print(x, x + 1, \"fim\");",
+    "int x; if (x) x = 1; else if (!x) x = 2; else { x = 3; }",
+    "int x; while (x < 10) { x = x + 1; if (x == 5) { print(x); } }",
+    "{ { { } } }",
+    "int a; int b; a = !a || b && !(a != b) == a;",
+]
+
+INVALID = [
+    "int ;",
+    "x = (1 + 2;",
+    "x = 1 +;",
+    "x = 1 2;",
+    "print(1,);",
+    "while x",
+    "if (x) { x = 1;",
+    "}",
+    "int x = ;",
+    "read(1);",
+]
+
+
+def _sources():
+    with open(PROGRAM) as file:
+        yield file.read()
+    yield from EDGE_CASES
+
+
+def _parser_class(node):
+    # Fachadas da arena e nós de parser.py comparam pela classe de parser.py.
+    for cls in type(node).__mro__:
+        if cls.__module__ == "parser":
+            return cls
+    return type(node)
+
+
+def _token(token, positions):
+    if positions:
+        return (token.type, token.lexeme, token.line, token.column)
+    return (token.type, token.lexeme)
+
+
+def assert_same_ast(left, right, positions=True):
+    # Percurso com pilha explícita: as árvores profundas não cabem no
+    # limite de recursão.
+    stack = [(left, right, "root")]
+    while stack:
+        a, b, path = stack.pop()
+        if isinstance(a, list) or isinstance(b, list):
+            assert isinstance(a, list) and isinstance(b, list), path
+            assert len(a) == len(b), f"{path}: {len(a)} != {len(b)}"
+            stack.extend((x, y, f"{path}[{i}]") for i, (x, y) in enumerate(zip(a, b)))
+        elif isinstance(a, Token) or isinstance(b, Token):
+            assert isinstance(a, Token) and isinstance(b, Token), path
+            assert _token(a, positions) == _token(b, positions), path
+        elif a is None or b is None:
+            assert a is None and b is None, path
+        elif isinstance(a, ASTNode):
+            cls = _parser_class(a)
+            assert cls is _parser_class(b), f"{path}: {cls.__name__} != {type(b).__name__}"
+            for field in cls._fields:
+                stack.append((getattr(a, field), getattr(b, field), f"{path}.{field}"))
+        else:
+            assert type(a) is type(b) and a == b, f"{path}: {a!r} != {b!r}"
+
+
+def _parse(source):
+    return Parser(Lexer(source).token_stream()).parse()
+
+
+def _same_everywhere(source):
+    expected = _parse(source)
+    assert_same_ast(Parser(Lexer(source).tokenize()).parse(), expected)
+    tokens = Lexer(source).token_stream()
+    assert_same_ast(list(Parser(tokens).parse_iter()), expected.statements)
+    streamed = Parser(iter_tokens(read_chunks(io.StringIO(source), 7))).parse()
+    assert_same_ast(streamed, expected)
+    assert_same_ast(parse_compact(Lexer(source).token_stream()).root(), expected)
+
+
+def test_paths_agree():
+    for source in _sources():
+        _same_everywhere(source)
+
+
+def test_deep_programs():
+    for source in (DEEP_IF, DEEP_PARENS, LONG_CHAIN):
+        _same_everywhere(source)
+
+
+def test_starts_mark_top_level_statements():
+    source = "int x;\nif (x) { x = 1; }\nwhile (x) x = x - 1;\nprint(x);\n"
+    tokens = Lexer(source).tokenize()
+    starts = []
+    assert_same_ast(Parser(tokens).parse(starts), _parse(source))
+    assert [tokens[i].lexeme for i in starts] == ["int", "if", "while", "print"]
+
+
+# ===============================
+# Precedência e associatividade
+# ===============================
+# Tabela do MiniC, escrita aqui de forma independente do parser: todos os
+# binários associam à esquerda; os unários ligam mais que qualquer binário.
+
+PRECEDENCE = {
+    "||": 1, "&&": 2,
+    "==": 3, "!=": 3,
+    "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6,
+}
+
+
+def _expression(text):
+    return _parse(f"x = {text};").statements[0].value
+
+
+def test_binary_precedence():
+    for first, second in itertools.product(PRECEDENCE, repeat=2):
+        if PRECEDENCE[first] >= PRECEDENCE[second]:
+            grouped = f"(a {first} b) {second} c"
+        else:
+            grouped = f"a {first} (b {second} c)"
+        assert_same_ast(_expression(f"a {first} b {second} c"), _expression(grouped), positions=False)
+
+
+def test_unary_binds_tighter():
+    for operator, unary in itertools.product(PRECEDENCE, ("-", "!")):
+        assert_same_ast(_expression(f"{unary}a {operator} b"),
+                        _expression(f"({unary}a) {operator} b"), positions=False)
+        assert_same_ast(_expression(f"a {operator} {unary}b"),
+                        _expression(f"a {operator} ({unary}b)"), positions=False)
+    assert_same_ast(_expression("--!-a"), _expression("-(-(!(-a)))"), positions=False)
+
+
+# ===============================
+# Erros
+# ===============================
+
+def _error(parse, source):
+    try:
+        parse(source)
+    except SyntaxError as error:
+        return str(error)
+    raise AssertionError(f"sem erro: {source!r}")
+
+
+def test_errors_agree():
+    paths = (
+        _parse,
+        lambda source: Parser(Lexer(source).tokenize()).parse(),
+        lambda source: parse_compact(Lexer(source).token_stream()),
+        lambda source: Parser(iter_tokens(read_chunks(io.StringIO(source), 3))).parse(),
+    )
+    for source in INVALID:
+        messages = {_error(parse, source) for parse in paths}
+        assert len(messages) == 1, (source, messages)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,150 @@
+import io
+import os
+from enum import Enum
+
+from lexer import Lexer
+from parser import ASTNode, Parser
+from ast_arena import parse_compact
+from ast_printer import ASTPrinter
+from ast_serializer import dump_ast, load_ast
+from fused import check_and_generate
+from test_parser import DEEP_PARENS, EDGE_CASES, LONG_CHAIN, assert_same_ast
+from test_vm import random_program
+from workload import generate_program
+
+# ===============================
+# Serialização da AST
+# ===============================
+# text tem que ser, byte a byte, o que o ASTPrinter recursivo escrevia;
+# jsonl e binary têm que voltar pelo load_ast na mesma árvore, com as
+# anotações da semântica (slot, expr_type), inclusive árvores fundas
+# demais para um percurso recursivo; entradas corrompidas dão ValueError.
+#
+# Uso: python test_serializer.py (ou pytest)
+
+PROGRAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "program.mc")
+
+
+def _sources():
+    with open(PROGRAM) as file:
+        yield file.read()
+    yield from EDGE_CASES
+    for seed in range(30):
+        yield random_program(seed)
+    for seed in range(5):
+        yield generate_program(40, seed=seed)
+
+
+def _checked(source):
+    ast = Parser(Lexer(source).token_stream()).parse()
+    check_and_generate(ast)
+    return ast
+
+
+# O ASTPrinter de antes do serializador, para comparar o formato text.
+def _reference_text(node, out, indent=0):
+    prefix = "  " * indent
+    if node is None:
+        out.append(f"{prefix}None\n")
+    elif isinstance(node, Enum):
+        out.append(f"{prefix}{node.name}\n")
+    elif isinstance(node, list):
+        for item in node:
+            _reference_text(item, out, indent)
+    elif isinstance(node, ASTNode):
+        out.append(f"{prefix}{type(node).__name__}\n")
+        for attr in node._fields:
+            out.append(f"{prefix}  {attr}:\n")
+            _reference_text(getattr(node, attr), out, indent + 2)
+    else:
+        out.append(f"{prefix}{node}\n")
+
+
+def _text(ast):
+    out = io.StringIO()
+    dump_ast(ast, out, "text")
+    return out.getvalue()
+
+
+def _annotations(ast):
+    found = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, ASTNode):
+            found.append((getattr(node, "slot", None), getattr(node, "expr_type", None)))
+            stack.extend(getattr(node, field) for field in node._fields)
+    return found
+
+
+def _round_trip(ast, format):
+    out = io.BytesIO() if format == "binary" else io.StringIO()
+    dump_ast(ast, out, format)
+    out.seek(0)
+    loaded = load_ast(out, format)
+    assert_same_ast(loaded, ast)
+    assert _annotations(loaded) == _annotations(ast)
+    return out.getvalue()
+
+
+def test_text_matches_printer():
+    for source in _sources():
+        ast = _checked(source)
+        expected = []
+        _reference_text(ast, expected)
+        assert _text(ast) == "".join(expected), source[:60]
+        assert _text(parse_compact(Lexer(source).token_stream()).root()) == "".join(expected)
+
+
+def test_printer_indent():
+    ast = _checked(EDGE_CASES[-1])
+    for indent in (0, 1, 3):
+        expected = []
+        _reference_text(ast, expected, indent)
+        out = io.StringIO()
+        ASTPrinter(out).print(ast, indent)
+        assert out.getvalue() == "".join(expected), indent
+
+
+def test_round_trips():
+    for source in _sources():
+        ast = _checked(source)
+        for format in ("jsonl", "binary"):
+            _round_trip(ast, format)
+
+
+def test_deep_round_trips():
+    for source in (DEEP_PARENS, LONG_CHAIN):
+        ast = Parser(Lexer(source).token_stream()).parse()
+        _text(ast)
+        for format in ("jsonl", "binary"):
+            _round_trip(ast, format)
+
+
+def test_invalid_input():
+    data = _round_trip(_checked(EDGE_CASES[-1]), "binary")
+    text = _round_trip(_checked(EDGE_CASES[-1]), "jsonl")
+    broken = [
+        ("binary", io.BytesIO(b"MCAST\x02" + data[6:])),
+        ("binary", io.BytesIO(data[:len(data) // 2])),
+        ("binary", io.BytesIO(data + b"\x01")),
+        ("jsonl", io.StringIO(text.replace("}", "", 1))),
+        ("jsonl", io.StringIO(text.rsplit("\n", 2)[0])),
+        ("text", io.StringIO(text)),
+        ("xml", io.StringIO(text)),
+    ]
+    for format, source in broken:
+        try:
+            load_ast(source, format)
+        except ValueError:
+            continue
+        raise AssertionError(f"sem erro: {format}")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
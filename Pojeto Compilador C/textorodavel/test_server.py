@@ -0,0 +1,208 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+
+import server
+import tac
+from client import connect, request
+from server import CompileServer, execute
+from test_vm import EXPECTED, STDIN, random_program
+
+# ===============================
+# Servidor x compilação local
+# ===============================
+# Um pedido pelo socket tem que dar a mesma resposta que execute() no
+# próprio processo (que é o que o cliente faz sem servidor), para todas as
+# operações e com erros. A saída chega ao cliente enquanto o programa
+# roda, cada read pede uma linha ao cliente na hora e um programa que não
+# termina é interrompido pelo timeout do pedido ou do servidor.
+#
+# Uso: python test_server.py (ou pytest)
+
+INVALID = ["int x; x = y;", "int x = ;", "int x; x = 1 / 0;"]
+FOREVER = "int x; while (1) x = x + 1;"
+
+
+def _local(message):
+    stdout = io.StringIO()
+    status, error = execute(message, stdout, io.StringIO(STDIN))
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": error}
+
+
+def _remote(sock, message, stdin=None):
+    stdout = io.StringIO()
+    response = request(sock, message, stdout, stdin or io.StringIO(STDIN))
+    return dict(response, stdout=stdout.getvalue())
+
+
+class _Running:
+    def __init__(self, run_timeout=None):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "mcc.sock")
+        self.server = CompileServer(self.path, run_timeout)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.directory.cleanup()
+
+
+def _messages():
+    sources = [source for source, _ in EXPECTED] + [random_program(seed) for seed in range(10)]
+    for source in sources + INVALID:
+        for op in ("check", "tac", "run"):
+            yield {"op": op, "source": source}
+        yield {"op": "tac", "source": source, "optimize": True, "no_pass": ["cse"]}
+
+
+def test_round_trip():
+    with _Running() as running:
+        sock = connect(running.path)
+        with sock:
+            assert _remote(sock, {"op": "ping"})["pid"] == os.getpid()
+            # Vários pedidos na mesma conexão.
+            for message in _messages():
+                assert _remote(sock, message) == _local(message), message
+            assert _remote(sock, {"op": "nada"})["status"] == 2
+
+
+def test_tables_do_not_grow():
+    # Sem outro pedido em andamento, as tabelas de operandos se esvaziam no
+    # fim de cada um; com outro em andamento, os operandos dele continuam.
+    with tac.interning():
+        x = tac.variable("x")
+        one = tac.constant(1)
+        for message in _messages():
+            _local(message)
+        assert tac.variable("x") is x and tac.constant(1) is one
+    for message in _messages():
+        _local(message)
+        assert not tac._variables and not tac._constants, message
+        assert len(tac._temps) == len(tac._labels) == 1
+
+
+def _broken_check(ast, starts=None):
+    raise TypeError("falha interna")
+
+
+def test_internal_errors_are_logged():
+    # Uma falha do compilador não vira diagnóstico: execute() a deixa
+    # passar e o servidor a registra com o traceback.
+    message = {"op": "tac", "source": "int x; x = 1;"}
+    original = server.check_and_generate
+    server.check_and_generate = _broken_check
+    log = io.StringIO()
+    try:
+        with _Running() as running, connect(running.path) as sock:
+            with contextlib.redirect_stderr(log):
+                response = _remote(sock, message)
+                # A conexão segue atendendo.
+                assert _remote(sock, message) == response
+        try:
+            _local(message)
+        except TypeError:
+            pass
+        else:
+            raise AssertionError("falha interna capturada")
+    finally:
+        server.check_and_generate = original
+    assert response["status"] == 1 and "Erro interno" in response["stderr"]
+    assert "Traceback" in log.getvalue() and "falha interna" in log.getvalue()
+
+
+def test_input_errors_are_diagnostics():
+    with _Running() as running, connect(running.path) as sock:
+        for source in ("int x; read(x);", "float x; read(x);"):
+            message = {"op": "run", "source": source}
+            response = _remote(sock, message, io.StringIO("abc\n"))
+            assert response["status"] == 1 and "Entrada inválida" in response["stderr"]
+        assert _remote(sock, {"op": "run"}) == _local({"op": "run"})
+        assert _local({"op": "run"})["status"] == 2
+
+
+def test_read_from_path():
+    with _Running() as running, tempfile.NamedTemporaryFile("w", suffix=".mc") as file:
+        file.write(EXPECTED[3][0])
+        file.flush()
+        message = {"op": "run", "path": file.name}
+        with connect(running.path) as sock:
+            response = _remote(sock, message)
+        assert response == _local(message)
+        assert response["stdout"].splitlines() == EXPECTED[3][1]
+        missing = {"op": "check", "path": file.name + ".nada"}
+        with connect(running.path) as sock:
+            assert _remote(sock, missing)["status"] == 1
+
+
+class _Keyboard:
+    # stdin do cliente que confere, a cada read, o que já foi impresso.
+    def __init__(self, lines, out):
+        self.lines = list(lines)
+        self.out = out
+        self.seen = []
+
+    def readline(self):
+        self.seen.append(self.out.getvalue())
+        return self.lines.pop(0) if self.lines else ""
+
+
+def test_streams_output_and_reads_on_demand():
+    source = "int x; int y; print(1); read(x); print(x * 2); read(y); print(y); read(x); print(x);"
+    with _Running() as running, connect(running.path) as sock:
+        out = io.StringIO()
+        keyboard = _Keyboard(["5\n", "6\n"], out)
+        response = request(sock, {"op": "run", "source": source}, out, keyboard)
+        assert keyboard.seen == ["1\n", "1\n10\n", "1\n10\n6\n"]
+        # O terceiro read encontra o fim da entrada.
+        assert response == {"status": 1, "stderr": "Fim da entrada durante read"}
+        assert out.getvalue() == "1\n10\n6\n"
+
+
+def test_timeout():
+    with _Running() as running, connect(running.path) as sock:
+        response = _remote(sock, {"op": "run", "source": FOREVER, "timeout": 0.2})
+        assert response["status"] == 1 and "Tempo limite" in response["stderr"]
+        # A conexão continua servindo pedidos.
+        assert _remote(sock, {"op": "run", "source": EXPECTED[0][0], "timeout": 5})["status"] == 0
+    with _Running(run_timeout=0.2) as running, connect(running.path) as sock:
+        for timeout in (None, 60):
+            response = _remote(sock, {"op": "run", "source": FOREVER, "timeout": timeout})
+            assert response["status"] == 1 and "Tempo limite" in response["stderr"]
+
+
+def test_shutdown_and_second_server():
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, "mcc.sock")
+    server = CompileServer(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        try:
+            CompileServer(path)
+        except OSError:
+            pass
+        else:
+            raise AssertionError("dois servidores no mesmo socket")
+        with connect(path) as sock:
+            assert _remote(sock, {"op": "shutdown"})["status"] == 0
+        thread.join(10)
+        assert not thread.is_alive()
+    finally:
+        server.server_close()
+    assert connect(path) is None
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
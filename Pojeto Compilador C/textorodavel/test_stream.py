@@ -0,0 +1,117 @@
+import io
+import os
+
+from lexer import Lexer, iter_tokens
+from parser import Parser
+from fused import check_and_generate
+from pipeline import compile_stream, read_chunks
+from tac import format_tac
+
+# ===============================
+# Lexer em streaming x Lexer
+# ===============================
+# iter_tokens tem que dar os mesmos tokens (tipo, lexema, linha e coluna)
+# que Lexer.tokenize para qualquer tamanho de pedaço, inclusive com o
+# corte caindo no meio de um token, e compile_stream o mesmo TAC que a
+# compilação do arquivo inteiro.
+#
+# Uso: python test_stream.py (ou pytest)
+
+CHUNK_SIZES = (1, 2, 3, 5, 7, 64, 1 << 16)
+
+EDGE_CASES = [
+    "",
+    "int x;",
+    "x>=10&&y<=2||z!=3==w",
+    "float f; f = 12.5; f = 3.25 + 100.0;",
+    "int a;\na = 8 / 2 / 1;\n",
+    'string s; s = "com espaços, vírgulas; e \'aspas\' simples";',
+    "\n\n\t  int   y  ;\n\n",
+    "print(1,2,3);\nprint(\"fim sem quebra de linha\")",
+    "x = 123456789012345678901234567890;",
+]
+
+
+def _sources():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "program.mc")) as file:
+        yield file.read()
+    yield from EDGE_CASES
+
+
+def _chunks(source, size):
+    return read_chunks(io.StringIO(source), size)
+
+
+def test_iter_tokens_matches_lexer():
+    for source in _sources():
+        expected = Lexer(source).tokenize()
+        for size in CHUNK_SIZES:
+            assert list(iter_tokens(_chunks(source, size))) == expected, (source[:60], size)
+
+
+def test_token_stream_matches_lexer():
+    # A visão de compatibilidade do TokenStream, em sequência e por índice.
+    for source in _sources():
+        expected = Lexer(source).tokenize()
+        stream = Lexer(source).token_stream()
+        assert list(stream) == expected, source[:60]
+        assert [stream[index] for index in range(len(stream))] == expected, source[:60]
+
+
+def test_iter_tokens_reports_same_error():
+    for source in ("int x @ 10;", "int x;\nx = 1;\n  $", "x = 12.;"):
+        try:
+            Lexer(source).tokenize()
+        except SyntaxError as error:
+            expected = str(error)
+        else:
+            raise AssertionError(f"sem erro: {source!r}")
+        for size in CHUNK_SIZES:
+            try:
+                list(iter_tokens(_chunks(source, size)))
+            except SyntaxError as error:
+                assert str(error) == expected, (source, size)
+            else:
+                raise AssertionError(f"sem erro no streaming: {source!r}")
+
+
+# ===============================
+# Compilação em streaming
+# ===============================
+
+def _tac_text(source):
+    try:
+        symbols, code = check_and_generate(Parser(Lexer(source).tokenize()).parse())
+    except Exception as error:
+        return error
+    return "".join(line + "\n" for line in format_tac(code))
+
+
+def _stream_text(source, size):
+    out = io.StringIO()
+    try:
+        compile_stream(io.StringIO(source), out, size)
+    except Exception as error:
+        return error
+    return out.getvalue()
+
+
+def test_compile_stream_matches_tac():
+    deep = "int x;\n" + "if (x < 1) {\n" * 500 + "x = x + 1;\n" + "}\n" * 500
+    for source in [*_sources(), deep]:
+        expected = _tac_text(source)
+        for size in (7, 1 << 16):
+            result = _stream_text(source, size)
+            if isinstance(expected, Exception):
+                # Programa inválido: mesmo erro, o texto já emitido não conta
+                assert type(result) is type(expected), (source[:60], size)
+                assert str(result) == str(expected), (source[:60], size)
+            else:
+                assert result == expected, (source[:60], size)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,331 @@
+import io
+import os
+import random
+import tempfile
+
+import ssa
+from bytecode import load_bytecode, save_bytecode
+from lexer import Lexer, TokenType
+from parser import Parser
+from semantic import SemanticAnalyzer
+from tac_generator import TACGenerator
+from optimizer import PASSES, Optimizer, optimize
+from regalloc import RegisterAllocator
+from vm import run_tac
+from workload import generate_program
+
+# ===============================
+# VM x interpretador de referência x otimizador x SSA x alocação x .mcb
+# ===============================
+# O TAC rodado na VM tem que imprimir o mesmo que um interpretador direto
+# da AST, escrito aqui da forma mais simples possível, para programas com
+# saída conhecida e programas aleatórios; todo caminho que reescreve o TAC
+# (-O, cada passo sozinho, SCCP, a volta pela forma SSA, a alocação de
+# registradores, com e sem -O, e o TAC lido de volta de um .mcb) tem que
+# imprimir o mesmo que o TAC original. Um erro de execução conta como saída (o texto impresso até
+# ali mais a mensagem).
+#
+# Uso: python test_vm.py (ou pytest)
+
+STDIN = "7\n-2\n"
+
+# Programas com a saída conhecida: (fonte, linhas impressas).
+EXPECTED = [
+    ("int a; a = 7; print(a / 2, -a / 2, a / -2, !a, a && 0, a || 0, a == 7);",
+     ["3", "-3", "-3", "0", "0", "1", "1"]),
+    ("float f; f = 1.5 * 2.0 - 0.25; print(f, f / 0.5, -f);",
+     ["2.75", "5.5", "-2.75"]),
+    ('string s; s = "x" + "y z"; print(s, s == "xy z", s < "a");',
+     ["xy z", "1", "0"]),
+    ("int x; read(x); while (x > 0) { print(x); x = x - 3; }",
+     ["7", "4", "1"]),
+    ("int i; int s; i = 0; s = 0; while (i < 10) { if (i / 2 * 2 == i) s = s + i; i = i + 1; } print(s);",
+     ["20"]),
+    ("int x; int y; read(x); read(y); print(x * y, x + y > 0 && y < 0);",
+     ["-14", "1"]),
+    ("int z; print(1); z = 1 / 0; print(2);",
+     ["1", "!Divisão por zero"]),
+]
+
+
+# ===============================
+# Programas aleatórios tipados
+# ===============================
+# Programas válidos e que terminam: variáveis int, float e string, todos
+# os operadores, read, blocos e while com contador limitado.
+
+INT_OPERATORS = ["+", "-", "*", "/", "==", "!=", "<", ">", "<=", ">=", "&&", "||"]
+FLOAT_OPERATORS = ["+", "-", "*", "/"]
+
+
+class ProgramGenerator:
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.ints = ["a", "b", "c", "d"]
+        self.floats = ["f", "g"]
+
+    def int_expression(self, depth):
+        rnd = self.random
+        if depth <= 0 or rnd.random() < 0.3:
+            return rnd.choice(self.ints) if rnd.random() < 0.6 else str(rnd.randint(0, 9))
+        choice = rnd.random()
+        if choice < 0.15:
+            return rnd.choice(["-", "!"]) + self.int_expression(depth - 1)
+        if choice < 0.3:
+            return "(" + self.int_expression(depth - 1) + ")"
+        return (f"{self.int_expression(depth - 1)} {rnd.choice(INT_OPERATORS)} "
+                f"{self.int_expression(depth - 1)}")
+
+    def float_expression(self, depth):
+        rnd = self.random
+        if depth <= 0 or rnd.random() < 0.3:
+            if rnd.random() < 0.6:
+                return rnd.choice(self.floats)
+            return f"{rnd.randint(0, 9)}.{rnd.randint(0, 9)}"
+        if rnd.random() < 0.2:
+            return "-" + self.float_expression(depth - 1)
+        return (f"({self.float_expression(depth - 1)} {rnd.choice(FLOAT_OPERATORS)} "
+                f"{self.float_expression(depth - 1)})")
+
+    def string_expression(self):
+        rnd = self.random
+        text = rnd.choice(["s", '"x"', '"yz"'])
+        if rnd.random() < 0.5:
+            text += " + " + rnd.choice(["s", '"q"'])
+        return text
+
+    def statement(self, depth, loops):
+        rnd = self.random
+        choice = rnd.random()
+        if depth <= 0 or choice < 0.4:
+            kind = rnd.random()
+            if kind < 0.6:
+                return f"{rnd.choice(self.ints)} = {self.int_expression(3)};"
+            if kind < 0.8:
+                return f"{rnd.choice(self.floats)} = {self.float_expression(2)};"
+            return f"s = {self.string_expression()};"
+        if choice < 0.55:
+            return f"print({self.int_expression(2)}, {self.float_expression(1)}, s);"
+        if choice < 0.62:
+            return f'print({self.int_expression(2)} == {self.int_expression(1)}, s == "x", f < g);'
+        if choice < 0.8:
+            then = f"{{ {self.statement(depth - 1, loops)} {self.statement(depth - 1, loops)} }}"
+            if rnd.random() < 0.5:
+                then += f" else {{ {self.statement(depth - 1, loops)} }}"
+            return f"if ({self.int_expression(2)}) {then}"
+        if choice < 0.9 and loops < 3:
+            counter = f"k{loops}"
+            return (f"{counter} = 0; while ({counter} < {rnd.randint(0, 4)}) "
+                    f"{{ {self.statement(depth - 1, loops + 1)} {counter} = {counter} + 1; }}")
+        body = " ".join(self.statement(depth - 1, loops) for _ in range(rnd.randint(0, 3)))
+        return "{ " + body + " }"
+
+    def program(self, statements=12):
+        rnd = self.random
+        head = "int a; int b; int c; int d; float f; float g; string s; int k0; int k1; int k2;\n"
+        head += f'a = {rnd.randint(0, 5)}; b = {rnd.randint(1, 5)}; f = 1.5; g = 0.5; s = "ab";\n'
+        if rnd.random() < 0.3:
+            head += "read(c);\n"
+        return head + "\n".join(self.statement(3, 0) for _ in range(statements))
+
+
+def random_program(seed, statements=12):
+    return ProgramGenerator(seed).program(statements)
+
+
+def _sources():
+    for source, _ in EXPECTED:
+        yield source
+    for seed in range(150):
+        yield random_program(seed)
+    for seed in range(20):
+        yield generate_program(30, seed=seed, string_density=0.3 if seed % 2 else 0.0)
+
+
+# ===============================
+# Interpretador de referência
+# ===============================
+
+_INITIAL = {TokenType.INT: 0, TokenType.FLOAT: 0.0, TokenType.STRING: ""}
+_CONVERT = {TokenType.INT: int, TokenType.FLOAT: float, TokenType.STRING: str}
+
+
+def _divide(left, right):
+    if right == 0:
+        raise RuntimeError("Divisão por zero")
+    if isinstance(left, int) and isinstance(right, int):
+        quotient = abs(left) // abs(right)
+        return quotient if (left < 0) == (right < 0) else -quotient
+    return left / right
+
+
+_BINARY = {
+    "+": lambda left, right: left + right,
+    "-": lambda left, right: left - right,
+    "*": lambda left, right: left * right,
+    "/": _divide,
+    "&&": lambda left, right: bool(left) and bool(right),
+    "||": lambda left, right: bool(left) or bool(right),
+    "==": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+    "<": lambda left, right: left < right,
+    ">": lambda left, right: left > right,
+    "<=": lambda left, right: left <= right,
+    ">=": lambda left, right: left >= right,
+}
+
+
+class Reference:
+    def __init__(self, stdin):
+        self.values = {}
+        self.types = {}
+        self.output = []
+        self.stdin = stdin
+
+    def run(self, node):
+        kind = type(node).__name__
+        if kind in ("Program", "Block"):
+            for statement in node.statements:
+                if statement is not None:
+                    self.run(statement)
+        elif kind == "VarDecl":
+            self.types[node.name] = node.var_type
+            self.values[node.name] = _INITIAL[node.var_type]
+            if node.initializer is not None:
+                self.values[node.name] = self.evaluate(node.initializer)
+        elif kind == "Assignment":
+            self.values[node.name] = self.evaluate(node.value)
+        elif kind == "Print":
+            for expression in node.expressions:
+                value = self.evaluate(expression)
+                self.output.append(str(int(value)) if isinstance(value, bool) else str(value))
+        elif kind == "Read":
+            line = self.stdin.readline().rstrip("\n")
+            self.values[node.name] = _CONVERT[self.types[node.name]](line)
+        elif kind == "If":
+            if self.evaluate(node.condition):
+                self.run(node.then_branch)
+            elif node.else_branch is not None:
+                self.run(node.else_branch)
+        elif kind == "While":
+            while self.evaluate(node.condition):
+                self.run(node.body)
+
+    def evaluate(self, node):
+        kind = type(node).__name__
+        if kind == "Literal":
+            return node.value[1:-1] if node.literal_type == TokenType.STRING else node.value
+        if kind == "Variable":
+            return self.values[node.name]
+        if kind == "UnaryExpr":
+            value = self.evaluate(node.expr)
+            return -value if node.operator.lexeme == "-" else not value
+        # O TAC avalia os dois lados de && e || (sem curto-circuito).
+        left = self.evaluate(node.left)
+        return _BINARY[node.operator.lexeme](left, self.evaluate(node.right))
+
+
+def reference_output(ast):
+    reference = Reference(io.StringIO(STDIN))
+    try:
+        reference.run(ast)
+    except RuntimeError as error:
+        return reference.output + [f"!{error}"]
+    return reference.output
+
+
+# ===============================
+# Execução
+# ===============================
+
+def compile_program(source):
+    ast = Parser(Lexer(source).token_stream()).parse()
+    semantic = SemanticAnalyzer()
+    semantic.analyze(ast)
+    return ast, semantic.table.symbols, TACGenerator(semantic.table.names).generate(ast)
+
+
+def run(code, symbols):
+    out = io.StringIO()
+    try:
+        run_tac(list(code), symbols, stdin=io.StringIO(STDIN), stdout=out)
+    except RuntimeError as error:
+        return out.getvalue().splitlines() + [f"!{error}"]
+    return out.getvalue().splitlines()
+
+
+def test_expected_output():
+    for source, expected in EXPECTED:
+        ast, symbols, tac = compile_program(source)
+        assert reference_output(ast) == expected, source
+        assert run(tac, symbols) == expected, source
+
+
+def test_matches_reference():
+    for source in _sources():
+        ast, symbols, tac = compile_program(source)
+        assert run(tac, symbols) == reference_output(ast), source
+
+
+def _round_trip_mcb(tac, symbols):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.mcb")
+        save_bytecode(path, tac, symbols)
+        with load_bytecode(path) as program:
+            assert program.symbols() == symbols
+            return program.instructions()
+
+
+def _variants(tac, symbols):
+    optimized = optimize(tac)
+    yield "-O", optimized
+    for name in PASSES:
+        yield name, optimize(tac, [name])
+    yield "sccp", ssa.sccp(list(tac))[0]
+    yield "ssa", ssa.from_ssa(ssa.to_ssa(list(tac)))
+    yield "alloc", RegisterAllocator().allocate(list(tac))
+    yield "alloc 3", RegisterAllocator(3).allocate(list(tac))
+    yield "-O alloc 3", RegisterAllocator(3).allocate(list(optimized))
+    yield ".mcb", _round_trip_mcb(tac, symbols)
+
+
+def test_rewrites_keep_output():
+    for source in _sources():
+        _, symbols, tac = compile_program(source)
+        expected = run(tac, symbols)
+        for name, code in _variants(tac, symbols):
+            assert run(code, symbols) == expected, (name, source)
+
+
+def test_round_trips_are_exact():
+    # Sem propagação no meio, a volta pela SSA devolve o mesmo TAC; o .mcb
+    # guarda as quádruplas como estão.
+    for seed in range(50):
+        _, symbols, tac = compile_program(random_program(seed))
+        assert ssa.from_ssa(ssa.to_ssa(list(tac))) == tac
+        assert _round_trip_mcb(tac, symbols) == tac
+
+
+def test_optimizer_report():
+    # removidas - acrescentadas de todos os passos é o quanto o TAC
+    # diminuiu; licm e strength acrescentam instruções neste laço.
+    loop = "int i; int n; int k; k = 3; while (i < 10) { n = i * 4 + k * 2; print(n); i = i + 1; }"
+    for source in [loop, *_sources()]:
+        _, _, tac = compile_program(source)
+        optimizer = Optimizer()
+        optimizer.optimize(list(tac))
+        report = optimizer.report()
+        passes = report["passes"].values()
+        assert all(min(stats.values()) >= 0 for stats in passes), source
+        removed = sum(stats["removed"] - stats["added"] for stats in passes)
+        assert removed == report["size_before"] - report["size_after"], source
+        if source is loop:
+            assert report["passes"]["licm"]["added"] > 0
+            assert report["passes"]["strength"]["added"] > 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("ok")
@@ -0,0 +1,178 @@
+from inspect import isgeneratorfunction
+
+# ===============================
+# Visitantes sem recursão
+# ===============================
+# Base para passadas sobre a AST que não usam a pilha do Python: a
+# profundidade da árvore não esbarra no limite de recursão e a memória
+# cresce com a profundidade (uma entrada por nível em aberto, mais os
+# irmãos ainda por visitar).
+#
+# Cada classe de nó tem um método <prefix><Classe> (ex.: visit_If), de um
+# destes três tipos:
+#
+#   - folha: método comum, chamado direto; o resultado volta na hora.
+#   - @children("left", "right"): os filhos nesses campos são visitados
+#     antes, em ordem, e o método recebe os resultados deles:
+#     visit_BinaryExpr(self, node, left, right). Um campo lista chega como
+#     a lista dos resultados dos itens, e @children(..., enter=f) chama
+#     f(self, node) antes dos filhos. É o caminho mais rápido, próprio para
+#     expressões e comandos.
+#   - gerador: pede cada filho com `valor = yield filho` e devolve o seu
+#     resultado com return; serve para quem precisa agir antes, entre ou
+#     depois dos filhos (escopos, rótulos).
+#
+# None (ramo ou inicializador ausente) vai para <prefix>None. Subclasses de
+# nós (como as fachadas de ast_arena) usam o método da primeira classe base
+# que tiver um. Os filhos são visitados na ordem em que o método os pede,
+# então a ordem de visita e o primeiro erro levantado são os mesmos de uma
+# versão recursiva.
+
+_LEAF = 0
+_CHILDREN = 1
+_GENERATOR = 2
+
+_GeneratorType = type((lambda: (yield))())
+
+
+def _items(visitor, node, *values):
+    return list(values)
+
+
+def children(*fields, enter=None):
+    # enter(visitor, node), se dado, roda antes de visitar os filhos.
+    def decorate(function):
+        function.children = fields
+        function.enter = enter
+        return function
+    return decorate
+
+
+class Visitor:
+    prefix = "visit_"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # classe do nó -> (tipo, função, campos em ordem inversa,
+        # (função, número de campos), enter), preenchida sob demanda;
+        # _leaves tem só as folhas.
+        cls._dispatch = {}
+        cls._leaves = {}
+
+    def visit(self, node):
+        dispatch = self._dispatch
+        leaves = self._leaves
+        # tasks: nós a visitar, geradores esperando o valor de um filho e,
+        # para cada método @children esperando os valores dos filhos, o nó
+        # e (função, n) acima dele.
+        tasks = [node]
+        values = []
+        pop = tasks.pop
+        push = tasks.append
+        push_all = tasks.extend
+        result = values.append
+        while tasks:
+            task = pop()
+            cls = task.__class__
+            entry = dispatch.get(cls)
+            if entry is None:
+                if cls is tuple:
+                    function, count = task
+                    node = pop()
+                    if count == 1:
+                        result(function(self, node, values.pop()))
+                    elif count == 2:
+                        right = values.pop()
+                        result(function(self, node, values.pop(), right))
+                    elif count:
+                        args = values[-count:]
+                        del values[-count:]
+                        result(function(self, node, *args))
+                    else:
+                        result(function(self, node))
+                    continue
+                if cls is list:
+                    # Campo lista de um método @children: os valores dos
+                    # itens voltam numa lista.
+                    push(None)
+                    push((_items, len(task)))
+                    push_all(reversed(task))
+                    continue
+                if cls is not _GeneratorType:
+                    entry = self._resolve(cls)
+            if entry is None:
+                generator = task
+                value = values.pop()
+            else:
+                kind, function, fields, call, enter = entry
+                if kind == _LEAF:
+                    result(function(self, task))
+                    continue
+                if kind == _CHILDREN:
+                    # Filhos folha no começo são visitados na hora, sem
+                    # passar pela pilha (a ordem de visita não muda); é o
+                    # caso comum nas expressões.
+                    if enter is not None:
+                        enter(self, task)
+                    if call[1] <= 2:
+                        first = getattr(task, fields[-1])
+                        leaf = leaves.get(first.__class__)
+                        if leaf is not None:
+                            value = leaf(self, first)
+                            if call[1] == 1:
+                                result(function(self, task, value))
+                                continue
+                            second = getattr(task, fields[0])
+                            leaf = leaves.get(second.__class__)
+                            if leaf is not None:
+                                result(function(self, task, value, leaf(self, second)))
+                                continue
+                            result(value)
+                            push(task)
+                            push(call)
+                            push(second)
+                            continue
+                    push(task)
+                    push(call)
+                    for field in fields:
+                        push(getattr(task, field))
+                    continue
+                generator = function(self, task)
+                value = None
+            # Retoma o gerador até ele pedir um filho que não é folha (que
+            # vai para a pilha, com o gerador embaixo) ou terminar.
+            while True:
+                try:
+                    child = generator.send(value)
+                except StopIteration as stop:
+                    result(stop.value)
+                    break
+                leaf = leaves.get(child.__class__)
+                if leaf is None:
+                    push(generator)
+                    push(child)
+                    break
+                value = leaf(self, child)
+        return values.pop()
+
+    @classmethod
+    def _resolve(cls, node_class):
+        if node_class is type(None):
+            names = ["None"]
+        else:
+            names = [base.__name__ for base in node_class.__mro__]
+        for name in names:
+            function = getattr(cls, cls.prefix + name, None)
+            if function is None:
+                continue
+            fields = getattr(function, "children", None)
+            if fields is not None:
+                entry = (_CHILDREN, function, fields[::-1], (function, len(fields)), function.enter)
+            elif isgeneratorfunction(function):
+                entry = (_GENERATOR, function, (), None, None)
+            else:
+                entry = (_LEAF, function, (), None, None)
+                cls._leaves[node_class] = function
+            cls._dispatch[node_class] = entry
+            return entry
+        raise TypeError(f"{cls.__name__} não sabe visitar {node_class.__name__}")
@@ -0,0 +1,322 @@
+import sys
+
+from lexer import TokenType
+import tac
+from tac import DEFAULT_VALUES, FUNCTIONS, Opcode, decode_tac, is_constant, uses
+
+# ===============================
+# Máquina virtual para o TAC
+# ===============================
+# As quádruplas de TACGenerator são carregadas uma única vez: cada
+# operando (variável, temporário ou constante) vira um índice no vetor de
+# registradores, e cada rótulo vira o índice da instrução de destino.
+# A execução é um laço de despacho sobre tuplas (opcode, a, b, c, d).
+#
+# O tipo dos operandos é resolvido na carga: as operações especializadas
+# do TAC (tac.SPECIALIZED) viram opcodes da VM sem chamada de função nem
+# teste de tipo no laço; as genéricas continuam passando pelas funções de
+# tac.FUNCTIONS.
+
+HALT = 0
+MOVE = 1         # regs[a] = regs[b]
+ADD = 2          # regs[a] = regs[b] + regs[c]
+SUB = 3
+MUL = 4
+BINARY = 5       # regs[a] = d(regs[b], regs[c])
+UNARY = 6        # regs[a] = d(regs[b])
+JUMP = 7         # pc = a
+JUMP_IF_FALSE = 8    # if not regs[b]: pc = a
+JUMP_IF_NOT = 9      # if not d(regs[b], regs[c]): pc = a
+JUMP_IF_NOT_LT = 10  # if not regs[b] < regs[c]: pc = a
+JUMP_IF_NOT_LE = 11
+JUMP_IF_NOT_GT = 12
+JUMP_IF_NOT_GE = 13
+PRINT = 14       # escreve regs[a]
+READ = 15        # regs[a] = próxima linha da entrada
+DIV_INT = 16     # regs[a] = regs[b] / regs[c], inteiros (truncada)
+NEG = 17         # regs[a] = -regs[b], int ou float
+
+
+# Operações com opcode próprio (evitam a chamada de função no laço).
+_ARITHMETIC_OPCODES = {
+    Opcode.ADD: ADD, Opcode.ADD_INT: ADD, Opcode.ADD_FLOAT: ADD, Opcode.CONCAT: ADD,
+    Opcode.SUB: SUB, Opcode.SUB_INT: SUB, Opcode.SUB_FLOAT: SUB,
+    Opcode.MUL: MUL, Opcode.MUL_INT: MUL, Opcode.MUL_FLOAT: MUL,
+    Opcode.DIV_INT: DIV_INT,
+}
+_UNARY_OPCODES = {Opcode.NEG_INT: NEG, Opcode.NEG_FLOAT: NEG}
+_BRANCH_OPCODES = {
+    Opcode.LT: JUMP_IF_NOT_LT, Opcode.LT_INT: JUMP_IF_NOT_LT, Opcode.LT_FLOAT: JUMP_IF_NOT_LT,
+    Opcode.LE: JUMP_IF_NOT_LE, Opcode.LE_INT: JUMP_IF_NOT_LE, Opcode.LE_FLOAT: JUMP_IF_NOT_LE,
+    Opcode.GT: JUMP_IF_NOT_GT, Opcode.GT_INT: JUMP_IF_NOT_GT, Opcode.GT_FLOAT: JUMP_IF_NOT_GT,
+    Opcode.GE: JUMP_IF_NOT_GE, Opcode.GE_INT: JUMP_IF_NOT_GE, Opcode.GE_FLOAT: JUMP_IF_NOT_GE,
+}
+
+
+
+_BRANCH = -1    # pseudo-opcode de _fuse: (_BRANCH, rótulo, a, b, op)
+
+
+def _fuse(code):
+    # Superinstruções: "t = a op b; x = t" vira "x = a op b" e
+    # "t = a < b; ifFalse t goto L" vira um desvio condicional único,
+    # desde que t não seja lido em nenhum outro lugar, ou, para um
+    # temporário reaproveitado (regalloc), que esteja morto depois.
+    reads = {}
+    labels = {}
+    for index, instr in enumerate(code):
+        for operand in uses(instr):
+            reads[operand] = reads.get(operand, 0) + 1
+        if instr[0] is tac.LABEL:
+            labels[instr[1]] = index
+
+    fused = []
+    index = 0
+    while index < len(code):
+        instr = code[index]
+        following = code[index + 1] if index + 1 < len(code) else None
+        opcode = instr[0]
+        if (opcode in tac.BINARY or opcode in tac.UNARY) and following:
+            result = instr[1]
+            single = reads.get(result) == 1
+            if following[0] is tac.COPY and following[2] is result and (
+                    single or _dead_after(code, labels, result, (index + 2,))):
+                fused.append((opcode, following[1], instr[2], instr[3]))
+                index += 2
+                continue
+            if (following[0] is tac.IF_FALSE and following[2] is result and opcode in tac.BINARY
+                    and (single or _dead_after(code, labels, result,
+                                               (index + 2, labels.get(following[1]))))):
+                fused.append((_BRANCH, following[1], instr[2], instr[3], opcode))
+                index += 2
+                continue
+        fused.append(instr)
+        index += 1
+    return fused
+
+
+def _dead_after(code, labels, operand, starts, budget=32):
+    # Se o temporário operand é escrito antes de ser lido em todo caminho
+    # que parte das posições starts. Olha no máximo budget instruções; se
+    # não decidir antes disso, responde que não.
+    if operand.kind is not tac.TEMP:
+        return False
+    pending = list(starts)
+    seen = set()
+    while pending:
+        position = pending.pop()
+        while position is not None and position < len(code) and position not in seen:
+            seen.add(position)
+            budget -= 1
+            if budget < 0:
+                return False
+            instr = code[position]
+            if operand in uses(instr):
+                return False
+            opcode = instr[0]
+            if opcode is tac.GOTO:
+                position = labels.get(instr[1])
+                continue
+            if opcode is tac.IF_FALSE:
+                pending.append(labels.get(instr[1]))
+            elif instr[1] is operand and opcode in tac.DEFINES:
+                break
+            position += 1
+    return True
+
+
+# ===============================
+# VM
+# ===============================
+
+class VM:
+    def __init__(self, tac_code, var_types=None, stdin=None, stdout=None):
+        self.var_types = var_types or {}
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.slots = {}
+        self.registers = []
+        self.error = None
+        if tac_code and isinstance(tac_code[0], str):
+            tac_code = decode_tac(tac_code)
+        self.code = self._load(_fuse(tac_code))
+
+    # ---------- Carga ----------
+
+    def _slot(self, operand):
+        slot = self.slots.get(operand)
+        if slot is None:
+            slot = self.slots[operand] = len(self.registers)
+            if is_constant(operand):
+                value = operand.value
+            else:
+                value = DEFAULT_VALUES.get(self.var_types.get(operand.name), 0)
+            self.registers.append(value)
+        return slot
+
+    def _load(self, quads):
+        labels = {}
+        position = 0
+        for instr in quads:
+            if instr[0] is tac.LABEL:
+                labels[instr[1]] = position
+            else:
+                position += 1
+
+        def target(label):
+            if label not in labels:
+                raise SyntaxError(f"Rótulo '{label}' não definido")
+            return labels[label]
+
+        slot = self._slot
+        code = []
+        for instr in quads:
+            opcode = instr[0]
+            if opcode is tac.LABEL:
+                continue
+            if opcode is tac.COPY:
+                code.append((MOVE, slot(instr[1]), slot(instr[2]), 0, None))
+            elif opcode in tac.BINARY:
+                _, dst, left, right = instr
+                code.append((_ARITHMETIC_OPCODES.get(opcode, BINARY), slot(dst),
+                             slot(left), slot(right), FUNCTIONS[opcode]))
+            elif opcode in tac.UNARY:
+                code.append((_UNARY_OPCODES.get(opcode, UNARY), slot(instr[1]), slot(instr[2]), 0,
+                             FUNCTIONS[opcode]))
+            elif opcode == _BRANCH:
+                _, label, left, right, operation = instr
+                code.append((_BRANCH_OPCODES.get(operation, JUMP_IF_NOT), target(label),
+                             slot(left), slot(right), FUNCTIONS[operation]))
+            elif opcode is tac.IF_FALSE:
+                code.append((JUMP_IF_FALSE, target(instr[1]), slot(instr[2]), 0, None))
+            elif opcode is tac.GOTO:
+                code.append((JUMP, target(instr[1]), 0, 0, None))
+            elif opcode is tac.PRINT:
+                code.append((PRINT, slot(instr[2]), 0, 0, None))
+            elif opcode is tac.READ:
+                code.append((READ, slot(instr[1]), 0, 0, self.var_types.get(instr[1].name)))
+        code.append((HALT, 0, 0, 0, None))
+        return code
+
+    # ---------- Execução ----------
+
+    def run(self):
+        code = self.code
+        regs = self.registers
+        output = []
+        emit = output.append
+        pc = 0
+
+        try:
+            while True:
+                op, a, b, c, d = code[pc]
+                pc += 1
+                if op == ADD:
+                    regs[a] = regs[b] + regs[c]
+                elif op == JUMP_IF_NOT_LT:
+                    if not regs[b] < regs[c]:
+                        pc = a
+                elif op == JUMP:
+                    pc = a
+                elif op == MOVE:
+                    regs[a] = regs[b]
+                elif op == SUB:
+                    regs[a] = regs[b] - regs[c]
+                elif op == MUL:
+                    regs[a] = regs[b] * regs[c]
+                elif op == DIV_INT:
+                    left = regs[b]
+                    right = regs[c]
+                    if not right:
+                        raise RuntimeError("Divisão por zero")
+                    quotient = left // right
+                    if quotient < 0 and quotient * right != left:
+                        quotient += 1
+                    regs[a] = quotient
+                elif op == NEG:
+                    regs[a] = -regs[b]
+                elif op == JUMP_IF_NOT_LE:
+                    if not regs[b] <= regs[c]:
+                        pc = a
+                elif op == JUMP_IF_NOT_GT:
+                    if not regs[b] > regs[c]:
+                        pc = a
+                elif op == JUMP_IF_NOT_GE:
+                    if not regs[b] >= regs[c]:
+                        pc = a
+                elif op == BINARY:
+                    regs[a] = d(regs[b], regs[c])
+                elif op == JUMP_IF_NOT:
+                    if not d(regs[b], regs[c]):
+                        pc = a
+                elif op == JUMP_IF_FALSE:
+                    if not regs[b]:
+                        pc = a
+                elif op == UNARY:
+                    regs[a] = d(regs[b])
+                elif op == PRINT:
+                    emit(_format(regs[a]))
+                    if len(output) >= 4096:
+                        self._flush(output)
+                elif op == READ:
+                    self._flush(output)
+                    regs[a] = read_value(self.stdin, d)
+                else:
+                    break
+        finally:
+            self._flush(output)
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self, error):
+        # Interrompe run() a partir de outra thread: toda instrução vira
+        # HALT e run() levanta error em vez de terminar normalmente. Não
+        # custa nada no laço de execução. Um read em andamento só é
+        # interrompido quando a linha chegar.
+        self.error = error
+        self.code[:] = [(HALT, 0, 0, 0, None)] * len(self.code)
+
+    def _flush(self, output):
+        if output:
+            output.append("")
+            self.stdout.write("\n".join(output))
+            output.clear()
+        self.stdout.flush()
+
+
+def read_value(stdin, var_type):
+    # Uma linha da entrada, convertida pelo tipo declarado da variável.
+    line = stdin.readline()
+    if not line:
+        raise RuntimeError("Fim da entrada durante read")
+    text = line.rstrip("\r\n")
+    if var_type == TokenType.STRING:
+        return text
+    if var_type == TokenType.INT:
+        try:
+            return int(text)
+        except ValueError:
+            raise RuntimeError("Entrada inválida para int") from None
+    if var_type == TokenType.FLOAT:
+        try:
+            return float(text)
+        except ValueError:
+            raise RuntimeError("Entrada inválida para float") from None
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+def run_tac(tac_code, var_types=None, stdin=None, stdout=None):
+    vm = VM(tac_code, var_types, stdin, stdout)
+    vm.run()
+    return vm
@@ -0,0 +1,116 @@
+import random
+
+# ===============================
+# Gerador de programas sintéticos
+# ===============================
+# Programas válidos (léxica, sintática e semanticamente) e determinísticos
+# para uma mesma semente, usados pelos benchmarks. Todo while usa um
+# contador próprio (cN) que o corpo não altera, então os programas sempre
+# terminam.
+#
+# Parâmetros: identifiers variáveis int, max_depth níveis de if/while
+# aninhados, expressões com até expr_depth níveis e expr_width operandos
+# por soma/subtração, e string_density, a fração dos comandos que mexe com
+# strings (atribuições de literais e concatenações, e prints). Com os
+# valores padrão o programa gerado para cada semente não muda.
+
+_ARITHMETIC = ["+", "-", "*"]
+_COMPARISON = ["<", ">", "<=", ">=", "==", "!="]
+_WORDS = ["mc", "olá", "texto", "fim", "valor", "a b", "x", "teste"]
+
+
+class ProgramGenerator:
+    def __init__(self, seed=0, identifiers=16, max_depth=3, expr_depth=3, loop_count=3,
+                 expr_width=2, string_density=0.0):
+        if identifiers < 1:
+            raise ValueError("identifiers deve ser pelo menos 1")
+        if expr_width < 2:
+            raise ValueError("expr_width deve ser pelo menos 2")
+        if not 0.0 <= string_density <= 1.0:
+            raise ValueError("string_density deve estar entre 0 e 1")
+        self.random = random.Random(seed)
+        self.identifiers = [f"v{i}" for i in range(identifiers)]
+        self.strings = [f"s{i}" for i in range(max(1, identifiers // 4))] if string_density else []
+        self.max_depth = max_depth
+        self.expr_depth = expr_depth
+        self.expr_width = expr_width
+        self.string_density = string_density
+        self.loop_count = loop_count
+
+    def generate(self, statements):
+        lines = [f"int {name};" for name in self.identifiers]
+        lines.extend(f"int c{depth};" for depth in range(self.max_depth))
+        lines.extend(f"{name} = {i};" for i, name in enumerate(self.identifiers))
+        lines.extend(f"string {name} = {self._string_literal()};" for name in self.strings)
+        lines.extend(self._statement(0) for _ in range(statements))
+        return "\n".join(lines) + "\n"
+
+    def _statement(self, depth):
+        # Só sorteia quando há strings, para não mudar os programas padrão.
+        if self.string_density and self.random.random() < self.string_density:
+            return self._string_statement()
+        choice = self.random.random()
+        if depth >= self.max_depth or choice < 0.6:
+            return self._assignment(self.random.choice(self.identifiers))
+        if choice < 0.7:
+            return f"print({self._expression(self.expr_depth)[0]});"
+        if choice < 0.85:
+            inner = self._statement(depth + 1)
+            other = self._statement(depth + 1)
+            return f"if ({self._condition()}) {{ {inner} }} else {{ {other} }}"
+        counter = f"c{depth}"
+        body = " ".join(self._statement(depth + 1) for _ in range(self.random.randint(1, 3)))
+        return (f"{counter} = 0; while ({counter} < {self.loop_count}) "
+                f"{{ {body} {counter} = {counter} + 1; }}")
+
+    def _assignment(self, name):
+        # Divide pelo maior fator de crescimento possível da expressão, para
+        # que os valores não explodam ao longo de milhares de atribuições.
+        expr, weight = self._expression(self.expr_depth)
+        if weight > 1:
+            return f"{name} = ({expr}) / {weight};"
+        return f"{name} = {expr};"
+
+    def _string_statement(self):
+        # Concatena só literais: uma string que se concatenasse a si mesma
+        # dentro de um while cresceria sem limite.
+        name = self.random.choice(self.strings)
+        choice = self.random.random()
+        if choice < 0.4:
+            return f"{name} = {self._string_literal()};"
+        if choice < 0.7:
+            return f"{name} = {self._string_literal()} + {self._string_literal()};"
+        return f"print({name}, {self._string_literal()});"
+
+    def _string_literal(self):
+        return f'"{self.random.choice(_WORDS)}"'
+
+    def _condition(self):
+        left = self._expression(1)[0]
+        right = self._expression(1)[0]
+        return f"{left} {self.random.choice(_COMPARISON)} {right}"
+
+    def _expression(self, depth):
+        # Devolve (texto, peso): |valor| <= peso * max(|variáveis|, 1).
+        if depth <= 0 or self.random.random() < 0.3:
+            if self.random.random() < 0.5:
+                return self.random.choice(self.identifiers), 1
+            value = self.random.randint(0, 100)
+            return str(value), value
+        left, left_weight = self._expression(depth - 1)
+        operator = self.random.choice(_ARITHMETIC)
+        if operator == "*":
+            factor = self.random.randint(1, 9)
+            expr, weight = f"({left}) * {factor}", left_weight * factor
+        else:
+            right, right_weight = self._expression(depth - 1)
+            expr, weight = f"{left} {operator} {right}", left_weight + right_weight
+            for _ in range(self.expr_width - 2):
+                operator = self.random.choice(_ARITHMETIC[:2])
+                right, right_weight = self._expression(depth - 1)
+                expr, weight = f"{expr} {operator} {right}", weight + right_weight
+        return (f"({expr})", weight) if self.random.random() < 0.3 else (expr, weight)
+
+
+def generate_program(statements, seed=0, **options):
+    return ProgramGenerator(seed, **options).generate(statements)